@@ -1,21 +1,81 @@
+import asyncio
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 
-from .db.engine import engine
+from . import config
+from .db.engine import async_session, engine, prewarm_pool, replica_engine
 from .db.models import Base
 from .exceptions import client, core, handlers
-from .routers import files, folders, keys
+from .routers import (
+    admin,
+    changes,
+    files,
+    folders,
+    keys,
+    metrics,
+    monitoring,
+    search,
+)
+from .utils.compression import CompressionMiddleware
+from .utils.metrics import MetricsMiddleware
+from .utils.notifications import JournalPoller, hub
+from .utils.profiling import ProfilingMiddleware
+from .utils.rebalancer import rebalancer
+from .utils.serialization import FastJSONResponse
+from .utils.tasks import (
+    cleanup_abandoned_uploads,
+    reconcile_storage_accounting,
+    run_periodically,
+)
+from .utils.tracing import TracingMiddleware, exporter
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+    if config.settings.DATABASE_POOL_PREWARM:
+        await prewarm_pool(engine, config.settings.DATABASE_POOL_SIZE)
+        if replica_engine:
+            await prewarm_pool(replica_engine, config.settings.DATABASE_POOL_SIZE)
+    background_tasks = [
+        asyncio.create_task(
+            run_periodically(
+                config.settings.UPLOAD_CLEANUP_INTERVAL, cleanup_abandoned_uploads
+            )
+        ),
+    ]
+    if config.settings.STORAGE_RECONCILE_INTERVAL is not None:
+        background_tasks.append(
+            asyncio.create_task(
+                run_periodically(
+                    config.settings.STORAGE_RECONCILE_INTERVAL,
+                    reconcile_storage_accounting,
+                )
+            )
+        )
+    if config.settings.CHANGE_EVENTS_BACKEND == "database":
+        background_tasks.append(
+            asyncio.create_task(
+                run_periodically(
+                    config.settings.CHANGE_EVENTS_POLL_INTERVAL,
+                    JournalPoller(hub, async_session).poll,
+                )
+            )
+        )
     yield
+    for task in background_tasks:
+        task.cancel()
+    await rebalancer.cancel()
+    await asyncio.to_thread(exporter.flush)
 
 
-app = FastAPI(lifespan=lifespan)
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(TracingMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 app.add_exception_handler(
     client.RegistrationRequired, handlers.registration_required_handler
@@ -36,3 +96,8 @@ app.add_exception_handler(
 app.include_router(keys.router)
 app.include_router(folders.router, prefix="/folders")
 app.include_router(files.router, prefix="/files")
+app.include_router(changes.router, prefix="/changes")
+app.include_router(search.router, prefix="/search")
+app.include_router(monitoring.router, prefix="/monitoring")
+app.include_router(metrics.router)
+app.include_router(admin.router, prefix="/admin")
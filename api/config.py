@@ -1,24 +1,72 @@
 from typing import Literal
 
-from pydantic import BaseSettings
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+IsolationLevel = Literal[
+    "READ COMMITTED",
+    "READ UNCOMMITTED",
+    "REPEATABLE READ",
+    "SERIALIZABLE",
+    "AUTOCOMMIT",
+]
+ChangeEventsBackend = Literal["memory", "database"]
 
 
 class Settings(BaseSettings):
     DATABASE_URL: str = "sqlite+aiosqlite:///./db.sqlite3?check_same_thread=False"
-    DATABASE_ISOLATION_LEVEL: Literal[
-        "READ COMMITED",
-        "READ UNCOMMITED",
-        "REPEATABLE READ",
-        "SERIALIZABLE",
-        "AUTOCOMMIT",
-    ] = "SERIALIZABLE"
+    DATABASE_ISOLATION_LEVEL: IsolationLevel = "SERIALIZABLE"
+    DATABASE_READ_ISOLATION_LEVEL: IsolationLevel = "AUTOCOMMIT"
+    DATABASE_REPLICA_URL: str | None = None
+    # Keys that wrote within DATABASE_REPLICA_LAG seconds read from the
+    # primary. Each worker tracks only its own writes, so a read served by
+    # another worker can still be stale.
+    DATABASE_REPLICA_LAG: float = 5
+    DATABASE_REPLICA_ROUTING_CACHE_SIZE: int = 100_000
+    DATABASE_SERIALIZATION_RETRIES: int = 3
+    DATABASE_POOL_SIZE: int = 5
+    DATABASE_MAX_OVERFLOW: int = 10
+    DATABASE_POOL_TIMEOUT: float = 30
+    DATABASE_POOL_RECYCLE: int = -1
+    DATABASE_POOL_PRE_PING: bool = False
+    DATABASE_POOL_PREWARM: bool = True
+    DATABASE_STATEMENT_CACHE_SIZE: int = 500
     USER_IS_ACTIVATED_DEFAULT: bool = False
     USER_STORAGE_SIZE_LIMIT: int = 0
     SESSION_STORAGE_MAX_SIZE: int = 1_000_000
     SESSION_TTL: int = 600
+    UPLOAD_RESERVATION_TTL: int = 3600
+    UPLOAD_CLEANUP_INTERVAL: int = 600
+    CHANGE_EVENTS_BACKEND: ChangeEventsBackend = "memory"
+    CHANGE_EVENTS_POLL_INTERVAL: float = 1
+    # Longer than the slowest write transaction, or its changes can be missed.
+    CHANGE_EVENTS_POLL_LOOKBACK: float = 60
+    CHANGE_EVENTS_KEEPALIVE: float = 15
+    CHANGE_EVENTS_QUEUE_SIZE: int = 1000
+    ADMIN_TOKEN: str | None = None
+    BULK_IMPORT_BATCH_SIZE: int = 1000
+    REBALANCE_CONCURRENCY: int = 4
+    REBALANCE_BANDWIDTH: int = 50_000_000
+    REBALANCE_TOLERANCE: float = 0.05
+    # Off unless set. Storage nodes have to serve GET /space, answering like
+    # an upload, and GET /files?cursor=, answering with a page of
+    # {"files": [{"id", "size"}], "next_cursor"}.
+    STORAGE_RECONCILE_INTERVAL: int | None = None
+    STORAGE_RECONCILE_FIX: bool = False
+    TRACING_ENABLED: bool = False
+    TRACING_EXPORT_PATH: str = "traces.jsonl"
+    TRACING_SERVICE_NAME: str = "api"
+    PROFILING_THRESHOLD: float | None = None
+    PROFILING_SAMPLE_RATE: int = 0
+    PROFILING_DIRECTORY: str = "profiles"
+    # Listings are cached only with the "database" change events backend,
+    # whose journal poller carries invalidations between workers. A listing
+    # lives at most FOLDER_CACHE_TTL seconds.
+    FOLDER_CACHE_SIZE: int = 10_000
+    FOLDER_CACHE_TTL: int = 300
+    PATH_CACHE_SIZE: int = 100_000
+    COMPRESSION_MINIMUM_SIZE: int | None = 1024
 
-    class Config:
-        env_file = ".config"
+    model_config = SettingsConfigDict(env_file=".config", extra="ignore")
 
 
 settings = Settings()
@@ -1,28 +1,221 @@
 import posixpath
-
-from sqlalchemy import func, select
+import re
+from datetime import datetime
+from typing import AsyncIterator, Mapping, Sequence
+from uuid import uuid4
+
+from sqlalchemy import (
+    Boolean,
+    ColumnElement,
+    DateTime,
+    Integer,
+    Select,
+    SQLColumnExpression,
+    String,
+    and_,
+    case,
+    cast,
+    delete,
+    exists,
+    func,
+    insert,
+    literal,
+    null,
+    or_,
+    select,
+    union_all,
+    update,
+)
+from sqlalchemy.engine import RowMapping
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import aliased, joinedload
+from sqlalchemy.sql.compiler import SQLCompiler
+from sqlalchemy.sql.visitors import InternalTraversal
 
 from .. import config
-from ..utils.path_utils import split_head_and_tail, split_into_components
+from ..schemas.changes import ChangeAction
+from ..schemas.folders import ItemType, SortOrder
+from ..schemas.search import SearchMode
+from ..utils.path_utils import (
+    add_trailing_slash,
+    ancestor_paths,
+    split_head_and_tail,
+)
 from . import models
 
+LIKE_ESCAPE = "\\"
+PATH_RANGE_END = "\U0010ffff"
+
+TotalsDelta = tuple[int | ColumnElement[int], int | ColumnElement[int]]
+
+
+async def __update_child_full_paths(
+    db: AsyncSession, folder: models.FolderRecord, old_path: str
+):
+    old_prefix = add_trailing_slash(old_path)
+    new_prefix = add_trailing_slash(folder.full_path)
+    owned_folders = select(models.FolderRecord.id).where(
+        models.FolderRecord.owner_id == folder.owner_id
+    )
+    await db.execute(
+        update(models.FileRecord)
+        .where(
+            models.FileRecord.folder_id.in_(owned_folders),
+            path_range(models.FileRecord.full_path, old_prefix),
+        )
+        .values(
+            full_path=literal(new_prefix)
+            + func.substr(models.FileRecord.full_path, len(old_prefix) + 1)
+        )
+        .execution_options(synchronize_session="fetch")
+    )
+    await db.execute(
+        update(models.FolderRecord)
+        .where(
+            models.FolderRecord.owner_id == folder.owner_id,
+            path_range(models.FolderRecord.full_path, old_prefix),
+        )
+        .values(
+            full_path=literal(new_prefix)
+            + func.substr(models.FolderRecord.full_path, len(old_prefix) + 1)
+        )
+        .execution_options(synchronize_session="fetch")
+    )
+
+
+async def update_folder_totals(
+    db: AsyncSession, owner_id: str, deltas: Mapping[str, TotalsDelta]
+):
+    # Every affected folder is adjusted relative to its current row in a single
+    # statement, so concurrent writers can't overwrite each other's totals.
+    if not deltas:
+        return
+    await db.execute(
+        update(models.FolderRecord)
+        .where(
+            models.FolderRecord.owner_id == owner_id,
+            models.FolderRecord.full_path.in_(deltas),
+        )
+        .values(
+            total_size=models.FolderRecord.total_size
+            + case(
+                {path: size for path, (size, _) in deltas.items()},
+                value=models.FolderRecord.full_path,
+                else_=0,
+            ),
+            file_count=models.FolderRecord.file_count
+            + case(
+                {path: count for path, (_, count) in deltas.items()},
+                value=models.FolderRecord.full_path,
+                else_=0,
+            ),
+        )
+        .execution_options(synchronize_session="fetch")
+    )
+
+
+async def update_file_totals(
+    db: AsyncSession, owner_id: str, file_path: str, size: int, count: int
+):
+    if not size and not count:
+        return
+    folder_path, _ = split_head_and_tail(file_path)
+    await update_folder_totals(
+        db, owner_id, {path: (size, count) for path in ancestor_paths(folder_path)}
+    )
 
-async def __update_child_full_paths(folder: models.FolderRecord):
-    for file in await folder.awaitable_attrs.files:
-        file.full_path = posixpath.join(folder.full_path, file.filename)
-    for child_folder in await folder.awaitable_attrs.child_folders:
-        child_folder.full_path = posixpath.join(folder.full_path, child_folder.name)
-        await __update_child_full_paths(child_folder)
+
+def subtree_totals(folder: models.FolderRecord) -> TotalsDelta:
+    # Read from the row inside the statement rather than from the possibly
+    # stale instance.
+    subtree = aliased(models.FolderRecord)
+    return (
+        select(subtree.total_size).where(subtree.id == folder.id).scalar_subquery(),
+        select(subtree.file_count).where(subtree.id == folder.id).scalar_subquery(),
+    )
+
+
+async def recalculate_folder_totals(db: AsyncSession, owner_id: str):
+    owned_folders = aliased(models.FolderRecord)
+    prefix = case(
+        (models.FolderRecord.full_path == models.ROOT_PATH, models.ROOT_PATH),
+        else_=models.FolderRecord.full_path + posixpath.sep,
+    )
+    in_subtree = and_(
+        models.FileRecord.folder_id.in_(
+            select(owned_folders.id).where(owned_folders.owner_id == owner_id)
+        ),
+        path_range(models.FileRecord.full_path, prefix),
+    )
+    await db.execute(
+        update(models.FolderRecord)
+        .where(models.FolderRecord.owner_id == owner_id)
+        .values(
+            total_size=select(func.coalesce(func.sum(models.FileRecord.size), 0))
+            .where(in_subtree)
+            .scalar_subquery(),
+            file_count=select(func.count(models.FileRecord.id))
+            .where(in_subtree)
+            .scalar_subquery(),
+        )
+        .execution_options(synchronize_session="fetch")
+    )
 
 
-async def update_record(db: AsyncSession, record: models.Record) -> models.Record:
+def update_record(db: AsyncSession, record: models.Record) -> models.Record:
+    # Ids and timestamps are generated client side and primary keys come back
+    # through RETURNING, so the pending record is flushed with the rest of the
+    # unit of work when the request commits or the next query autoflushes.
     db.add(record)
-    await db.flush()
-    await db.refresh(record)
     return record
 
 
+def record_change(
+    db: AsyncSession,
+    owner_id: str,
+    action: ChangeAction,
+    item_type: ItemType,
+    path: str,
+    new_path: str | None = None,
+) -> models.ChangeRecord:
+    change_record = models.ChangeRecord(
+        owner_id=owner_id,
+        action=action,
+        item_type=item_type,
+        path=path,
+        new_path=new_path,  # type: ignore[arg-type]
+    )
+    db.add(change_record)
+    return change_record
+
+
+async def lock_key(db: AsyncSession, key_record: models.KeyRecord):
+    # Changes of one owner are numbered while its key row is locked, so they
+    # commit in id order and a "since" cursor never passes an uncommitted one.
+    await db.execute(
+        select(models.KeyRecord.id)
+        .where(models.KeyRecord.id == key_record.id)
+        .with_for_update()
+    )
+
+
+async def find_changes(
+    db: AsyncSession, key_record: models.KeyRecord, since: int, limit: int
+) -> Sequence[models.ChangeRecord]:
+    return (
+        await db.scalars(
+            select(models.ChangeRecord)
+            .where(
+                models.ChangeRecord.owner_id == key_record.id,
+                models.ChangeRecord.id > since,
+            )
+            .order_by(models.ChangeRecord.id)
+            .limit(limit)
+        )
+    ).all()
+
+
 async def add_key(
     db: AsyncSession,
     key_id: str,
@@ -36,7 +229,7 @@ async def add_key(
         storage_size_limit=storage_limit or config.settings.USER_STORAGE_SIZE_LIMIT,
         is_activated=is_activated or config.settings.USER_IS_ACTIVATED_DEFAULT,
     )
-    return await update_record(db, key_record)
+    return update_record(db, key_record)
 
 
 async def return_or_create_root_folder(
@@ -55,7 +248,7 @@ async def return_or_create_root_folder(
     folder_record = models.FolderRecord(
         owner=key_record, name=models.ROOT_PATH, full_path=models.ROOT_PATH
     )
-    return await update_record(db, folder_record)
+    return update_record(db, folder_record)
 
 
 async def create_child_folder(
@@ -67,37 +260,63 @@ async def create_child_folder(
         name=name,
         full_path=posixpath.join(parent_folder.full_path, name),
     )
-    return await update_record(db, child_folder)
+    record_change(
+        db, parent_folder.owner_id, "create", "folder", child_folder.full_path
+    )
+    return update_record(db, child_folder)
 
 
 async def create_folders_recursively(
     db: AsyncSession, key_record: models.KeyRecord, folder_path: str
 ) -> models.FolderRecord:
-    current_folder = await return_or_create_root_folder(db, key_record)
-    path_components = split_into_components(folder_path)
-    for folder_name in path_components:
-        existing_child = next(
-            filter(
-                lambda current_folder: current_folder.name == folder_name,
-                await current_folder.awaitable_attrs.child_folders,
-            ),
-            None,
+    folder_paths = ancestor_paths(folder_path)
+    existing_folders = await db.execute(
+        select(models.FolderRecord.full_path, models.FolderRecord.id).where(
+            models.FolderRecord.owner_id == key_record.id,
+            models.FolderRecord.full_path.in_(folder_paths),
         )
-        if existing_child:
-            current_folder = existing_child
-            continue
-        current_folder = await create_child_folder(db, current_folder, folder_name)
-    return await update_record(db, current_folder)
+    )
+    existing_ids = {path: folder_id for path, folder_id in existing_folders}
+    new_folders = []
+    created_paths = []
+    parent_id = None
+    for path in folder_paths:
+        folder_id = existing_ids.get(path)
+        if folder_id is None:
+            folder_id = str(uuid4())
+            new_folders.append(
+                {
+                    "id": folder_id,
+                    "owner_id": key_record.id,
+                    "parent_id": parent_id,
+                    "name": split_head_and_tail(path)[1] or models.ROOT_PATH,
+                    "full_path": path,
+                }
+            )
+            if path != models.ROOT_PATH:
+                created_paths.append(path)
+        parent_id = folder_id
+    if new_folders:
+        await db.execute(insert(models.FolderRecord).values(new_folders))
+        for path in created_paths:
+            record_change(db, key_record.id, "create", "folder", path)
+    return (
+        await db.scalars(
+            select(models.FolderRecord).where(models.FolderRecord.id == parent_id)
+        )
+    ).one()
 
 
 async def rename_folder(
     db: AsyncSession, folder: models.FolderRecord, new_name: str
 ) -> models.FolderRecord:
+    old_path = folder.full_path
     folder.name = new_name
     parent_path, _ = split_head_and_tail(folder.full_path)
     folder.full_path = posixpath.join(parent_path, new_name)
-    await __update_child_full_paths(folder)
-    return await update_record(db, folder)
+    record_change(db, folder.owner_id, "rename", "folder", old_path, folder.full_path)
+    await __update_child_full_paths(db, folder, old_path)
+    return update_record(db, folder)
 
 
 async def move_folder(
@@ -105,14 +324,266 @@ async def move_folder(
     folder: models.FolderRecord,
     destination_folder: models.FolderRecord,
 ) -> models.FolderRecord:
+    old_path = folder.full_path
+    old_ancestors = set(ancestor_paths(split_head_and_tail(old_path)[0]))
+    new_ancestors = set(ancestor_paths(destination_folder.full_path))
+    size, count = subtree_totals(folder)
+    await update_folder_totals(
+        db,
+        folder.owner_id,
+        {path: (-size, -count) for path in old_ancestors - new_ancestors}
+        | {path: (size, count) for path in new_ancestors - old_ancestors},
+    )
     folder.parent_folder = destination_folder
     folder.full_path = posixpath.join(destination_folder.full_path, folder.name)
-    await __update_child_full_paths(folder)
-    return await update_record(db, folder)
+    record_change(db, folder.owner_id, "move", "folder", old_path, folder.full_path)
+    await __update_child_full_paths(db, folder, old_path)
+    return update_record(db, folder)
+
+
+async def find_folder(
+    db: AsyncSession, for_update: bool = False, **filters
+) -> models.FolderRecord | None:
+    query = select(models.FolderRecord).filter_by(**filters)
+    if for_update:
+        query = query.with_for_update()
+    return (await db.scalars(query)).first()
+
+
+async def list_folder_items(
+    db: AsyncSession,
+    folder: models.FolderRecord,
+    cursor: str | None = None,
+    limit: int | None = None,
+    order: SortOrder = "asc",
+    item_type: ItemType | None = None,
+    prefix: str | None = None,
+) -> AsyncIterator[RowMapping]:
+    files_query: Select = select(
+        models.FileRecord.filename.label("name"),
+        literal("file").label("type"),
+        models.FileRecord.size.label("size"),
+        models.FileRecord.last_modified.label("last_modified"),
+    ).where(models.FileRecord.folder_id == folder.id)
+    folders_query: Select = select(
+        models.FolderRecord.name.label("name"),
+        literal("folder").label("type"),
+        cast(null(), Integer).label("size"),
+        cast(null(), DateTime).label("last_modified"),
+    ).where(models.FolderRecord.parent_id == folder.id)
+    if prefix:
+        files_query = files_query.where(
+            models.FileRecord.filename.startswith(prefix, autoescape=True)
+        )
+        folders_query = folders_query.where(
+            models.FolderRecord.name.startswith(prefix, autoescape=True)
+        )
+    match item_type:
+        case "file":
+            items = files_query.subquery()
+        case "folder":
+            items = folders_query.subquery()
+        case _:
+            items = union_all(files_query, folders_query).subquery()
+    query = select(items)
+    if order == "desc":
+        query = query.order_by(items.c.name.desc())
+        if cursor is not None:
+            query = query.where(items.c.name < cursor)
+    else:
+        query = query.order_by(items.c.name)
+        if cursor is not None:
+            query = query.where(items.c.name > cursor)
+    if limit is not None:
+        query = query.limit(limit)
+    async for row in (await db.stream(query)).mappings():
+        yield row
+
+
+def path_depth(path: SQLColumnExpression[str]) -> ColumnElement[int]:
+    return func.length(path) - func.length(func.replace(path, posixpath.sep, ""))
+
+
+async def list_folder_tree(
+    db: AsyncSession, folder: models.FolderRecord, max_depth: int | None = None
+) -> AsyncIterator[RowMapping]:
+    prefix = add_trailing_slash(folder.full_path)
+    files_query: Select = (
+        select(
+            models.FileRecord.full_path.label("path"),
+            models.FileRecord.filename.label("name"),
+            literal("file").label("type"),
+            models.FileRecord.size.label("size"),
+            models.FileRecord.last_modified.label("last_modified"),
+        )
+        .join(models.FileRecord.folder)
+        .where(
+            models.FolderRecord.owner_id == folder.owner_id,
+            path_range(models.FileRecord.full_path, prefix),
+        )
+    )
+    folders_query: Select = select(
+        models.FolderRecord.full_path.label("path"),
+        models.FolderRecord.name.label("name"),
+        literal("folder").label("type"),
+        cast(null(), Integer).label("size"),
+        cast(null(), DateTime).label("last_modified"),
+    ).where(
+        models.FolderRecord.owner_id == folder.owner_id,
+        models.FolderRecord.id != folder.id,
+        path_range(models.FolderRecord.full_path, prefix),
+    )
+    if max_depth is not None:
+        max_path_depth = prefix.count(posixpath.sep) + max_depth - 1
+        files_query = files_query.where(
+            path_depth(models.FileRecord.full_path) <= max_path_depth
+        )
+        folders_query = folders_query.where(
+            path_depth(models.FolderRecord.full_path) <= max_path_depth
+        )
+    items = union_all(files_query, folders_query).subquery()
+    async for row in (await db.stream(select(items).order_by(items.c.path))).mappings():
+        yield row
+
+
+def glob_to_like(pattern: str) -> str:
+    for special in (LIKE_ESCAPE, "%", "_"):
+        pattern = pattern.replace(special, LIKE_ESCAPE + special)
+    return pattern.replace("*", "%").replace("?", "_")
+
+
+class PathRange(ColumnElement[bool]):
+    __visit_name__ = "path_range"
+    inherit_cache = True
+    type = Boolean()
+    _is_implicitly_boolean = True
+    _traverse_internals = [
+        ("path", InternalTraversal.dp_clauseelement),
+        ("lower", InternalTraversal.dp_clauseelement),
+        ("upper", InternalTraversal.dp_clauseelement),
+    ]
+
+    def __init__(
+        self, path: SQLColumnExpression[str], prefix: str | SQLColumnExpression[str]
+    ) -> None:
+        self.path = path
+        self.lower: SQLColumnExpression[str]
+        self.upper: SQLColumnExpression[str]
+        if isinstance(prefix, str):
+            self.lower = literal(prefix, String)
+            self.upper = literal(prefix + PATH_RANGE_END, String)
+        else:
+            self.lower = prefix
+            self.upper = prefix + PATH_RANGE_END
+
+
+@compiles(PathRange)
+def compile_path_range(element: PathRange, compiler: SQLCompiler, **kw) -> str:
+    # SQLite compares with the byte-wise BINARY collation unless told
+    # otherwise, while its LIKE ignores case.
+    return compiler.process(
+        and_(element.path >= element.lower, element.path < element.upper), **kw
+    )
+
+
+@compiles(PathRange, "postgresql")
+def compile_path_range_postgresql(
+    element: PathRange, compiler: SQLCompiler, **kw
+) -> str:
+    # Plain comparisons follow the column collation, which may order "/ab/"
+    # between "/a/" and its upper bound. The pattern operators compare bytes
+    # and are the ones the text_pattern_ops path indexes serve.
+    return compiler.process(
+        and_(
+            element.path.op("~>=~", is_comparison=True)(element.lower),
+            element.path.op("~<~", is_comparison=True)(element.upper),
+        ),
+        **kw,
+    )
+
+
+def path_range(
+    path: SQLColumnExpression[str], prefix: str | SQLColumnExpression[str]
+) -> ColumnElement[bool]:
+    # A range instead of LIKE lets every backend use the path indexes.
+    return PathRange(path, prefix)
+
+
+def match_path(
+    path: SQLColumnExpression[str], query: str, mode: SearchMode
+) -> ColumnElement[bool]:
+    match mode:
+        case "prefix":
+            return path_range(path, query)
+        case "glob":
+            literal_prefix = re.split(r"[*?]", query, maxsplit=1)[0]
+            return and_(
+                path_range(path, literal_prefix),
+                path.like(glob_to_like(query), escape=LIKE_ESCAPE),
+            )
+        case _:
+            return path.contains(query, autoescape=True)
 
 
-async def find_folder(db: AsyncSession, **filters) -> models.FolderRecord | None:
-    return (await db.scalars(select(models.FolderRecord).filter_by(**filters))).first()
+async def search_items(
+    db: AsyncSession,
+    key_record: models.KeyRecord,
+    query: str,
+    mode: SearchMode = "substring",
+    cursor: str | None = None,
+    limit: int | None = None,
+    item_type: ItemType | None = None,
+) -> AsyncIterator[RowMapping]:
+    # Filtering by owner through a subquery instead of a join lets the planner
+    # walk the full path index in order and stop once the page is filled.
+    owned_folders = select(models.FolderRecord.id).where(
+        models.FolderRecord.owner_id == key_record.id
+    )
+    files_query: Select = select(
+        models.FileRecord.full_path.label("path"),
+        models.FileRecord.filename.label("name"),
+        literal("file").label("type"),
+        models.FileRecord.size.label("size"),
+        models.FileRecord.last_modified.label("last_modified"),
+    ).where(
+        models.FileRecord.folder_id.in_(owned_folders),
+        match_path(models.FileRecord.full_path, query, mode),
+    )
+    folders_query: Select = select(
+        models.FolderRecord.full_path.label("path"),
+        models.FolderRecord.name.label("name"),
+        literal("folder").label("type"),
+        cast(null(), Integer).label("size"),
+        cast(null(), DateTime).label("last_modified"),
+    ).where(
+        models.FolderRecord.owner_id == key_record.id,
+        models.FolderRecord.parent_id.is_not(None),
+        match_path(models.FolderRecord.full_path, query, mode),
+    )
+    if cursor is not None:
+        files_query = files_query.where(models.FileRecord.full_path > cursor)
+        folders_query = folders_query.where(models.FolderRecord.full_path > cursor)
+    if limit is not None:
+        files_query = select(
+            files_query.order_by(models.FileRecord.full_path).limit(limit).subquery()
+        )
+        folders_query = select(
+            folders_query.order_by(models.FolderRecord.full_path)
+            .limit(limit)
+            .subquery()
+        )
+    match item_type:
+        case "file":
+            items = files_query.subquery()
+        case "folder":
+            items = folders_query.subquery()
+        case _:
+            items = union_all(files_query, folders_query).subquery()
+    search_query = select(items).order_by(items.c.path)
+    if limit is not None:
+        search_query = search_query.limit(limit)
+    async for row in (await db.stream(search_query)).mappings():
+        yield row
 
 
 async def folder_exists(db: AsyncSession, **filters) -> bool:
@@ -122,16 +593,17 @@ async def folder_exists(db: AsyncSession, **filters) -> bool:
 
 
 async def find_file(
-    db: AsyncSession, owner: models.KeyRecord, **filters
+    db: AsyncSession, owner: models.KeyRecord, for_update: bool = False, **filters
 ) -> models.FileRecord | None:
-    return (
-        await db.scalars(
-            select(models.FileRecord)
-            .filter_by(**filters)
-            .join(models.FileRecord.folder)
-            .where(models.FolderRecord.owner == owner)
-        )
-    ).first()
+    query = (
+        select(models.FileRecord)
+        .filter_by(**filters)
+        .join(models.FileRecord.folder)
+        .where(models.FolderRecord.owner == owner)
+    )
+    if for_update:
+        query = query.with_for_update(of=models.FileRecord)
+    return (await db.scalars(query)).first()
 
 
 async def file_exists(db: AsyncSession, owner: models.KeyRecord, **filters) -> bool:
@@ -141,11 +613,47 @@ async def file_exists(db: AsyncSession, owner: models.KeyRecord, **filters) -> b
 async def item_in_folder(
     db: AsyncSession, name: str, folder: models.FolderRecord
 ) -> bool:
-    existing_folder_found = await folder_exists(db, parent_folder=folder, name=name)
-    existing_file_found = await file_exists(
-        db, owner=await folder.awaitable_attrs.owner, folder=folder, filename=name
+    return bool(
+        await db.scalar(
+            select(
+                or_(
+                    exists().where(
+                        models.FolderRecord.parent_id == folder.id,
+                        models.FolderRecord.name == name,
+                    ),
+                    exists().where(
+                        models.FileRecord.folder_id == folder.id,
+                        models.FileRecord.filename == name,
+                    ),
+                )
+            )
+        )
+    )
+
+
+async def delete_folder(db: AsyncSession, folder: models.FolderRecord):
+    size, count = subtree_totals(folder)
+    parent_path, _ = split_head_and_tail(folder.full_path)
+    await update_folder_totals(
+        db,
+        folder.owner_id,
+        {path: (-size, -count) for path in ancestor_paths(parent_path)},
+    )
+    folder_ids = select(models.FolderRecord.id).where(
+        models.FolderRecord.owner_id == folder.owner_id,
+        or_(
+            models.FolderRecord.id == folder.id,
+            path_range(
+                models.FolderRecord.full_path, add_trailing_slash(folder.full_path)
+            ),
+        ),
+    )
+    await db.execute(
+        delete(models.FileRecord).where(models.FileRecord.folder_id.in_(folder_ids))
+    )
+    await db.execute(
+        delete(models.FolderRecord).where(models.FolderRecord.id.in_(folder_ids))
     )
-    return existing_file_found or existing_folder_found
 
 
 async def create_file_record(
@@ -154,6 +662,7 @@ async def create_file_record(
     filename: str,
     storage: models.StorageRecord,
     size: int,
+    file_id: str | None = None,
 ) -> models.FileRecord:
     file_record = models.FileRecord(
         folder=folder,
@@ -162,14 +671,144 @@ async def create_file_record(
         full_path=posixpath.join(folder.full_path, filename),
         size=size,
     )
-    return await update_record(db, file_record)
+    if file_id:
+        file_record.id = file_id
+    record_change(db, folder.owner_id, "upload", "file", file_record.full_path)
+    await update_file_totals(db, folder.owner_id, file_record.full_path, size, 1)
+    return update_record(db, file_record)
 
 
-async def calculate_used_storage(db: AsyncSession, key_record: models.KeyRecord) -> int:
+async def create_upload_record(
+    db: AsyncSession,
+    key_record: models.KeyRecord,
+    storage: models.StorageRecord,
+    full_path: str,
+    size: int,
+    file_record: models.FileRecord | None = None,
+    kind: str = "upload",
+) -> models.UploadRecord:
+    upload_record = models.UploadRecord(
+        owner=key_record,
+        storage=storage,
+        full_path=full_path,
+        size=size,
+        kind=kind,
+    )
+    if file_record:
+        upload_record.file_id = file_record.id
+    return update_record(db, upload_record)
+
+
+async def has_pending_upload(db: AsyncSession, file_id: str) -> bool:
+    return bool(
+        await db.scalar(select(exists().where(models.UploadRecord.file_id == file_id)))
+    )
+
+
+async def refresh_upload_record(db: AsyncSession, upload_id: str) -> bool:
+    refreshed_id = await db.scalar(
+        update(models.UploadRecord)
+        .where(models.UploadRecord.id == upload_id)
+        .values(refreshed_at=datetime.utcnow())
+        .returning(models.UploadRecord.id)
+        .execution_options(synchronize_session=False)
+    )
+    return refreshed_id is not None
+
+
+async def delete_upload_record(db: AsyncSession, upload_id: str):
+    await db.execute(
+        delete(models.UploadRecord).where(models.UploadRecord.id == upload_id)
+    )
+
+
+async def find_abandoned_uploads(
+    db: AsyncSession, refreshed_before: datetime
+) -> Sequence[models.UploadRecord]:
     return (
-        await db.scalar(
-            select(func.sum(models.FileRecord.size))
-            .join(models.FileRecord.folder)
-            .where(models.FolderRecord.owner == key_record)
+        await db.scalars(
+            select(models.UploadRecord)
+            .options(
+                joinedload(models.UploadRecord.owner),
+                joinedload(models.UploadRecord.storage),
+            )
+            .where(models.UploadRecord.refreshed_at < refreshed_before)
         )
-    ) or 0
+    ).all()
+
+
+def root_total_size(key_record: models.KeyRecord) -> Select:
+    return select(models.FolderRecord.total_size).where(
+        models.FolderRecord.owner_id == key_record.id,
+        models.FolderRecord.full_path == models.ROOT_PATH,
+    )
+
+
+async def calculate_used_storage(db: AsyncSession, key_record: models.KeyRecord) -> int:
+    return (await db.scalar(root_total_size(key_record))) or 0
+
+
+async def calculate_allocated_storage(
+    db: AsyncSession, key_record: models.KeyRecord
+) -> int:
+    used_storage = func.coalesce(root_total_size(key_record).scalar_subquery(), 0)
+    reserved_storage = (
+        select(func.coalesce(func.sum(models.UploadRecord.size), 0))
+        .where(
+            models.UploadRecord.owner == key_record,
+            models.UploadRecord.kind == "upload",
+        )
+        .scalar_subquery()
+    )
+    return (await db.scalar(select(used_storage + reserved_storage))) or 0
+
+
+async def calculate_storage_usage(db: AsyncSession) -> dict[str, tuple[int, int]]:
+    files_size = (
+        select(
+            models.FileRecord.storage_id,
+            func.sum(models.FileRecord.size).label("size"),
+        )
+        .group_by(models.FileRecord.storage_id)
+        .subquery()
+    )
+    reserved_size = (
+        select(
+            models.UploadRecord.storage_id,
+            func.sum(models.UploadRecord.size).label("size"),
+        )
+        .group_by(models.UploadRecord.storage_id)
+        .subquery()
+    )
+    rows = await db.execute(
+        select(
+            models.StorageRecord.id,
+            func.coalesce(files_size.c.size, 0),
+            func.coalesce(reserved_size.c.size, 0),
+        )
+        .outerjoin(files_size, files_size.c.storage_id == models.StorageRecord.id)
+        .outerjoin(reserved_size, reserved_size.c.storage_id == models.StorageRecord.id)
+    )
+    return {storage_id: (used, reserved) for storage_id, used, reserved in rows}
+
+
+async def find_blob_ids(
+    db: AsyncSession,
+    storage: models.StorageRecord,
+    blob_ids: Sequence[str] | None = None,
+    include_uploads: bool = True,
+) -> set[str]:
+    files_query: Select = select(models.FileRecord.id).where(
+        models.FileRecord.storage_id == storage.id
+    )
+    if blob_ids is not None:
+        files_query = files_query.where(models.FileRecord.id.in_(blob_ids))
+    if not include_uploads:
+        return set(await db.scalars(files_query))
+    upload_blob_id = func.coalesce(models.UploadRecord.file_id, models.UploadRecord.id)
+    uploads_query = select(upload_blob_id).where(
+        models.UploadRecord.storage_id == storage.id
+    )
+    if blob_ids is not None:
+        uploads_query = uploads_query.where(upload_blob_id.in_(blob_ids))
+    return set(await db.scalars(union_all(files_query, uploads_query)))
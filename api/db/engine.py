@@ -1,17 +1,124 @@
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+import asyncio
+from contextlib import AsyncExitStack
+
+from cachetools import TTLCache
+from fastapi import Request
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
 
 from .. import config
+from ..schemas.monitoring import PoolStatus
+from .pool import MonitoredQueuePool
 
-engine = create_async_engine(
-    config.settings.DATABASE_URL,
-    isolation_level=config.settings.DATABASE_ISOLATION_LEVEL,
-)
+READ_ONLY_METHODS = ("GET", "HEAD", "OPTIONS")
+SERIALIZATION_FAILURE_CODES = ("40001", "40P01")
+
+
+def create_engine(url: str) -> AsyncEngine:
+    return create_async_engine(
+        url,
+        isolation_level=config.settings.DATABASE_ISOLATION_LEVEL,
+        poolclass=MonitoredQueuePool,
+        pool_size=config.settings.DATABASE_POOL_SIZE,
+        max_overflow=config.settings.DATABASE_MAX_OVERFLOW,
+        pool_timeout=config.settings.DATABASE_POOL_TIMEOUT,
+        pool_recycle=config.settings.DATABASE_POOL_RECYCLE,
+        pool_pre_ping=config.settings.DATABASE_POOL_PRE_PING,
+        query_cache_size=config.settings.DATABASE_STATEMENT_CACHE_SIZE,
+    )
+
+
+def create_read_engine(engine: AsyncEngine) -> AsyncEngine:
+    return engine.execution_options(
+        isolation_level=config.settings.DATABASE_READ_ISOLATION_LEVEL
+    )
+
+
+engine = create_engine(config.settings.DATABASE_URL)
+read_engine = create_read_engine(engine)
 async_session = async_sessionmaker(engine, expire_on_commit=False)
+async_read_session = async_sessionmaker(read_engine, expire_on_commit=False)
+
+replica_engine: AsyncEngine | None = None
+async_replica_session: async_sessionmaker[AsyncSession] | None = None
+if config.settings.DATABASE_REPLICA_URL:
+    replica_engine = create_read_engine(
+        create_engine(config.settings.DATABASE_REPLICA_URL)
+    )
+    async_replica_session = async_sessionmaker(replica_engine, expire_on_commit=False)
+
 
+def create_get_db_dependency(
+    async_session: async_sessionmaker[AsyncSession],
+    async_read_session: async_sessionmaker[AsyncSession] | None = None,
+    async_replica_session: async_sessionmaker[AsyncSession] | None = None,
+):
+    # Read-your-writes within this process only, see DATABASE_REPLICA_LAG.
+    recent_writers: TTLCache[str, bool] = TTLCache(
+        config.settings.DATABASE_REPLICA_ROUTING_CACHE_SIZE,
+        config.settings.DATABASE_REPLICA_LAG,
+    )
 
-def create_get_db_dependency(async_session: async_sessionmaker[AsyncSession]):
-    async def get_db():
-        async with async_session.begin() as session:
+    async def get_db(request: Request):
+        key_id = request.headers.get("key-id")
+        if async_read_session and request.method in READ_ONLY_METHODS:
+            read_session = async_read_session
+            if async_replica_session and key_id not in recent_writers:
+                read_session = async_replica_session
+            async with read_session() as session:
+                session.info["read_only"] = True
+                session.info["replica"] = read_session is async_replica_session
+                yield session
+            return
+        if key_id:
+            recent_writers[key_id] = True
+        async with async_session() as session:
+            request.state.db_session = session
             yield session
+            await session.commit()
+        if key_id:
+            recent_writers[key_id] = True
 
     return get_db
+
+
+def is_read_only(db: AsyncSession) -> bool:
+    return db.info.get("read_only", False)
+
+
+def is_replica(db: AsyncSession) -> bool:
+    return db.info.get("replica", False)
+
+
+def is_serialization_failure(exc: DBAPIError) -> bool:
+    sqlstate = getattr(exc.orig, "sqlstate", None)
+    return sqlstate in SERIALIZATION_FAILURE_CODES or "database is locked" in str(
+        exc.orig
+    )
+
+
+async def prewarm_pool(engine: AsyncEngine, connections: int) -> None:
+    async with AsyncExitStack() as stack:
+        await asyncio.gather(
+            *(stack.enter_async_context(engine.connect()) for _ in range(connections))
+        )
+
+
+def get_pool_status(engine: AsyncEngine) -> PoolStatus:
+    pool = engine.pool
+    if not isinstance(pool, MonitoredQueuePool):
+        return PoolStatus()
+    return PoolStatus(
+        size=pool.size(),
+        checked_in=pool.checkedin(),
+        checked_out=pool.checkedout(),
+        overflow=pool.overflow(),
+        checkouts=pool.checkouts,
+        wait_time=pool.wait_time,
+        max_wait_time=pool.max_wait_time,
+    )
@@ -2,7 +2,7 @@ from datetime import datetime
 from typing import Annotated, Optional, TypeVar
 from uuid import uuid4
 
-from sqlalchemy import DateTime, ForeignKey
+from sqlalchemy import DDL, DateTime, ForeignKey, Index, event
 from sqlalchemy.ext.asyncio import AsyncAttrs
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import (
@@ -13,8 +13,7 @@ from sqlalchemy.orm import (
     relationship,
 )
 
-from ..schemas.base import FileInfo
-from ..schemas.folders import FolderContent
+from ..schemas.changes import Change
 from ..utils.path_utils import ROOT_PATH
 
 
@@ -22,11 +21,21 @@ class Base(AsyncAttrs, MappedAsDataclass, DeclarativeBase):
     pass
 
 
+event.listen(
+    Base.metadata,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+
+
 strpk = Annotated[str, mapped_column(primary_key=True)]
-uuidpk = Annotated[
-    str,
-    mapped_column(primary_key=True, default=lambda: str(uuid4())),
-]
+
+
+def generate_id() -> str:
+    return str(uuid4())
+
+
+uuidpk = Annotated[str, mapped_column(primary_key=True, default=generate_id)]
 
 
 class KeyRecord(Base):
@@ -45,8 +54,23 @@ class KeyRecord(Base):
 
 class FolderRecord(Base):
     __tablename__ = "folders"
+    __table_args__ = (
+        Index("ix_folders_parent_id_name", "parent_id", "name"),
+        Index(
+            "ix_folders_owner_id_full_path",
+            "owner_id",
+            "full_path",
+            postgresql_ops={"full_path": "text_pattern_ops"},
+        ),
+        Index(
+            "ix_folders_full_path_trgm",
+            "full_path",
+            postgresql_using="gin",
+            postgresql_ops={"full_path": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
 
-    id: Mapped[uuidpk] = mapped_column(init=False)
+    id: Mapped[uuidpk] = mapped_column(init=False, default_factory=generate_id)
     owner_id: Mapped[str] = mapped_column(ForeignKey("public_keys.id"), default=None)
     parent_id: Mapped[Optional[str]] = mapped_column(
         ForeignKey("folders.id", ondelete="CASCADE"),
@@ -54,6 +78,9 @@ class FolderRecord(Base):
     )
     name: Mapped[str] = mapped_column(default=ROOT_PATH)
     full_path: Mapped[str] = mapped_column(default=ROOT_PATH)
+    # Aggregates over every file below the folder, kept current by crud.
+    total_size: Mapped[int] = mapped_column(default=0, server_default="0", init=False)
+    file_count: Mapped[int] = mapped_column(default=0, server_default="0", init=False)
 
     owner: Mapped[KeyRecord] = relationship(
         "KeyRecord", back_populates="folders", default=None
@@ -77,30 +104,28 @@ class FolderRecord(Base):
         default_factory=list,
     )
 
-    @hybrid_property
-    async def size(self) -> int:
-        files_size = sum(file.size for file in await self.awaitable_attrs.files)
-        child_folders_size = 0
-        for child_folder in await self.awaitable_attrs.child_folders:
-            child_folders_size += await child_folder.size
-        return files_size + child_folders_size
-
-    async def json(self) -> FolderContent:
-        return FolderContent(
-            files=map(lambda file: file.json(), await self.awaitable_attrs.files),
-            folders=map(
-                lambda folder: folder.name, await self.awaitable_attrs.child_folders
-            ),
-        )
-
 
 class FileRecord(Base):
     __tablename__ = "files"
+    __table_args__ = (
+        Index("ix_files_folder_id_filename", "folder_id", "filename"),
+        Index(
+            "ix_files_full_path",
+            "full_path",
+            postgresql_ops={"full_path": "text_pattern_ops"},
+        ),
+        Index(
+            "ix_files_full_path_trgm",
+            "full_path",
+            postgresql_using="gin",
+            postgresql_ops={"full_path": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
 
     filename: Mapped[str]
     full_path: Mapped[str]
     size: Mapped[int]
-    id: Mapped[uuidpk] = mapped_column(init=False)
+    id: Mapped[uuidpk] = mapped_column(init=False, default_factory=generate_id)
     folder_id: Mapped[str] = mapped_column(ForeignKey("folders.id"), default=None)
     storage_id: Mapped[str] = mapped_column(ForeignKey("storages.id"), default=None)
     last_modified: Mapped[datetime] = mapped_column(
@@ -119,13 +144,6 @@ class FileRecord(Base):
         folder = await self.awaitable_attrs.folder
         return await folder.awaitable_attrs.owner
 
-    def json(self) -> FileInfo:
-        return FileInfo(
-            name=self.filename,
-            size=self.size,
-            last_modified=self.last_modified,
-        )
-
     def update_timestamp(self) -> None:
         self.last_modified = datetime.utcnow()
 
@@ -149,4 +167,67 @@ class StorageRecord(Base):
         return self.capacity - self.used_space
 
 
-Record = TypeVar("Record", KeyRecord, FolderRecord, FileRecord, StorageRecord)
+class UploadRecord(Base):
+    __tablename__ = "uploads"
+
+    full_path: Mapped[str]
+    size: Mapped[int]
+    id: Mapped[uuidpk] = mapped_column(init=False, default_factory=generate_id)
+    owner_id: Mapped[str] = mapped_column(ForeignKey("public_keys.id"), default=None)
+    storage_id: Mapped[str] = mapped_column(ForeignKey("storages.id"), default=None)
+    file_id: Mapped[Optional[str]] = mapped_column(default=None)
+    # "upload" reservations count toward the owner's quota, "move" ones hold
+    # a file while the rebalancer copies its blob to another storage.
+    kind: Mapped[str] = mapped_column(default="upload")
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, insert_default=datetime.utcnow, init=False
+    )
+    refreshed_at: Mapped[datetime] = mapped_column(
+        DateTime, insert_default=datetime.utcnow, init=False
+    )
+
+    owner: Mapped[KeyRecord] = relationship("KeyRecord", default=None)
+    storage: Mapped[StorageRecord] = relationship("StorageRecord", default=None)
+
+    @property
+    def blob_id(self) -> str:
+        return self.file_id or self.id
+
+
+class ChangeRecord(Base):
+    __tablename__ = "changes"
+    __table_args__ = (
+        Index("ix_changes_owner_id_id", "owner_id", "id"),
+        {"sqlite_autoincrement": True},
+    )
+
+    owner_id: Mapped[str] = mapped_column(ForeignKey("public_keys.id"))
+    action: Mapped[str]
+    item_type: Mapped[str]
+    path: Mapped[str]
+    new_path: Mapped[Optional[str]] = mapped_column(default=None)
+    id: Mapped[int] = mapped_column(primary_key=True, init=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, insert_default=datetime.utcnow, init=False
+    )
+
+    def json(self) -> Change:
+        return Change(
+            id=self.id,
+            action=self.action,
+            type=self.item_type,
+            path=self.path,
+            new_path=self.new_path,
+            created_at=self.created_at,
+        )
+
+
+Record = TypeVar(
+    "Record",
+    KeyRecord,
+    FolderRecord,
+    FileRecord,
+    StorageRecord,
+    UploadRecord,
+    ChangeRecord,
+)
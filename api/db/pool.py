@@ -0,0 +1,35 @@
+import time
+from threading import Lock
+
+from sqlalchemy.pool import AsyncAdaptedQueuePool, PoolProxiedConnection
+
+
+class MonitoredQueuePool(AsyncAdaptedQueuePool):
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._stats_lock = Lock()
+        self._checkouts = 0
+        self._wait_time = 0.0
+        self._max_wait_time = 0.0
+
+    @property
+    def checkouts(self) -> int:
+        return self._checkouts
+
+    @property
+    def wait_time(self) -> float:
+        return self._wait_time
+
+    @property
+    def max_wait_time(self) -> float:
+        return self._max_wait_time
+
+    def connect(self) -> PoolProxiedConnection:
+        started_at = time.perf_counter()
+        connection = super().connect()
+        waited = time.perf_counter() - started_at
+        with self._stats_lock:
+            self._checkouts += 1
+            self._wait_time += waited
+            self._max_wait_time = max(self._max_wait_time, waited)
+        return connection
@@ -0,0 +1,103 @@
+from typing import Type, TypeVar
+
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..utils.caching import ItemKind, path_cache
+from ..utils.path_utils import split_head_and_tail
+from . import models
+
+CachedRecord = TypeVar("CachedRecord", models.FolderRecord, models.FileRecord)
+
+
+class RecordResolver:
+    def __init__(
+        self,
+        db: AsyncSession,
+        key_record: models.KeyRecord,
+        for_update: bool = False,
+    ):
+        self._session = db
+        self._client = key_record
+        self._for_update = for_update
+        self._folders: dict[str, models.FolderRecord | None] = {}
+        self._files: dict[str, models.FileRecord | None] = {}
+
+    @property
+    def client(self) -> models.KeyRecord:
+        return self._client
+
+    async def prefetch(self, *paths: str, refresh: bool = False):
+        file_paths = {
+            path
+            for path in paths
+            if refresh or path not in self._files or path not in self._folders
+        }
+        if not file_paths:
+            return
+        folder_paths = file_paths | {split_head_and_tail(path)[0] for path in paths}
+        query = (
+            select(models.FolderRecord, models.FileRecord)
+            .outerjoin(
+                models.FileRecord,
+                and_(
+                    models.FileRecord.folder_id == models.FolderRecord.id,
+                    models.FileRecord.full_path.in_(file_paths),
+                ),
+            )
+            .where(
+                models.FolderRecord.owner_id == self._client.id,
+                models.FolderRecord.full_path.in_(folder_paths),
+            )
+        )
+        if self._for_update:
+            query = query.with_for_update(of=models.FolderRecord)
+        if refresh:
+            query = query.execution_options(populate_existing=True)
+        rows = (await self._session.execute(query)).all()
+        self._folders.update(dict.fromkeys(folder_paths))
+        self._files.update(dict.fromkeys(file_paths))
+        for folder_record, file_record in rows:
+            self._folders[folder_record.full_path] = folder_record
+            path_cache.put(
+                self._client.id, folder_record.full_path, "folder", folder_record.id
+            )
+            if file_record:
+                self._files[file_record.full_path] = file_record
+                path_cache.put(
+                    self._client.id, file_record.full_path, "file", file_record.id
+                )
+
+    async def folder(self, path: str) -> models.FolderRecord | None:
+        if path not in self._folders:
+            folder_record = await self.__get_cached(models.FolderRecord, "folder", path)
+            if folder_record is None:
+                await self.prefetch(path)
+            else:
+                self._folders[path] = folder_record
+        return self._folders[path]
+
+    async def file(self, path: str) -> models.FileRecord | None:
+        if path not in self._files:
+            file_record = await self.__get_cached(models.FileRecord, "file", path)
+            if file_record is None:
+                await self.prefetch(path)
+            else:
+                self._files[path] = file_record
+        return self._files[path]
+
+    async def __get_cached(
+        self, model: Type[CachedRecord], kind: ItemKind, path: str
+    ) -> CachedRecord | None:
+        record_id = path_cache.get(self._client.id, path, kind)
+        if record_id is None:
+            return None
+        record = await self._session.get(
+            model, record_id, with_for_update=self._for_update or None
+        )
+        # Ids never move between owners, but an invalidation from another
+        # instance may not have arrived yet, so the path is checked again.
+        if record is None or record.full_path != path:
+            path_cache.discard(self._client.id, path)
+            return None
+        return record
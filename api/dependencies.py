@@ -1,5 +1,6 @@
 import base64
 import binascii
+import secrets
 
 from fastapi import Depends, Header, status
 from KEK.exceptions import VerificationError
@@ -7,23 +8,38 @@ from KEK.hybrid import PublicKEK
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from . import config
 from .db import crud, models
-from .db.engine import async_session, create_get_db_dependency
+from .db.engine import (
+    async_read_session,
+    async_replica_session,
+    async_session,
+    create_get_db_dependency,
+    is_read_only,
+)
+from .db.resolver import RecordResolver
 from .exceptions import client, core
+from .utils.metrics import TOKEN_VERIFICATION_DURATION
 from .utils.path_utils import normalize
 from .utils.sessions import BaseSessionStorage, create_session_dependency
 from .utils.storage import StorageClient
+from .utils.tracing import traced
 
 get_session = create_session_dependency()
-get_db = create_get_db_dependency(async_session)
+get_db = create_get_db_dependency(
+    async_session, async_read_session, async_replica_session
+)
 
 
+@traced
 async def get_key_record(
     key_id: str = Header(),
     db: AsyncSession = Depends(get_db),
     session_storage: BaseSessionStorage = Depends(get_session),
 ) -> models.KeyRecord:
-    key_record = await db.get(models.KeyRecord, key_id)
+    key_record = await db.get(
+        models.KeyRecord, key_id, with_for_update=not is_read_only(db)
+    )
     if key_record is None:
         with session_storage.lock:
             token = session_storage.get(key_id) or session_storage.add(key_id)
@@ -31,23 +47,34 @@ async def get_key_record(
     return key_record
 
 
+@traced
 def get_key(key_record: models.KeyRecord = Depends(get_key_record)) -> PublicKEK:
     public_key = PublicKEK.load(key_record.public_key.encode("ascii"))
     return public_key
 
 
+@traced
 def get_path(path: str = Header()) -> str:
     return normalize(path)
 
 
-async def get_folder_record(
-    path: str = Depends(get_path),
+@traced
+def get_resolver(
     key_record: models.KeyRecord = Depends(get_key_record),
     db: AsyncSession = Depends(get_db),
+) -> RecordResolver:
+    return RecordResolver(db, key_record, for_update=not is_read_only(db))
+
+
+@traced
+async def get_folder_record(
+    path: str = Depends(get_path),
+    resolver: RecordResolver = Depends(get_resolver),
 ) -> models.FolderRecord | None:
-    return await crud.find_folder(db, owner=key_record, full_path=normalize(path))
+    return await resolver.folder(path)
 
 
+@traced
 def get_folder_record_required(
     folder_record: models.FolderRecord | None = Depends(get_folder_record),
 ) -> models.FolderRecord:
@@ -56,14 +83,15 @@ def get_folder_record_required(
     return folder_record
 
 
+@traced
 async def get_file_record(
     path: str = Depends(get_path),
-    key_record: models.KeyRecord = Depends(get_key_record),
-    db: AsyncSession = Depends(get_db),
+    resolver: RecordResolver = Depends(get_resolver),
 ) -> models.FileRecord | None:
-    return await crud.find_file(db, owner=key_record, full_path=normalize(path))
+    return await resolver.file(path)
 
 
+@traced
 def get_file_record_required(
     file_record: models.FileRecord | None = Depends(get_file_record),
 ) -> models.FileRecord:
@@ -72,6 +100,7 @@ def get_file_record_required(
     return file_record
 
 
+@traced
 async def validate_file_size(
     existing_file_record: models.FileRecord | None = Depends(get_file_record),
     file_size: int = Header(),
@@ -83,17 +112,19 @@ async def validate_file_size(
     else:
         existing_file_size = 0
     file_size_diff = file_size - existing_file_size
-    available_space = key_record.storage_size_limit - await crud.calculate_used_storage(
-        db, key_record
+    available_space = (
+        key_record.storage_size_limit
+        - await crud.calculate_allocated_storage(db, key_record)
     )
     if file_size_diff > available_space:
         raise client.NotEnoughSpace()
     return file_size_diff
 
 
+@traced
 async def get_available_storage(
     file_size_diff: int = Depends(validate_file_size),
-    key_record: models.KeyRecord = Depends(get_key_record),
+    resolver: RecordResolver = Depends(get_resolver),
     db: AsyncSession = Depends(get_db),
 ) -> StorageClient:
     storages = (
@@ -108,16 +139,17 @@ async def get_available_storage(
     ).all()
     for storage in storages:
         # TODO ping storage
-        return StorageClient(db, key_record, storage)
+        return StorageClient(db, resolver.client, storage, resolver)
     raise core.NoAvailableStorage()
 
 
+@traced
 def verify_token(
     signed_token: str | None = Header(default=None),
     key: PublicKEK = Depends(get_key),
     session_storage: BaseSessionStorage = Depends(get_session),
 ):
-    with session_storage.lock:
+    with TOKEN_VERIFICATION_DURATION.time(), session_storage.lock:
         key_id = key.key_id.hex()
         if key_id not in session_storage:
             raise client.AuthenticationRequired(session_storage.add(key_id))
@@ -129,3 +161,14 @@ def verify_token(
             assert key.verify(decoded_token, str(token).encode())
         except (binascii.Error, VerificationError, AssertionError) as exc:
             raise client.AuthenticationFailed(token) from exc
+
+
+@traced
+def verify_admin_token(authorization: str | None = Header(default=None)):
+    admin_token = config.settings.ADMIN_TOKEN
+    if (
+        not admin_token
+        or authorization is None
+        or not secrets.compare_digest(authorization, f"Bearer {admin_token}")
+    ):
+        raise client.AdminAuthenticationFailed()
@@ -89,3 +89,43 @@ class NotEnoughSpace(HTTPException):
         headers: HEADERS = None,
     ):
         super().__init__(status_code, detail, headers)
+
+
+class AdminAuthenticationFailed(HTTPException):
+    def __init__(
+        self,
+        status_code: int = status.HTTP_401_UNAUTHORIZED,
+        detail="Admin authentication failed",
+        headers: HEADERS = None,
+    ):
+        super().__init__(status_code, detail, headers)
+
+
+class InvalidManifest(HTTPException):
+    def __init__(
+        self,
+        status_code: int = status.HTTP_400_BAD_REQUEST,
+        detail="Invalid manifest",
+        headers: HEADERS = None,
+    ):
+        super().__init__(status_code, detail, headers)
+
+
+class RebalanceInProgress(HTTPException):
+    def __init__(
+        self,
+        status_code: int = status.HTTP_409_CONFLICT,
+        detail="Storage rebalancing is already in progress",
+        headers: HEADERS = None,
+    ):
+        super().__init__(status_code, detail, headers)
+
+
+class FileBusy(HTTPException):
+    def __init__(
+        self,
+        status_code: int = status.HTTP_409_CONFLICT,
+        detail="File is being uploaded or moved",
+        headers: HEADERS = None,
+    ):
+        super().__init__(status_code, detail, headers)
@@ -0,0 +1,98 @@
+import time
+
+from fastapi import APIRouter, Depends, Request, status
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import config
+from ..db import crud, models
+from ..dependencies import get_db, verify_admin_token
+from ..exceptions import client
+from ..schemas.admin import (
+    ImportEntry,
+    ImportResult,
+    RebalanceProgress,
+    StorageReconciliation,
+)
+from ..utils.caching import mark_owner_stale
+from ..utils.imports import BulkImporter
+from ..utils.rebalancer import rebalancer
+from ..utils.reconciliation import reconcile_storages
+from ..utils.streaming import iter_lines
+
+router = APIRouter(tags=["admin"], dependencies=[Depends(verify_admin_token)])
+
+
+@router.post("/keys/{key_id}/import")
+async def import_files(
+    key_id: str, request: Request, db: AsyncSession = Depends(get_db)
+) -> ImportResult:
+    started = time.perf_counter()
+    key_record = await db.get(models.KeyRecord, key_id)
+    if key_record is None:
+        raise client.NotExists(detail="Key doesn't exist")
+    await crud.return_or_create_root_folder(db, key_record)
+    await db.commit()
+    importer = BulkImporter(db, key_record)
+    # Imported changes are written without the ORM, so the journal listeners
+    # never see them.
+    mark_owner_stale(db.sync_session, key_id)
+    # Every batch is committed on its own, so a manifest rejected part way
+    # keeps the batches before the bad line. Importing it again after fixing
+    # the line skips the files that are already there.
+    batch: list[tuple[int, ImportEntry]] = []
+    line_number = 0
+    async for line in iter_lines(request.stream()):
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            batch.append((line_number, ImportEntry.model_validate_json(line)))
+        except ValidationError as exc:
+            raise client.InvalidManifest(
+                detail=f"Invalid manifest line {line_number}"
+            ) from exc
+        if len(batch) >= config.settings.BULK_IMPORT_BATCH_SIZE:
+            await importer.import_batch(batch)
+            await db.commit()
+            mark_owner_stale(db.sync_session, key_id)
+            batch = []
+    if batch:
+        await importer.import_batch(batch)
+        # The admin routes aren't transactional, and get_db would only commit
+        # after the result has been sent.
+        await db.commit()
+        mark_owner_stale(db.sync_session, key_id)
+    return importer.finish(time.perf_counter() - started)
+
+
+@router.get("/storages/rebalance")
+def rebalance_progress() -> RebalanceProgress:
+    return rebalancer.progress
+
+
+@router.post("/storages/rebalance", status_code=status.HTTP_202_ACCEPTED)
+def rebalance_storages() -> RebalanceProgress:
+    return rebalancer.start()
+
+
+@router.post("/storages/{storage_id}/drain", status_code=status.HTTP_202_ACCEPTED)
+async def drain_storage(
+    storage_id: str, db: AsyncSession = Depends(get_db)
+) -> RebalanceProgress:
+    if await db.get(models.StorageRecord, storage_id) is None:
+        raise client.NotExists(detail="Storage doesn't exist")
+    return rebalancer.start(storage_id)
+
+
+@router.delete("/storages/rebalance")
+async def cancel_rebalance() -> RebalanceProgress:
+    await rebalancer.cancel()
+    return rebalancer.progress
+
+
+@router.post("/storages/reconcile")
+async def reconcile_storage_accounting(
+    fix: bool = False, db: AsyncSession = Depends(get_db)
+) -> list[StorageReconciliation]:
+    return await reconcile_storages(db, fix)
@@ -0,0 +1,83 @@
+import asyncio
+from typing import AsyncIterator, Sequence
+
+from fastapi import APIRouter, Depends, Header, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import config
+from ..db import crud, models
+from ..dependencies import get_db, get_key_record, verify_token
+from ..schemas.changes import Change, ChangesResponse
+from ..utils.notifications import hub
+from ..utils.streaming import EVENT_STREAM_MEDIA_TYPE, server_sent_event
+from ..utils.transactions import TransactionalRoute
+
+router = APIRouter(
+    tags=["changes"],
+    dependencies=[Depends(verify_token)],
+    route_class=TransactionalRoute,
+)
+
+
+@router.get("", response_model=ChangesResponse)
+async def list_changes(
+    since: int = Query(default=0, ge=0),
+    limit: int = Query(default=1000, gt=0, le=10000),
+    key_record: models.KeyRecord = Depends(get_key_record),
+    db: AsyncSession = Depends(get_db),
+):
+    changes = await crud.find_changes(db, key_record, since, limit)
+    return ChangesResponse(
+        changes=[change.json() for change in changes],
+        cursor=changes[-1].id if changes else since,
+    )
+
+
+@router.get("/events")
+async def stream_changes(
+    since: int | None = Query(default=None, ge=0),
+    last_event_id: int | None = Header(default=None, ge=0),
+    key_record: models.KeyRecord = Depends(get_key_record),
+    db: AsyncSession = Depends(get_db),
+):
+    owner_id = key_record.id
+    queue = hub.subscribe(owner_id)
+    cursor = last_event_id if last_event_id is not None else since
+    replay: Sequence[Change] = []
+    if cursor is not None:
+        replay = [
+            change.json()
+            for change in await crud.find_changes(db, key_record, cursor, 10000)
+        ]
+    await db.close()
+    return StreamingResponse(
+        change_events(owner_id, queue, replay),
+        media_type=EVENT_STREAM_MEDIA_TYPE,
+        headers={"Cache-Control": "no-cache"},
+    )
+
+
+async def change_events(
+    owner_id: str, queue: asyncio.Queue[Change | None], replay: Sequence[Change]
+) -> AsyncIterator[str]:
+    last_id = 0
+    try:
+        for change in replay:
+            last_id = change.id
+            yield server_sent_event(change, change.action, change.id)
+        while True:
+            try:
+                published = await asyncio.wait_for(
+                    queue.get(), config.settings.CHANGE_EVENTS_KEEPALIVE
+                )
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if published is None:
+                break
+            if published.id <= last_id:
+                continue
+            yield server_sent_event(published, published.action, published.id)
+    finally:
+        hub.unsubscribe(owner_id, queue)
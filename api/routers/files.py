@@ -3,25 +3,34 @@ from fastapi.requests import Request
 from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..db import crud, models
+from ..db import models
 from ..dependencies import (
     get_available_storage,
     get_db,
     get_file_record_required,
+    get_key_record,
     get_path,
     validate_file_size,
     verify_token,
 )
 from ..exceptions import client
 from ..utils.storage import StorageClient
+from ..utils.transactions import TransactionalRoute
 
-router = APIRouter(tags=["files"], dependencies=[Depends(verify_token)])
+router = APIRouter(
+    tags=["files"],
+    dependencies=[Depends(verify_token)],
+    route_class=TransactionalRoute,
+)
 
 
 @router.get("/download")
 async def download_file(
     file_record: models.FileRecord = Depends(get_file_record_required),
+    db: AsyncSession = Depends(get_db),
 ):
+    await file_record.awaitable_attrs.storage
+    await db.close()
     return StreamingResponse(StorageClient.download_file(file_record))
 
 
@@ -37,19 +46,28 @@ async def upload_file(
     storage_client: StorageClient = Depends(get_available_storage),
     db: AsyncSession = Depends(get_db),
 ):
-    if await crud.folder_exists(db, owner=storage_client.client, full_path=path):
+    if await storage_client.resolver.folder(path):
         raise client.AlreadyExists(detail="Folder with this name already exists")
-    file_record = await storage_client.upload_file(path, file_size, request.stream())
-    await crud.update_record(db, file_record)
+    upload_record = await storage_client.reserve_upload(path, file_size)
+    upload_id, file_id = upload_record.id, upload_record.file_id
+    await db.commit()
+    try:
+        await storage_client.upload_reserved(upload_record, request.stream())
+    except Exception:
+        await db.rollback()
+        await storage_client.cancel_upload(upload_id, file_id)
+        await db.commit()
+        raise
 
 
 @router.delete("/delete", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_file(
     file_record: models.FileRecord = Depends(get_file_record_required),
+    key_record: models.KeyRecord = Depends(get_key_record),
     db: AsyncSession = Depends(get_db),
 ):
     storage_client = StorageClient(
-        db, await file_record.owner, await file_record.awaitable_attrs.storage
+        db, key_record, await file_record.awaitable_attrs.storage
     )
     await storage_client.delete_file(file_record)
     await db.flush()
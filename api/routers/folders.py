@@ -1,7 +1,12 @@
-from fastapi import APIRouter, Depends, status
+from typing import Any, AsyncIterator
+
+from fastapi import APIRouter, Depends, Header, Query, status
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy.engine import RowMapping
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..db import crud, models
+from ..db.engine import is_replica
 from ..dependencies import (
     get_db,
     get_folder_record_required,
@@ -10,25 +15,99 @@ from ..dependencies import (
 )
 from ..exceptions import client
 from ..schemas.base import MoveItemRequest, RenameItemRequest
-from ..schemas.folders import CreateFolderRequest
+from ..schemas.folders import CreateFolderRequest, FolderContent, ItemType, SortOrder
+from ..utils.caching import folder_cache
 from ..utils.path_utils import split_head_and_tail
+from ..utils.serialization import dumps
 from ..utils.storage import StorageClient
+from ..utils.streaming import NDJSON_MEDIA_TYPE, accepts_ndjson, ndjson_lines
+from ..utils.transactions import TransactionalRoute
+
+router = APIRouter(
+    tags=["folders"],
+    dependencies=[Depends(verify_token)],
+    route_class=TransactionalRoute,
+)
+
 
-router = APIRouter(tags=["folders"], dependencies=[Depends(verify_token)])
+async def collect_folder_content(
+    items: AsyncIterator[RowMapping], limit: int | None
+) -> dict[str, Any]:
+    # Rows are encoded as they are instead of going through FolderContent.
+    files: list[dict[str, Any]] = []
+    folders: list[str] = []
+    last_name: str | None = None
+    item_count = 0
+    async for item in items:
+        item_count += 1
+        last_name = item["name"]
+        if item["type"] == "folder":
+            folders.append(item["name"])
+        else:
+            files.append(
+                {
+                    "name": item["name"],
+                    "size": item["size"],
+                    "last_modified": item["last_modified"],
+                }
+            )
+    return {
+        "files": files,
+        "folders": folders,
+        "next_cursor": last_name if item_count == limit else None,
+    }
 
 
-@router.get("/list")
+@router.get("/list", response_model=FolderContent)
 async def list_folder(
     folder_record: models.FolderRecord = Depends(get_folder_record_required),
+    db: AsyncSession = Depends(get_db),
+    cursor: str | None = None,
+    limit: int | None = Query(default=None, gt=0),
+    order: SortOrder = "asc",
+    item_type: ItemType | None = Query(default=None, alias="type"),
+    prefix: str | None = None,
+    accept: str | None = Header(default=None),
 ):
-    return await folder_record.json()
+    owner_id, path = folder_record.owner_id, folder_record.full_path
+    # Only complete listings are cached; pages, filters and streams are not.
+    cacheable = folder_cache.enabled and not (
+        cursor or limit or item_type or prefix or order != "asc"
+    )
+    generation = folder_cache.generation(owner_id)
+    if cacheable and not accepts_ndjson(accept):
+        content = folder_cache.listings.get(owner_id, path)
+        if content is not None:
+            return Response(content, media_type="application/json")
+    items = crud.list_folder_items(
+        db, folder_record, cursor, limit, order, item_type, prefix
+    )
+    if accepts_ndjson(accept):
+        return StreamingResponse(ndjson_lines(items), media_type=NDJSON_MEDIA_TYPE)
+    content = dumps(await collect_folder_content(items, limit))
+    # A lagging replica may return a listing from before an invalidation.
+    if cacheable and not is_replica(db):
+        folder_cache.store(folder_cache.listings, owner_id, path, generation, content)
+    return Response(content, media_type="application/json")
 
 
-@router.get("/size")
-def folder_size(
+@router.get("/tree")
+async def folder_tree(
     folder_record: models.FolderRecord = Depends(get_folder_record_required),
+    db: AsyncSession = Depends(get_db),
+    depth: int | None = Query(default=None, gt=0),
 ):
-    return folder_record.size
+    return StreamingResponse(
+        ndjson_lines(crud.list_folder_tree(db, folder_record, depth)),
+        media_type=NDJSON_MEDIA_TYPE,
+    )
+
+
+@router.get("/size")
+async def folder_size(
+    folder_record: models.FolderRecord = Depends(get_folder_record_required),
+) -> int:
+    return folder_record.total_size
 
 
 @router.delete("/rmdir", status_code=status.HTTP_204_NO_CONTENT)
@@ -71,7 +150,9 @@ async def rename_folder(
     key_record: models.KeyRecord = Depends(get_key_record),
     db: AsyncSession = Depends(get_db),
 ):
-    folder_record = await crud.find_folder(db, owner=key_record, full_path=request.path)
+    folder_record = await crud.find_folder(
+        db, for_update=True, owner=key_record, full_path=request.path
+    )
     if folder_record is None:
         raise client.NotExists(status.HTTP_404_NOT_FOUND, detail="Folder doesn't exist")
     if await crud.item_in_folder(
@@ -87,9 +168,11 @@ async def move_folder(
     key_record: models.KeyRecord = Depends(get_key_record),
     db: AsyncSession = Depends(get_db),
 ):
-    folder_record = await crud.find_folder(db, owner=key_record, full_path=request.path)
+    folder_record = await crud.find_folder(
+        db, for_update=True, owner=key_record, full_path=request.path
+    )
     destination_folder_record = await crud.find_folder(
-        db, owner=key_record, full_path=request.destination
+        db, for_update=True, owner=key_record, full_path=request.destination
     )
     if not (folder_record and destination_folder_record):
         raise client.NotExists(status.HTTP_404_NOT_FOUND, detail="Folder doesn't exist")
@@ -8,8 +8,9 @@ from ..dependencies import get_db, get_key_record, get_session, verify_token
 from ..exceptions import client
 from ..schemas.authentication import PublicKeyInfo
 from ..schemas.base import StorageInfoResponse
+from ..utils.transactions import TransactionalRoute
 
-router = APIRouter(tags=["keys"])
+router = APIRouter(tags=["keys"], route_class=TransactionalRoute)
 
 
 @router.post("/register", status_code=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,25 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from ..db import engine as db
+from ..schemas.monitoring import PoolStatus
+from ..utils.metrics import METRICS_MEDIA_TYPE, Gauge, registry
+
+router = APIRouter(tags=["monitoring"])
+
+
+def pool_gauge(field: str) -> Gauge:
+    return Gauge(
+        f"db_pool_{field}",
+        f"Database connection pool {field.replace('_', ' ')}",
+        function=lambda: getattr(db.get_pool_status(db.engine), field),
+    )
+
+
+for field in PoolStatus.model_fields:
+    registry.register(pool_gauge(field))
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics() -> PlainTextResponse:
+    return PlainTextResponse(registry.render(), media_type=METRICS_MEDIA_TYPE)
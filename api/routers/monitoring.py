@@ -0,0 +1,11 @@
+from fastapi import APIRouter
+
+from ..db import engine as db
+from ..schemas.monitoring import PoolStatus
+
+router = APIRouter(tags=["monitoring"])
+
+
+@router.get("/pool")
+def pool_status() -> PoolStatus:
+    return db.get_pool_status(db.engine)
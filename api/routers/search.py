@@ -0,0 +1,39 @@
+from fastapi import APIRouter, Depends, Header, Query
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..db import crud, models
+from ..dependencies import get_db, get_key_record, verify_token
+from ..schemas.folders import ItemType
+from ..schemas.search import SearchMode, SearchResults
+from ..utils.serialization import dumps
+from ..utils.streaming import NDJSON_MEDIA_TYPE, accepts_ndjson, ndjson_lines
+from ..utils.transactions import TransactionalRoute
+
+router = APIRouter(
+    tags=["search"],
+    dependencies=[Depends(verify_token)],
+    route_class=TransactionalRoute,
+)
+
+
+@router.get("", response_model=SearchResults)
+async def search(
+    q: str = Query(min_length=1),
+    mode: SearchMode = "substring",
+    cursor: str | None = None,
+    limit: int = Query(default=100, gt=0, le=1000),
+    item_type: ItemType | None = Query(default=None, alias="type"),
+    accept: str | None = Header(default=None),
+    key_record: models.KeyRecord = Depends(get_key_record),
+    db: AsyncSession = Depends(get_db),
+):
+    items = crud.search_items(db, key_record, q, mode, cursor, limit, item_type)
+    if accepts_ndjson(accept):
+        return StreamingResponse(ndjson_lines(items), media_type=NDJSON_MEDIA_TYPE)
+    results = [item async for item in items]
+    next_cursor = results[-1]["path"] if len(results) == limit else None
+    return Response(
+        dumps({"items": results, "next_cursor": next_cursor}),
+        media_type="application/json",
+    )
@@ -0,0 +1,50 @@
+from datetime import datetime
+from typing import Literal
+
+from pydantic import BaseModel, Field
+
+from .base import ItemRequest
+
+
+class ImportEntry(ItemRequest):
+    size: int = Field(..., ge=0)
+    storage_id: str
+    blob_id: str
+
+
+class ImportResult(BaseModel):
+    files: int = 0
+    folders: int = 0
+    skipped: int = 0
+    seconds: float = 0
+    rows_per_second: float = 0
+
+
+RebalanceMode = Literal["rebalance", "drain"]
+RebalanceStatus = Literal["idle", "running", "finished", "cancelled", "failed"]
+
+
+class RebalanceProgress(BaseModel):
+    status: RebalanceStatus = "idle"
+    mode: RebalanceMode | None = None
+    storage_id: str | None = None
+    files_total: int = 0
+    files_moved: int = 0
+    files_skipped: int = 0
+    files_failed: int = 0
+    bytes_total: int = 0
+    bytes_moved: int = 0
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+
+
+class StorageReconciliation(BaseModel):
+    storage_id: str
+    recorded_used: int
+    reported_used: int
+    files_size: int
+    reserved_size: int
+    drift: int
+    orphaned: list[str] = []
+    missing: list[str] = []
+    fixed: bool = False
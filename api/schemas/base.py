@@ -1,34 +1,35 @@
 from datetime import datetime
 
-from pydantic import BaseModel, Field, root_validator, validator
+from pydantic import BaseModel, Field, field_validator, model_validator
 
 from ..utils.path_utils import add_trailing_slash, normalize
 
 
 class ItemRequest(BaseModel):
-    path: str = Field(..., regex=r"^/[\w+/]+$")
+    path: str = Field(..., pattern=r"^/[\w+/]+$")
 
-    @validator("path")
+    @field_validator("path")
+    @classmethod
     def normalize_path(cls, v):
         return normalize(v)
 
 
 class RenameItemRequest(ItemRequest):
-    new_name: str = Field(..., regex=r"^[\w+]+$")
+    new_name: str = Field(..., pattern=r"^[\w+]+$")
 
 
 class MoveItemRequest(ItemRequest):
-    destination: str = Field(..., regex=r"^/[\w+/]+$")
+    destination: str = Field(..., pattern=r"^/[\w+/]+$")
 
-    _normalize_destination = validator("destination", allow_reuse=True)(normalize)
+    _normalize_destination = field_validator("destination")(normalize)
 
-    @root_validator(skip_on_failure=True)
-    def validate_destination_path(cls, values):
-        path = values["path"]
-        destination = values["destination"]
-        if destination == path or destination.startswith(add_trailing_slash(path)):
+    @model_validator(mode="after")
+    def validate_destination_path(self):
+        if self.destination == self.path or self.destination.startswith(
+            add_trailing_slash(self.path)
+        ):
             raise ValueError("Destination should be a higher level directory")
-        return values
+        return self
 
 
 class StorageInfoResponse(BaseModel):
@@ -0,0 +1,22 @@
+from datetime import datetime
+from typing import Literal
+
+from pydantic import BaseModel
+
+from .folders import ItemType
+
+ChangeAction = Literal["create", "upload", "delete", "rename", "move"]
+
+
+class Change(BaseModel):
+    id: int
+    action: ChangeAction
+    type: ItemType
+    path: str
+    new_path: str | None = None
+    created_at: datetime
+
+
+class ChangesResponse(BaseModel):
+    changes: list[Change]
+    cursor: int
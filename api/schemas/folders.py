@@ -1,20 +1,30 @@
-from typing import Iterable
+from datetime import datetime
+from typing import Literal
 
-from pydantic import BaseModel, validator
+from pydantic import BaseModel
 
 from .base import FileInfo, ItemRequest
 
+ItemType = Literal["file", "folder"]
+SortOrder = Literal["asc", "desc"]
+
 
 class CreateFolderRequest(ItemRequest):
     recursive: bool = False
 
 
 class FolderContent(BaseModel):
-    files: list[FileInfo] | Iterable[FileInfo]
-    folders: list[str] | Iterable[str]
-
-    @validator("files", "folders", pre=True)
-    def validate_iterable(cls, v):
-        if isinstance(v, list):
-            return v
-        return list(v)
+    files: list[FileInfo]
+    folders: list[str]
+    next_cursor: str | None = None
+
+
+class FolderItem(BaseModel):
+    name: str
+    type: ItemType
+    size: int | None = None
+    last_modified: datetime | None = None
+
+
+class TreeItem(FolderItem):
+    path: str
@@ -0,0 +1,11 @@
+from pydantic import BaseModel
+
+
+class PoolStatus(BaseModel):
+    size: int = 0
+    checked_in: int = 0
+    checked_out: int = 0
+    overflow: int = 0
+    checkouts: int = 0
+    wait_time: float = 0
+    max_wait_time: float = 0
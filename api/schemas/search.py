@@ -0,0 +1,12 @@
+from typing import Literal
+
+from pydantic import BaseModel
+
+from .folders import TreeItem
+
+SearchMode = Literal["substring", "glob", "prefix"]
+
+
+class SearchResults(BaseModel):
+    items: list[TreeItem]
+    next_cursor: str | None = None
@@ -1,26 +1,53 @@
-from pydantic import BaseModel, validator
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Mapping
+
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 
 
 class StorageRequestHeaders(BaseModel):
     authorization: str
 
-    @validator("authorization", pre=True)
+    @field_validator("authorization", mode="before")
+    @classmethod
     def parse_authorization(cls, v):
         return f"Bearer {v}"
 
 
 class UploadRequestHeaders(StorageRequestHeaders):
-    file_size: str | int = "0"
+    model_config = ConfigDict(populate_by_name=True)
+
+    file_size: str | int = Field("0", alias="File-Size")
 
-    @validator("file_size")
+    @field_validator("file_size")
+    @classmethod
     def parse_file_size(cls, v):
         return str(v)
 
-    class Config:
-        fields = {"file_size": "File-Size"}
-        allow_population_by_field_name = True
+
+# Keyed by token, so headers are built once per storage and a rotated
+# token simply misses the cache.
+@lru_cache(maxsize=1024)
+def storage_headers(token: str) -> Mapping[str, str]:
+    return MappingProxyType(
+        StorageRequestHeaders(authorization=token).model_dump(by_alias=True)
+    )
+
+
+def upload_headers(token: str, file_size: int) -> Mapping[str, str]:
+    return {**storage_headers(token), "File-Size": str(file_size)}
 
 
 class StorageSpaceResponse(BaseModel):
     capacity: int
     used: int
+
+
+class StorageFile(BaseModel):
+    id: str
+    size: int
+
+
+class StorageFilesResponse(BaseModel):
+    files: list[StorageFile]
+    next_cursor: str | None = None
@@ -0,0 +1,235 @@
+import posixpath
+from bisect import bisect_left
+from contextlib import suppress
+from threading import Lock
+from typing import Generic, Literal, TypeVar
+
+from cachetools import Cache, LRUCache, TTLCache
+from sqlalchemy import event
+from sqlalchemy.orm import Session, SessionTransaction
+
+from .. import config
+from ..schemas.changes import Change
+from .metrics import Counter, Gauge, registry
+from .path_utils import ROOT_PATH, add_trailing_slash
+
+STALE_OWNERS = "stale_owners"
+
+CacheName = Literal["listing", "path"]
+ItemKind = Literal["folder", "file"]
+Value = TypeVar("Value")
+
+CACHE_REQUESTS = Counter(
+    "folder_cache_requests_total",
+    "Folder cache lookups by result",
+    ("cache", "result"),
+)
+registry.register(CACHE_REQUESTS)
+
+
+class FolderCacheStore(Generic[Value]):
+    def __init__(self, name: CacheName, maxsize: int, ttl: int | None = None) -> None:
+        self._name = name
+        self._entries: Cache[tuple[str, str], Value]
+        if ttl is None:
+            self._entries = LRUCache(maxsize)
+        else:
+            self._entries = TTLCache(maxsize, ttl)
+        # Cached paths of each owner in sorted order, so a subtree is a single
+        # range. Entries the cache evicts itself stay listed until the index
+        # outgrows the cache and is rebuilt.
+        self._paths: dict[str, list[str]] = {}
+        self._indexed = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, owner_id: str, path: str) -> Value | None:
+        value = self._entries.get((owner_id, path))
+        CACHE_REQUESTS.inc(1, self._name, "miss" if value is None else "hit")
+        return value
+
+    def put(self, owner_id: str, path: str, value: Value):
+        self._entries[owner_id, path] = value
+        paths = self._paths.setdefault(owner_id, [])
+        index = bisect_left(paths, path)
+        if index == len(paths) or paths[index] != path:
+            paths.insert(index, path)
+            self._indexed += 1
+            if self._indexed > 2 * self._entries.maxsize:
+                self.__reindex()
+
+    def discard(self, owner_id: str, path: str):
+        with suppress(KeyError):
+            del self._entries[owner_id, path]
+        paths = self._paths.get(owner_id, [])
+        index = bisect_left(paths, path)
+        if index < len(paths) and paths[index] == path:
+            self.__unindex(owner_id, index, index + 1)
+
+    def discard_subtree(self, owner_id: str, path: str):
+        self.discard(owner_id, path)
+        paths = self._paths.get(owner_id, [])
+        prefix = add_trailing_slash(path)
+        # Every path below the prefix sorts before the prefix with its
+        # trailing slash bumped to the next character.
+        start = bisect_left(paths, prefix)
+        end = bisect_left(paths, prefix[:-1] + chr(ord(posixpath.sep) + 1), start)
+        for subpath in paths[start:end]:
+            with suppress(KeyError):
+                del self._entries[owner_id, subpath]
+        self.__unindex(owner_id, start, end)
+
+    def clear(self):
+        self._entries.clear()
+        self._paths.clear()
+        self._indexed = 0
+
+    def __unindex(self, owner_id: str, start: int, end: int):
+        if start == end:
+            return
+        paths = self._paths[owner_id]
+        del paths[start:end]
+        self._indexed -= end - start
+        if not paths:
+            del self._paths[owner_id]
+
+    def __reindex(self):
+        self._paths = {}
+        for owner_id, path in sorted(self._entries.keys()):
+            self._paths.setdefault(owner_id, []).append(path)
+        self._indexed = len(self._entries)
+
+
+class FolderCache:
+    def __init__(self, maxsize: int, ttl: int) -> None:
+        self._maxsize = maxsize
+        self.listings: FolderCacheStore[bytes] = FolderCacheStore(
+            "listing", max(maxsize, 1), ttl
+        )
+        self._generations: dict[str, int] = {}
+        self._lock = Lock()
+
+    @property
+    def enabled(self) -> bool:
+        # Writes in other workers only reach this cache through the journal
+        # poller, which runs with the database backend alone. The TTL bounds
+        # how long a listing can outlive a change the poller gave up on.
+        return self._maxsize > 0 and config.settings.CHANGE_EVENTS_BACKEND == "database"
+
+    def generation(self, owner_id: str) -> int:
+        return self._generations.get(owner_id, 0)
+
+    def store(
+        self,
+        cache: FolderCacheStore[Value],
+        owner_id: str,
+        path: str,
+        generation: int,
+        value: Value,
+    ):
+        # A result read before a write committed must not be stored after the
+        # write invalidated the cache, so the owner's generation from before
+        # the read has to be current.
+        with self._lock:
+            if generation == self.generation(owner_id):
+                cache.put(owner_id, path, value)
+
+    def invalidate(self, owner_id: str, change: Change):
+        with self._lock:
+            self._generations[owner_id] = self.generation(owner_id) + 1
+            for path in filter(None, (change.path, change.new_path)):
+                # Nothing below a folder that was just created is cached.
+                if change.type == "folder" and change.action != "create":
+                    self.listings.discard_subtree(owner_id, path)
+                self.listings.discard(owner_id, posixpath.dirname(path))
+
+    def clear(self):
+        with self._lock:
+            self._generations.clear()
+            self.listings.clear()
+
+    def invalidate_owner(self, owner_id: str):
+        with self._lock:
+            self._generations[owner_id] = self.generation(owner_id) + 1
+            self.listings.discard_subtree(owner_id, ROOT_PATH)
+
+
+class PathCache:
+    def __init__(self, maxsize: int) -> None:
+        self.enabled = maxsize > 0
+        self.ids: FolderCacheStore[tuple[ItemKind, str]] = FolderCacheStore(
+            "path", max(maxsize, 1)
+        )
+        self._lock = Lock()
+
+    def get(self, owner_id: str, path: str, kind: ItemKind) -> str | None:
+        if not self.enabled:
+            return None
+        with self._lock:
+            cached = self.ids.get(owner_id, path)
+        if cached is None or cached[0] != kind:
+            return None
+        return cached[1]
+
+    def put(self, owner_id: str, path: str, kind: ItemKind, record_id: str):
+        if self.enabled:
+            with self._lock:
+                self.ids.put(owner_id, path, (kind, record_id))
+
+    def discard(self, owner_id: str, path: str):
+        with self._lock:
+            self.ids.discard(owner_id, path)
+
+    def invalidate(self, owner_id: str, change: Change):
+        with self._lock:
+            for path in filter(None, (change.path, change.new_path)):
+                if change.type == "folder" and change.action != "create":
+                    self.ids.discard_subtree(owner_id, path)
+                else:
+                    self.ids.discard(owner_id, path)
+
+    def clear(self):
+        with self._lock:
+            self.ids.clear()
+
+
+folder_cache = FolderCache(
+    config.settings.FOLDER_CACHE_SIZE, config.settings.FOLDER_CACHE_TTL
+)
+path_cache = PathCache(config.settings.PATH_CACHE_SIZE)
+registry.register(
+    Gauge(
+        "folder_cache_entries",
+        "Cached folder listings",
+        function=lambda: len(folder_cache.listings),
+    )
+)
+registry.register(
+    Gauge(
+        "path_cache_entries",
+        "Cached path to record id mappings",
+        function=lambda: len(path_cache.ids),
+    )
+)
+
+
+def invalidate_caches(owner_id: str, change: Change):
+    folder_cache.invalidate(owner_id, change)
+    path_cache.invalidate(owner_id, change)
+
+
+def mark_owner_stale(db: Session, owner_id: str):
+    db.info.setdefault(STALE_OWNERS, set()).add(owner_id)
+
+
+@event.listens_for(Session, "after_commit")
+def invalidate_stale_owners(session: Session):
+    for owner_id in session.info.pop(STALE_OWNERS, ()):
+        folder_cache.invalidate_owner(owner_id)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def discard_stale_owners(session: Session, transaction: SessionTransaction):
+    if transaction.parent is None:
+        session.info.pop(STALE_OWNERS, None)
@@ -0,0 +1,92 @@
+import gzip
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .. import config
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_MEDIA_TYPES = ("application/json", "application/x-ndjson", "text/")
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def negotiate_encoding(accept_encoding: str) -> str | None:
+    weights: dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0
+        weights[coding.strip().lower()] = weight
+    supported = ("br", "gzip") if brotli is not None else ("gzip",)
+    accepted = [
+        coding for coding in supported if weights.get(coding, weights.get("*", 0)) > 0
+    ]
+    if not accepted:
+        return None
+    # Ties go to the first supported coding, which compresses better.
+    return max(accepted, key=lambda coding: weights.get(coding, weights.get("*", 0)))
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        minimum_size = config.settings.COMPRESSION_MINIMUM_SIZE
+        if scope["type"] != "http" or minimum_size is None:
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        start_message: Message | None = None
+
+        async def send_wrapper(message: Message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if start_message is None:
+                await send(message)
+                return
+            start, start_message = start_message, None
+            headers = MutableHeaders(raw=list(start["headers"]))
+            body = message.get("body", b"")
+            # Only responses sent in one piece are compressed, so downloads,
+            # NDJSON streams and server-sent events pass through untouched.
+            if (
+                message.get("more_body", False)
+                or len(body) < minimum_size
+                or "content-encoding" in headers
+                or not headers.get("content-type", "").startswith(
+                    COMPRESSIBLE_MEDIA_TYPES
+                )
+            ):
+                await send(start)
+                await send(message)
+                return
+            body = compress(body, encoding)
+            headers["content-encoding"] = encoding
+            headers["content-length"] = str(len(body))
+            headers.add_vary_header("Accept-Encoding")
+            await send({**start, "headers": headers.raw})
+            await send({**message, "body": body})
+
+        await self.app(scope, receive, send_wrapper)
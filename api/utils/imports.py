@@ -0,0 +1,155 @@
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..db import crud, models
+from ..exceptions import client
+from ..schemas.admin import ImportEntry, ImportResult
+from .path_utils import ROOT_PATH, ancestor_paths, split_head_and_tail
+
+
+class BulkImporter:
+    def __init__(self, db: AsyncSession, key_record: models.KeyRecord) -> None:
+        self._db = db
+        self._owner_id = key_record.id
+        self._folder_ids: dict[str, str] = {}
+        self._storage_ids: set[str] | None = None
+        self._result = ImportResult()
+
+    async def import_batch(self, lines: list[tuple[int, ImportEntry]]):
+        entries = [entry for _, entry in lines]
+        await self.__validate_storages(entries)
+        parent_paths = {split_head_and_tail(entry.path)[0] for entry in entries}
+        await self.__create_folders(parent_paths)
+        existing_paths = await self.__find_existing_paths(entries)
+        existing_ids = await self.__find_existing_ids(entries)
+        files = []
+        changes = []
+        totals: dict[str, tuple[int, int]] = {}
+        for line_number, entry in lines:
+            if entry.path in existing_paths:
+                self._result.skipped += 1
+                continue
+            if entry.blob_id in existing_ids:
+                raise client.InvalidManifest(
+                    detail=f"Duplicate blob id on manifest line {line_number}"
+                )
+            existing_paths.add(entry.path)
+            existing_ids.add(entry.blob_id)
+            parent_path, filename = split_head_and_tail(entry.path)
+            files.append(
+                {
+                    "id": entry.blob_id,
+                    "folder_id": self._folder_ids[parent_path],
+                    "storage_id": entry.storage_id,
+                    "filename": filename,
+                    "full_path": entry.path,
+                    "size": entry.size,
+                }
+            )
+            changes.append(self.__change("upload", "file", entry.path))
+            for path in ancestor_paths(parent_path):
+                size, count = totals.get(path, (0, 0))
+                totals[path] = (size + entry.size, count + 1)
+        if files:
+            await self._db.execute(insert(models.FileRecord), files)
+            await self._db.execute(insert(models.ChangeRecord), changes)
+            await crud.update_folder_totals(self._db, self._owner_id, totals)
+        self._result.files += len(files)
+
+    def finish(self, seconds: float) -> ImportResult:
+        self._result.seconds = seconds
+        rows = self._result.files + self._result.folders
+        self._result.rows_per_second = rows / seconds if seconds else 0
+        return self._result
+
+    async def __validate_storages(self, entries: list[ImportEntry]):
+        if self._storage_ids is None:
+            self._storage_ids = set(
+                await self._db.scalars(select(models.StorageRecord.id))
+            )
+        for entry in entries:
+            if entry.storage_id not in self._storage_ids:
+                raise client.InvalidManifest(
+                    detail=f"Unknown storage {entry.storage_id} for {entry.path}"
+                )
+
+    async def __create_folders(self, folder_paths: set[str]):
+        missing_paths = set()
+        for folder_path in folder_paths:
+            while (
+                folder_path not in self._folder_ids and folder_path not in missing_paths
+            ):
+                missing_paths.add(folder_path)
+                if folder_path == ROOT_PATH:
+                    break
+                folder_path = split_head_and_tail(folder_path)[0]
+        if not missing_paths:
+            return
+        existing_folders = await self._db.execute(
+            select(models.FolderRecord.full_path, models.FolderRecord.id).where(
+                models.FolderRecord.owner_id == self._owner_id,
+                models.FolderRecord.full_path.in_(missing_paths),
+            )
+        )
+        for path, folder_id in existing_folders:
+            self._folder_ids[path] = folder_id
+            missing_paths.discard(path)
+        if not missing_paths:
+            return
+        folders = []
+        changes = []
+        # Ancestors are shorter than their descendants, so they get ids first.
+        for path in sorted(missing_paths, key=len):
+            parent_path, name = split_head_and_tail(path)
+            folder_id = models.generate_id()
+            folders.append(
+                {
+                    "id": folder_id,
+                    "owner_id": self._owner_id,
+                    "parent_id": self._folder_ids.get(parent_path),
+                    "name": name or ROOT_PATH,
+                    "full_path": path,
+                }
+            )
+            self._folder_ids[path] = folder_id
+            if path != ROOT_PATH:
+                changes.append(self.__change("create", "folder", path))
+        await self._db.execute(insert(models.FolderRecord), folders)
+        if changes:
+            await self._db.execute(insert(models.ChangeRecord), changes)
+        self._result.folders += len(changes)
+
+    async def __find_existing_paths(self, entries: list[ImportEntry]) -> set[str]:
+        paths = [entry.path for entry in entries]
+        folder_ids = {self._folder_ids[split_head_and_tail(path)[0]] for path in paths}
+        existing_files = await self._db.scalars(
+            select(models.FileRecord.full_path).where(
+                models.FileRecord.folder_id.in_(folder_ids),
+                models.FileRecord.full_path.in_(paths),
+            )
+        )
+        existing_folders = await self._db.scalars(
+            select(models.FolderRecord.full_path).where(
+                models.FolderRecord.owner_id == self._owner_id,
+                models.FolderRecord.full_path.in_(paths),
+            )
+        )
+        return set(existing_files) | set(existing_folders)
+
+    async def __find_existing_ids(self, entries: list[ImportEntry]) -> set[str]:
+        # Ids of earlier batches are already in the table.
+        return set(
+            await self._db.scalars(
+                select(models.FileRecord.id).where(
+                    models.FileRecord.id.in_([entry.blob_id for entry in entries])
+                )
+            )
+        )
+
+    def __change(self, action: str, item_type: str, path: str) -> dict:
+        return {
+            "owner_id": self._owner_id,
+            "action": action,
+            "item_type": item_type,
+            "path": path,
+        }
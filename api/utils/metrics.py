@@ -0,0 +1,338 @@
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from threading import Lock
+from types import SimpleNamespace
+from typing import Any, Awaitable, Callable, Iterable, Iterator
+
+import aiohttp
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+METRICS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+LabelValues = tuple[str, ...]
+
+
+def escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(names: tuple[str, ...], values: Iterable[str]) -> str:
+    pairs = ",".join(
+        f'{name}="{escape_label(value)}"' for name, value in zip(names, values)
+    )
+    return f"{{{pairs}}}" if pairs else ""
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = Lock()
+
+    def samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+            *self.samples(),
+        ]
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, *labels: str):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}{format_labels(self.label_names, labels)} {value}"
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Iterable[str] = (),
+        function: Callable[[], float] | None = None,
+    ):
+        super().__init__(name, documentation, labels)
+        self._values: dict[LabelValues, float] = {}
+        self._function = function
+
+    def inc(self, amount: float = 1, *labels: str):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, amount: float = 1, *labels: str):
+        self.inc(-amount, *labels)
+
+    def set(self, value: float, *labels: str):
+        with self._lock:
+            self._values[labels] = value
+
+    def samples(self) -> Iterator[str]:
+        if self._function is not None:
+            yield f"{self.name} {self._function()}"
+            return
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}{format_labels(self.label_names, labels)} {value}"
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Iterable[str] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labels)
+        self._buckets = buckets
+        self._counts: dict[LabelValues, list[int]] = {}
+        self._sums: dict[LabelValues, float] = {}
+
+    def observe(self, value: float, *labels: str):
+        index = bisect_left(self._buckets, value)
+        with self._lock:
+            counts = self._counts.get(labels)
+            if counts is None:
+                counts = self._counts[labels] = [0] * (len(self._buckets) + 1)
+            counts[index] += 1
+            self._sums[labels] = self._sums.get(labels, 0) + value
+
+    @contextmanager
+    def time(self, *labels: str) -> Iterator[None]:
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started_at, *labels)
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            series = [
+                (labels, list(counts), self._sums[labels])
+                for labels, counts in self._counts.items()
+            ]
+        label_names = (*self.label_names, "le")
+        for labels, counts, total in series:
+            cumulative = 0
+            for bound, count in zip((*self._buckets, "+Inf"), counts):
+                cumulative += count
+                yield (
+                    f"{self.name}_bucket"
+                    f"{format_labels(label_names, (*labels, str(bound)))} {cumulative}"
+                )
+            suffix = format_labels(self.label_names, labels)
+            yield f"{self.name}_sum{suffix} {total}"
+            yield f"{self.name}_count{suffix} {cumulative}"
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, Metric] = {}
+
+    def register(self, metric: Metric):
+        self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+class RequestStats:
+    __slots__ = ("queries", "query_time")
+
+    def __init__(self) -> None:
+        self.queries = 0
+        self.query_time = 0.0
+
+
+registry = Registry()
+request_stats: ContextVar[RequestStats | None] = ContextVar(
+    "request_stats", default=None
+)
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route",
+    ("method", "route", "status"),
+)
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries",
+    "Database statements executed per request",
+    ("method", "route"),
+    COUNT_BUCKETS,
+)
+REQUEST_QUERY_TIME = Histogram(
+    "http_request_db_query_seconds",
+    "Time spent in database statements per request",
+    ("method", "route"),
+)
+DB_QUERY_DURATION = Histogram("db_query_duration_seconds", "Database statement latency")
+STORAGE_REQUEST_DURATION = Histogram(
+    "storage_request_duration_seconds",
+    "Storage node request latency",
+    ("storage", "method"),
+)
+STORAGE_BYTES_SENT = Counter(
+    "storage_bytes_sent_total", "Bytes sent to storage nodes", ("storage",)
+)
+STORAGE_BYTES_RECEIVED = Counter(
+    "storage_bytes_received_total", "Bytes received from storage nodes", ("storage",)
+)
+TOKEN_VERIFICATION_DURATION = Histogram(
+    "auth_verify_token_duration_seconds", "Signed token verification latency"
+)
+SESSION_LOCK_WAIT = Histogram(
+    "session_storage_lock_wait_seconds",
+    "Time spent waiting for the session storage lock",
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1),
+)
+TRANSFERS_IN_PROGRESS = Gauge(
+    "transfers_in_progress", "Uploads and downloads in progress", ("direction",)
+)
+
+for metric in (
+    REQUEST_DURATION,
+    REQUEST_QUERIES,
+    REQUEST_QUERY_TIME,
+    DB_QUERY_DURATION,
+    STORAGE_REQUEST_DURATION,
+    STORAGE_BYTES_SENT,
+    STORAGE_BYTES_RECEIVED,
+    TOKEN_VERIFICATION_DURATION,
+    SESSION_LOCK_WAIT,
+    TRANSFERS_IN_PROGRESS,
+):
+    registry.register(metric)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started_at"].pop()
+    DB_QUERY_DURATION.observe(elapsed)
+    stats = request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.query_time += elapsed
+
+
+@event.listens_for(Engine, "handle_error")
+def discard_query_timer(context):
+    if context.connection is None:
+        return
+    started_at = context.connection.info.get("query_started_at")
+    if started_at:
+        started_at.pop()
+
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started_at = time.perf_counter()
+        stats = RequestStats()
+        token = request_stats.set(stats)
+        status_code = 500
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_stats.reset(token)
+            route = scope.get("route")
+            route_path = getattr(route, "path", "unmatched")
+            method = scope["method"]
+            REQUEST_DURATION.observe(
+                time.perf_counter() - started_at, method, route_path, str(status_code)
+            )
+            REQUEST_QUERIES.observe(stats.queries, method, route_path)
+            REQUEST_QUERY_TIME.observe(stats.query_time, method, route_path)
+
+
+@contextmanager
+def track_transfer(direction: str) -> Iterator[None]:
+    TRANSFERS_IN_PROGRESS.inc(1, direction)
+    try:
+        yield
+    finally:
+        TRANSFERS_IN_PROGRESS.dec(1, direction)
+
+
+@lru_cache(maxsize=128)
+def storage_trace_config(storage_id: str) -> aiohttp.TraceConfig:
+    async def on_request_start(
+        session: aiohttp.ClientSession,
+        context: SimpleNamespace,
+        params: aiohttp.TraceRequestStartParams,
+    ):
+        context.started_at = time.perf_counter()
+
+    async def on_request_end(
+        session: aiohttp.ClientSession,
+        context: SimpleNamespace,
+        params: aiohttp.TraceRequestEndParams | aiohttp.TraceRequestExceptionParams,
+    ):
+        STORAGE_REQUEST_DURATION.observe(
+            time.perf_counter() - context.started_at, storage_id, params.method
+        )
+
+    async def on_request_chunk_sent(
+        session: aiohttp.ClientSession,
+        context: SimpleNamespace,
+        params: aiohttp.TraceRequestChunkSentParams,
+    ):
+        STORAGE_BYTES_SENT.inc(len(params.chunk), storage_id)
+
+    trace_config = aiohttp.TraceConfig()
+    callbacks: list[tuple[Any, Callable[..., Awaitable[None]]]] = [
+        (trace_config.on_request_start, on_request_start),
+        (trace_config.on_request_end, on_request_end),
+        (trace_config.on_request_exception, on_request_end),
+        (trace_config.on_request_chunk_sent, on_request_chunk_sent),
+    ]
+    for signal, callback in callbacks:
+        signal.append(callback)
+    return trace_config
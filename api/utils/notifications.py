@@ -0,0 +1,123 @@
+import asyncio
+import time
+from collections import defaultdict
+
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session, SessionTransaction
+
+from .. import config
+from ..db import models
+from ..schemas.changes import Change
+from .caching import invalidate_caches
+
+PENDING_CHANGES = "pending_changes"
+
+
+class ChangeHub:
+    def __init__(self, queue_size: int) -> None:
+        self._queue_size = queue_size
+        self._subscribers: defaultdict[
+            str, set[asyncio.Queue[Change | None]]
+        ] = defaultdict(set)
+
+    def subscribe(self, owner_id: str) -> asyncio.Queue[Change | None]:
+        queue: asyncio.Queue[Change | None] = asyncio.Queue(self._queue_size)
+        self._subscribers[owner_id].add(queue)
+        return queue
+
+    def unsubscribe(self, owner_id: str, queue: asyncio.Queue[Change | None]):
+        subscribers = self._subscribers.get(owner_id)
+        if subscribers is None:
+            return
+        subscribers.discard(queue)
+        if not subscribers:
+            del self._subscribers[owner_id]
+
+    def subscriber_count(self, owner_id: str) -> int:
+        return len(self._subscribers.get(owner_id, ()))
+
+    def publish(self, owner_id: str, change: Change):
+        for queue in list(self._subscribers.get(owner_id, ())):
+            try:
+                queue.put_nowait(change)
+            except asyncio.QueueFull:
+                # The subscriber fell behind: end its stream so that it
+                # reconnects and replays the journal from its last event id.
+                self.unsubscribe(owner_id, queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+
+class JournalPoller:
+    def __init__(
+        self, hub: ChangeHub, async_session: async_sessionmaker[AsyncSession]
+    ) -> None:
+        self._hub = hub
+        self._async_session = async_session
+        self._last_id: int | None = None
+        # Ids are assigned on insert but show up on commit, so a transaction
+        # can commit a lower id after a higher one was read. Skipped ids are
+        # read again until they are older than the lookback.
+        self._gaps: dict[int, float] = {}
+
+    async def poll(self):
+        async with self._async_session() as session:
+            if self._last_id is None:
+                self._last_id = (
+                    await session.scalar(select(func.max(models.ChangeRecord.id)))
+                ) or 0
+                return
+            now = time.monotonic()
+            expired = now - config.settings.CHANGE_EVENTS_POLL_LOOKBACK
+            self._gaps = {
+                gap: noticed for gap, noticed in self._gaps.items() if noticed > expired
+            }
+            changes = await session.scalars(
+                select(models.ChangeRecord)
+                .where(
+                    models.ChangeRecord.id >= min(self._gaps, default=self._last_id + 1)
+                )
+                .order_by(models.ChangeRecord.id)
+            )
+            for record in changes:
+                if record.id > self._last_id:
+                    for gap in range(self._last_id + 1, record.id):
+                        self._gaps[gap] = now
+                    self._last_id = record.id
+                elif self._gaps.pop(record.id, None) is None:
+                    continue
+                change = record.json()
+                # Writes from other instances only reach the caches through
+                # the journal.
+                invalidate_caches(record.owner_id, change)
+                self._hub.publish(record.owner_id, change)
+
+
+hub = ChangeHub(config.settings.CHANGE_EVENTS_QUEUE_SIZE)
+
+
+@event.listens_for(Session, "after_flush")
+def collect_changes(session: Session, flush_context):
+    pending = session.info.setdefault(PENDING_CHANGES, [])
+    for record in session.new:
+        if isinstance(record, models.ChangeRecord):
+            pending.append((record.owner_id, record.json()))
+
+
+@event.listens_for(Session, "after_commit")
+def publish_changes(session: Session):
+    pending = session.info.pop(PENDING_CHANGES, [])
+    for owner_id, change in pending:
+        invalidate_caches(owner_id, change)
+    if config.settings.CHANGE_EVENTS_BACKEND != "memory":
+        return
+    for owner_id, change in pending:
+        hub.publish(owner_id, change)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def discard_changes(session: Session, transaction: SessionTransaction):
+    if transaction.parent is None:
+        session.info.pop(PENDING_CHANGES, None)
@@ -1,8 +1,10 @@
 import posixpath
+from functools import lru_cache
 
 ROOT_PATH = posixpath.sep
 
 
+@lru_cache(maxsize=4096)
 def normalize(path: str) -> str:
     if path == ROOT_PATH:
         return path
@@ -21,3 +23,10 @@ def add_trailing_slash(path: str) -> str:
     if path.endswith(posixpath.sep):
         return path
     return f"{path}{posixpath.sep}"
+
+
+def ancestor_paths(path: str) -> list[str]:
+    paths = [ROOT_PATH]
+    for component in filter(None, split_into_components(path)):
+        paths.append(posixpath.join(paths[-1], component))
+    return paths
@@ -0,0 +1,95 @@
+import cProfile
+import itertools
+import json
+import os
+import re
+import time
+from contextvars import ContextVar
+from datetime import datetime
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .. import config
+
+profiled_statements: ContextVar[list[str] | None] = ContextVar(
+    "profiled_statements", default=None
+)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def collect_statement(conn, cursor, statement, parameters, context, executemany):
+    statements = profiled_statements.get()
+    if statements is not None:
+        statements.append(statement)
+
+
+def write_profile(profiler: cProfile.Profile, report: dict):
+    directory = config.settings.PROFILING_DIRECTORY
+    os.makedirs(directory, exist_ok=True)
+    route = re.sub(r"[^\w]+", "_", report["route"]).strip("_") or "root"
+    name = f"{datetime.utcnow():%Y%m%dT%H%M%S%f}-{report['method']}-{route}"
+    profiler.dump_stats(os.path.join(directory, f"{name}.prof"))
+    with open(os.path.join(directory, f"{name}.json"), "w") as file:
+        json.dump(report, file, indent=2)
+
+
+class ProfilingMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self._requests = itertools.count(1)
+        self._profiling = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        threshold = config.settings.PROFILING_THRESHOLD
+        sample_rate = config.settings.PROFILING_SAMPLE_RATE
+        if scope["type"] != "http" or (threshold is None and not sample_rate):
+            await self.app(scope, receive, send)
+            return
+        sampled = bool(sample_rate) and next(self._requests) % sample_rate == 0
+        # Only one profiler can be installed at a time, so concurrent requests
+        # pass through unprofiled. Other tasks that run while this request
+        # awaits still show up in its profile.
+        if self._profiling:
+            await self.app(scope, receive, send)
+            return
+        self._profiling = True
+        status_code = 500
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        statements: list[str] = []
+        token = profiled_statements.set(statements)
+        profiler = cProfile.Profile()
+        started_at = time.perf_counter()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.disable()
+            elapsed = time.perf_counter() - started_at
+            profiled_statements.reset(token)
+            self._profiling = False
+        if sampled or (threshold is not None and elapsed >= threshold):
+            route = scope.get("route")
+            await run_in_threadpool(
+                write_profile,
+                profiler,
+                {
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "route": getattr(route, "path", scope["path"]),
+                    "key_id": Headers(scope=scope).get("key-id"),
+                    "status_code": status_code,
+                    "duration": elapsed,
+                    "sampled": sampled,
+                    "statements": statements,
+                },
+            )
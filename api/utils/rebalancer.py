@@ -0,0 +1,350 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import AsyncIterator, NamedTuple
+
+import aiohttp
+from aiohttp.client import ClientResponse
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import joinedload
+
+from .. import config
+from ..db import crud
+from ..db import engine as db
+from ..db import models
+from ..exceptions import client, core
+from ..schemas import storage_api
+from ..schemas.admin import RebalanceProgress
+from .storage import BaseHandler, refresh_reservation
+
+CHUNK_SIZE = 64 * 1024
+
+
+class BlobMove(NamedTuple):
+    file_id: str
+    size: int
+    last_modified: datetime
+    source: models.StorageRecord
+    target: models.StorageRecord
+
+
+class RateLimiter:
+    def __init__(self, rate: int) -> None:
+        self._rate = rate
+        self._allowance = float(rate)
+        self._updated = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, amount: int):
+        if self._rate <= 0:
+            return
+        async with self._lock:
+            now = asyncio.get_running_loop().time()
+            elapsed = now - self._updated if self._updated else 0
+            self._allowance = min(self._rate, self._allowance + elapsed * self._rate)
+            self._updated = now
+            self._allowance -= amount
+            if self._allowance < 0:
+                await asyncio.sleep(-self._allowance / self._rate)
+
+
+class StorageRebalancer:
+    def __init__(self, async_session: async_sessionmaker[AsyncSession]) -> None:
+        self._async_session = async_session
+        self._progress = RebalanceProgress()
+        self._task: asyncio.Task | None = None
+        self._limiter = RateLimiter(0)
+
+    @property
+    def progress(self) -> RebalanceProgress:
+        return self._progress
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, storage_id: str | None = None) -> RebalanceProgress:
+        if self.running:
+            raise client.RebalanceInProgress()
+        self._limiter = RateLimiter(config.settings.REBALANCE_BANDWIDTH)
+        self._progress = RebalanceProgress(
+            status="running",
+            mode="rebalance" if storage_id is None else "drain",
+            storage_id=storage_id,
+            started_at=datetime.utcnow(),
+        )
+        self._task = asyncio.create_task(self.__execute(storage_id))
+        return self._progress
+
+    async def wait(self):
+        if self._task is not None:
+            await asyncio.wait([self._task])
+
+    async def cancel(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    async def __execute(self, storage_id: str | None):
+        try:
+            async with self._async_session() as session:
+                if storage_id is None:
+                    moves = await self.__plan_rebalance(session)
+                else:
+                    moves = await self.__plan_drain(session, storage_id)
+            self._progress.files_total = len(moves)
+            self._progress.bytes_total = sum(move.size for move in moves)
+            queue: asyncio.Queue[BlobMove] = asyncio.Queue()
+            for move in moves:
+                queue.put_nowait(move)
+            await asyncio.gather(
+                *(
+                    self.__worker(queue)
+                    for _ in range(config.settings.REBALANCE_CONCURRENCY)
+                )
+            )
+            self._progress.status = "finished"
+        except asyncio.CancelledError:
+            self._progress.status = "cancelled"
+            raise
+        except Exception:
+            logging.exception("Storage rebalancing failed")
+            self._progress.status = "failed"
+        finally:
+            self._progress.finished_at = datetime.utcnow()
+
+    async def __plan_drain(
+        self, session: AsyncSession, storage_id: str
+    ) -> list[BlobMove]:
+        source = await session.get(models.StorageRecord, storage_id)
+        if source is None:
+            raise core.StorageNotFound()
+        # Priority 0 takes the node out of upload placement while it drains.
+        source.priority = 0
+        await session.commit()
+        targets = await self.__find_targets(session, exclude=source.id)
+        free_space = {target.id: target.free for target in targets}
+        moves = []
+        async for file_id, size, last_modified in self.__files_on(session, source):
+            target = max(
+                targets, key=lambda target: free_space[target.id], default=None
+            )
+            if target is None or free_space[target.id] < size:
+                self._progress.files_skipped += 1
+                continue
+            free_space[target.id] -= size
+            moves.append(BlobMove(file_id, size, last_modified, source, target))
+        return moves
+
+    async def __plan_rebalance(self, session: AsyncSession) -> list[BlobMove]:
+        storages = await self.__find_targets(session)
+        total_capacity = sum(storage.capacity for storage in storages)
+        if not total_capacity:
+            return []
+        ratio = sum(storage.used_space for storage in storages) / total_capacity
+        tolerance = config.settings.REBALANCE_TOLERANCE
+        deficits = {
+            storage.id: int(ratio * storage.capacity) - storage.used_space
+            for storage in storages
+        }
+        targets = [storage for storage in storages if deficits[storage.id] > 0]
+        moves = []
+        for source in storages:
+            if source.used_space <= (ratio + tolerance) * source.capacity:
+                continue
+            excess = -deficits[source.id]
+            async for file_id, size, last_modified in self.__files_on(session, source):
+                if excess <= 0:
+                    break
+                target = max(targets, key=lambda target: deficits[target.id])
+                if deficits[target.id] < size:
+                    continue
+                deficits[target.id] -= size
+                excess -= size
+                moves.append(BlobMove(file_id, size, last_modified, source, target))
+        return moves
+
+    async def __find_targets(
+        self, session: AsyncSession, exclude: str | None = None
+    ) -> list[models.StorageRecord]:
+        return list(
+            await session.scalars(
+                select(models.StorageRecord).where(
+                    models.StorageRecord.priority > 0,
+                    models.StorageRecord.capacity > 0,
+                    models.StorageRecord.id != exclude,
+                )
+            )
+        )
+
+    @staticmethod
+    async def __files_on(
+        session: AsyncSession, storage: models.StorageRecord
+    ) -> AsyncIterator[tuple[str, int, datetime]]:
+        files = await session.stream(
+            select(
+                models.FileRecord.id,
+                models.FileRecord.size,
+                models.FileRecord.last_modified,
+            )
+            .where(models.FileRecord.storage_id == storage.id)
+            .order_by(models.FileRecord.size.desc())
+        )
+        async for file_id, size, last_modified in files:
+            yield file_id, size, last_modified
+
+    async def __worker(self, queue: asyncio.Queue[BlobMove]):
+        while not queue.empty():
+            move = queue.get_nowait()
+            try:
+                if await self.__move(move):
+                    self._progress.files_moved += 1
+                    self._progress.bytes_moved += move.size
+                else:
+                    self._progress.files_skipped += 1
+            except (core.StorageResponseError, aiohttp.ClientError):
+                logging.exception("Could not move blob %s", move.file_id)
+                self._progress.files_failed += 1
+
+    async def __move(self, move: BlobMove) -> bool:
+        async with self._async_session() as session:
+            reservation_id = await self.__reserve(session, move)
+        if reservation_id is None:
+            return False
+        try:
+            return await self.__copy_and_flip(move, reservation_id)
+        finally:
+            async with self._async_session() as session:
+                await crud.delete_upload_record(session, reservation_id)
+                await session.commit()
+
+    async def __reserve(self, session: AsyncSession, move: BlobMove) -> str | None:
+        # The reservation keeps overwrites of the file away while its blob is
+        # copied, as both would write the same blob id on the target.
+        file_record = await session.get(
+            models.FileRecord,
+            move.file_id,
+            options=[joinedload(models.FileRecord.folder)],
+        )
+        if file_record is None or await crud.has_pending_upload(session, move.file_id):
+            return None
+        upload_record = await crud.create_upload_record(
+            session,
+            await file_record.folder.awaitable_attrs.owner,
+            await session.merge(move.target, load=False),
+            file_record.full_path,
+            move.size,
+            file_record,
+            kind="move",
+        )
+        reservation_id = upload_record.id
+        await session.commit()
+        return reservation_id
+
+    async def __copy_and_flip(self, move: BlobMove, reservation_id: str) -> bool:
+        async with aiohttp.ClientSession() as http:
+            target_space = await self.__copy(http, move, reservation_id)
+            async with self._async_session() as session:
+                await self.__set_used_space(session, move.target, target_space)
+                flipped = await session.scalar(
+                    update(models.FileRecord)
+                    .where(
+                        models.FileRecord.id == move.file_id,
+                        models.FileRecord.storage_id == move.source.id,
+                        models.FileRecord.last_modified == move.last_modified,
+                    )
+                    .values(
+                        storage_id=move.target.id,
+                        last_modified=models.FileRecord.last_modified,
+                    )
+                    .returning(models.FileRecord.id)
+                )
+                await session.commit()
+                if flipped is None:
+                    # The file was deleted or overwritten while it was copied.
+                    # An overwrite may have put it on the target, and then
+                    # the blob there is the live one.
+                    storage_id = await session.scalar(
+                        select(models.FileRecord.storage_id).where(
+                            models.FileRecord.id == move.file_id
+                        )
+                    )
+                    if storage_id != move.target.id:
+                        await self.__remove(session, http, move.target, move.file_id)
+                    return False
+                await self.__remove(session, http, move.source, move.file_id)
+        return True
+
+    async def __remove(
+        self,
+        session: AsyncSession,
+        http: aiohttp.ClientSession,
+        storage: models.StorageRecord,
+        blob_id: str,
+    ):
+        try:
+            space = await self.__delete(http, storage, blob_id)
+        except (core.StorageResponseError, aiohttp.ClientError):
+            logging.exception("Blob %s was left on storage %s", blob_id, storage.id)
+            return
+        await self.__set_used_space(session, storage, space)
+        await session.commit()
+
+    async def __copy(
+        self, http: aiohttp.ClientSession, move: BlobMove, reservation_id: str
+    ) -> storage_api.StorageSpaceResponse:
+        async with http.get(
+            f"{move.source.url}/file/{move.file_id}",
+            headers=storage_api.storage_headers(move.source.token),
+        ) as source_response:
+            BaseHandler.validate_response(source_response)
+            async with http.post(
+                f"{move.target.url}/file/{move.file_id}",
+                data=refresh_reservation(
+                    self.__throttle(source_response),
+                    self._async_session.kw["bind"],
+                    reservation_id,
+                ),
+                headers=storage_api.upload_headers(move.target.token, move.size),
+            ) as target_response:
+                BaseHandler.validate_response(target_response)
+                return storage_api.StorageSpaceResponse.model_validate(
+                    await target_response.json()
+                )
+
+    async def __delete(
+        self, http: aiohttp.ClientSession, storage: models.StorageRecord, blob_id: str
+    ) -> storage_api.StorageSpaceResponse:
+        async with http.delete(
+            f"{storage.url}/file/{blob_id}",
+            headers=storage_api.storage_headers(storage.token),
+        ) as response:
+            BaseHandler.validate_response(response)
+            return storage_api.StorageSpaceResponse.model_validate(
+                await response.json()
+            )
+
+    async def __throttle(self, response: ClientResponse) -> AsyncIterator[bytes]:
+        async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+            await self._limiter.acquire(len(chunk))
+            yield chunk
+
+    @staticmethod
+    async def __set_used_space(
+        session: AsyncSession,
+        storage: models.StorageRecord,
+        space: storage_api.StorageSpaceResponse,
+    ):
+        await session.execute(
+            update(models.StorageRecord)
+            .where(models.StorageRecord.id == storage.id)
+            .values(used_space=space.used)
+        )
+
+
+rebalancer = StorageRebalancer(db.async_session)
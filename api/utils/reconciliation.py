@@ -0,0 +1,111 @@
+import logging
+
+import aiohttp
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..db import crud, models
+from ..exceptions import core
+from ..schemas import storage_api
+from ..schemas.admin import StorageReconciliation
+from .storage import BaseHandler, open_storage_session
+
+
+class StorageReconciler:
+    def __init__(self, db: AsyncSession, storage: models.StorageRecord) -> None:
+        self._session = db
+        self._storage = storage
+        self._headers = storage_api.storage_headers(storage.token)
+
+    async def __call__(
+        self, files_size: int, reserved_size: int, fix: bool = False
+    ) -> StorageReconciliation:
+        async with open_storage_session(self._storage) as http:
+            space = await self.__fetch_space(http)
+            missing = await crud.find_blob_ids(
+                self._session, self._storage, include_uploads=False
+            )
+            unknown = []
+            async for blob_id in self.__list_blobs(http):
+                if blob_id in missing:
+                    missing.discard(blob_id)
+                else:
+                    unknown.append(blob_id)
+            # Uploads and blob moves reserve their blob ids before writing
+            # them, so a lookup that starts after the listing rules them out.
+            # It needs its own transaction to see reservations committed
+            # since the first one took its snapshot.
+            async with AsyncSession(self._session.bind) as session:
+                orphaned = set(unknown) - await crud.find_blob_ids(
+                    session, self._storage, unknown
+                )
+            report = StorageReconciliation(
+                storage_id=self._storage.id,
+                recorded_used=self._storage.used_space,
+                reported_used=space.used,
+                files_size=files_size,
+                reserved_size=reserved_size,
+                drift=space.used - files_size,
+                orphaned=sorted(orphaned),
+                missing=sorted(missing),
+            )
+            if fix:
+                for blob_id in report.orphaned:
+                    space = await self.__delete_blob(http, blob_id)
+                self._storage.used_space = space.used
+                report.fixed = True
+        return report
+
+    async def __fetch_space(
+        self, http: aiohttp.ClientSession
+    ) -> storage_api.StorageSpaceResponse:
+        async with http.get("/space", headers=self._headers) as res:
+            BaseHandler.validate_response(res)
+            return storage_api.StorageSpaceResponse.model_validate(await res.json())
+
+    async def __list_blobs(self, http: aiohttp.ClientSession):
+        cursor: str | None = None
+        while True:
+            params = {"cursor": cursor} if cursor else {}
+            async with http.get("/files", headers=self._headers, params=params) as res:
+                BaseHandler.validate_response(res)
+                page = storage_api.StorageFilesResponse.model_validate(await res.json())
+            for storage_file in page.files:
+                yield storage_file.id
+            if page.next_cursor is None:
+                return
+            cursor = page.next_cursor
+
+    async def __delete_blob(
+        self, http: aiohttp.ClientSession, blob_id: str
+    ) -> storage_api.StorageSpaceResponse:
+        async with http.delete(f"/file/{blob_id}", headers=self._headers) as res:
+            BaseHandler.validate_response(res)
+            return storage_api.StorageSpaceResponse.model_validate(await res.json())
+
+
+async def reconcile_storages(
+    db: AsyncSession, fix: bool = False
+) -> list[StorageReconciliation]:
+    reports = []
+    usage = await crud.calculate_storage_usage(db)
+    for storage_id, (files_size, reserved_size) in usage.items():
+        storage = await db.get(models.StorageRecord, storage_id)
+        if storage is None:
+            continue
+        try:
+            report = await StorageReconciler(db, storage)(
+                files_size, reserved_size, fix
+            )
+        except (core.StorageResponseError, aiohttp.ClientError):
+            logging.exception("Could not reconcile storage %s", storage_id)
+            continue
+        if report.drift or report.orphaned or report.missing:
+            logging.warning(
+                "Storage %s drifted by %d bytes, %d orphaned and %d missing blobs",
+                storage_id,
+                report.drift,
+                len(report.orphaned),
+                len(report.missing),
+            )
+        reports.append(report)
+    return reports
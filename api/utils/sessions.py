@@ -1,3 +1,4 @@
+import time
 from collections.abc import MutableMapping
 from threading import Lock
 from uuid import UUID, uuid4
@@ -5,14 +6,28 @@ from uuid import UUID, uuid4
 from cachetools import TTLCache
 
 from .. import config
+from .metrics import SESSION_LOCK_WAIT, Gauge, registry
 
 
-class BaseSessionStorage(MutableMapping[str, UUID]):
+class TimedLock:
     def __init__(self) -> None:
         self._lock = Lock()
 
+    def __enter__(self):
+        started_at = time.perf_counter()
+        self._lock.acquire()
+        SESSION_LOCK_WAIT.observe(time.perf_counter() - started_at)
+
+    def __exit__(self, *exc_info):
+        self._lock.release()
+
+
+class BaseSessionStorage(MutableMapping[str, UUID]):
+    def __init__(self) -> None:
+        self._lock = TimedLock()
+
     @property
-    def lock(self) -> Lock:
+    def lock(self) -> TimedLock:
         return self._lock
 
     def add(self, key_id: str) -> UUID:
@@ -33,4 +48,11 @@ def create_session_dependency():
     session_storage = SessionStorage(
         config.settings.SESSION_STORAGE_MAX_SIZE, config.settings.SESSION_TTL
     )
+    registry.register(
+        Gauge(
+            "session_storage_size",
+            "Pending authentication sessions",
+            function=lambda: len(session_storage),
+        )
+    )
     return get_session
@@ -1,15 +1,47 @@
+import time
+from contextlib import suppress
+from datetime import datetime
 from typing import AsyncIterator, Type, TypeVar
 
 import aiohttp
 from aiohttp.client import ClientResponse
 from fastapi import status
 from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession
+from sqlalchemy.orm import joinedload
 
+from .. import config
 from ..db import crud, models
+from ..db.resolver import RecordResolver
 from ..exceptions import client, core
 from ..schemas import storage_api
+from .metrics import STORAGE_BYTES_RECEIVED, storage_trace_config, track_transfer
 from .path_utils import add_trailing_slash, split_head_and_tail
+from .tracing import storage_tracing_config
+
+
+def open_storage_session(storage: models.StorageRecord) -> aiohttp.ClientSession:
+    trace_configs = [storage_trace_config(storage.id)]
+    if config.settings.TRACING_ENABLED:
+        trace_configs.append(storage_tracing_config())
+    return aiohttp.ClientSession(storage.url, trace_configs=trace_configs)
+
+
+async def refresh_reservation(
+    stream: AsyncIterator[bytes], bind: AsyncEngine | AsyncConnection, upload_id: str
+) -> AsyncIterator[bytes]:
+    # Keeps a long transfer from being reaped as abandoned. The request's own
+    # session is idle during the transfer, so the refresh commits separately.
+    interval = config.settings.UPLOAD_RESERVATION_TTL / 3
+    refreshed = time.monotonic()
+    async for chunk in stream:
+        if time.monotonic() - refreshed > interval:
+            async with AsyncSession(bind) as session:
+                if not await crud.refresh_upload_record(session, upload_id):
+                    raise client.NotExists(detail="Upload reservation expired")
+                await session.commit()
+            refreshed = time.monotonic()
+        yield chunk
 
 
 class BaseHandler:
@@ -29,18 +61,21 @@ class BaseHandler:
             raise core.StorageResponseError(response)
 
     async def parse_storage_space(self, response: ClientResponse):
-        storage_info = storage_api.StorageSpaceResponse.parse_obj(await response.json())
+        storage_info = storage_api.StorageSpaceResponse.model_validate(
+            await response.json()
+        )
         self._storage.used_space = storage_info.used
 
 
 class DeleteFileHandler(BaseHandler):
-    async def delete_from_storage(self, file_record: models.FileRecord):
-        async with aiohttp.ClientSession(self._storage.url) as session:
+    async def delete_from_storage(self, record: models.FileRecord):
+        await self.delete_blob(record.id)
+
+    async def delete_blob(self, blob_id: str):
+        async with open_storage_session(self._storage) as session:
             async with session.delete(
-                f"/file/{file_record.id}",
-                headers=storage_api.StorageRequestHeaders(
-                    authorization=self._storage.token
-                ).dict(by_alias=True),
+                f"/file/{blob_id}",
+                headers=storage_api.storage_headers(self._storage.token),
             ) as res:
                 self.validate_response(res)
                 await self.parse_storage_space(res)
@@ -51,33 +86,49 @@ class DeleteFileHandler(BaseHandler):
 
 class BaseUploadFileHandler(BaseHandler):
     async def upload_stream(
-        self, stream: AsyncIterator[bytes], file_record: models.FileRecord
+        self, stream: AsyncIterator[bytes], upload_record: models.UploadRecord
     ):
-        async with aiohttp.ClientSession(self._storage.url) as session:
-            async with session.post(
-                f"/file/{file_record.id}",
-                data=stream,
-                headers=storage_api.UploadRequestHeaders(
-                    authorization=self._storage.token, file_size=str(file_record.size)
-                ).dict(by_alias=True),
-            ) as res:
-                self.validate_response(res)
-                await self.parse_storage_space(res)
+        with track_transfer("upload"):
+            async with open_storage_session(self._storage) as session:
+                async with session.post(
+                    f"/file/{upload_record.blob_id}",
+                    data=refresh_reservation(
+                        stream, self._session.bind, upload_record.id
+                    ),
+                    headers=storage_api.upload_headers(
+                        self._storage.token, upload_record.size
+                    ),
+                ) as res:
+                    self.validate_response(res)
+                    await self.parse_storage_space(res)
 
 
 class UploadExistingFileRecordHandler(BaseUploadFileHandler):
     async def __call__(
-        self,
-        file_record: models.FileRecord,
-        file_size: int,
-        stream: AsyncIterator[bytes],
+        self, upload_record: models.UploadRecord, stream: AsyncIterator[bytes]
     ) -> models.FileRecord:
+        await self.upload_stream(stream, upload_record)
+        await crud.lock_key(self._session, self._client)
+        file_record = await self._session.get(
+            models.FileRecord, upload_record.blob_id, with_for_update=True
+        )
+        if file_record is None:
+            raise client.NotExists(detail="File was deleted during upload")
         old_storage_id = file_record.storage_id
+        await crud.update_file_totals(
+            self._session,
+            self._client.id,
+            file_record.full_path,
+            upload_record.size - file_record.size,
+            0,
+        )
         file_record.storage = self._storage
-        file_record.size = file_size
+        file_record.size = upload_record.size
         file_record.update_timestamp()
-        await self.upload_stream(stream, file_record)
         self._session.add(file_record)
+        crud.record_change(
+            self._session, self._client.id, "upload", "file", file_record.full_path
+        )
         try:
             if old_storage_id != self._storage.id:
                 await self.__delete_from_old_storage(file_record, old_storage_id)
@@ -97,20 +148,26 @@ class UploadExistingFileRecordHandler(BaseUploadFileHandler):
 
 class UploadNewFileRecordHandler(BaseUploadFileHandler):
     async def __call__(
-        self, full_path: str, file_size: int, stream: AsyncIterator[bytes]
+        self, upload_record: models.UploadRecord, stream: AsyncIterator[bytes]
     ) -> models.FileRecord:
-        folder_name, filename = split_head_and_tail(full_path)
-        folder_record = await crud.find_folder(
-            self._session, owner=self._client, full_path=folder_name
-        )
+        await self.upload_stream(stream, upload_record)
+        await crud.lock_key(self._session, self._client)
+        folder_name, filename = split_head_and_tail(upload_record.full_path)
+        resolver = RecordResolver(self._session, self._client, for_update=True)
+        await resolver.prefetch(upload_record.full_path, refresh=True)
+        folder_record = await resolver.folder(folder_name)
         if folder_record is None:
             raise client.NotExists(detail="Parent folder doesn't exist")
-        file_record = await crud.create_file_record(
-            self._session, folder_record, filename, self._storage, file_size
+        if await resolver.file(upload_record.full_path):
+            raise client.AlreadyExists(detail="File was created during upload")
+        return await crud.create_file_record(
+            self._session,
+            folder_record,
+            filename,
+            self._storage,
+            upload_record.size,
+            file_id=upload_record.id,
         )
-        await self.upload_stream(stream, file_record)
-        self._session.add(file_record)
-        return file_record
 
 
 Handler = TypeVar("Handler", bound=BaseHandler)
@@ -122,10 +179,12 @@ class StorageClient:
         db: AsyncSession,
         key_record: models.KeyRecord,
         storage: models.StorageRecord,
+        resolver: RecordResolver | None = None,
     ):
         self._session = db
         self._client = key_record
         self._storage = storage
+        self._resolver = resolver or RecordResolver(db, key_record)
 
     @property
     def session(self) -> AsyncSession:
@@ -139,63 +198,123 @@ class StorageClient:
     def storage(self) -> models.StorageRecord:
         return self._storage
 
+    @property
+    def resolver(self) -> RecordResolver:
+        return self._resolver
+
     @staticmethod
     async def download_file(file_record: models.FileRecord) -> AsyncIterator[bytes]:
-        async with aiohttp.ClientSession(
-            (await file_record.awaitable_attrs.storage).url
-        ) as session:
-            async with session.get(
-                f"/file/{file_record.id}",
-                headers=storage_api.StorageRequestHeaders(
-                    authorization=(await file_record.awaitable_attrs.storage).token
-                ).dict(by_alias=True),
-            ) as res:
-                BaseHandler.validate_response(res)
-                async for chunk in res.content.iter_any():
-                    yield chunk
+        storage = await file_record.awaitable_attrs.storage
+        with track_transfer("download"):
+            async with open_storage_session(storage) as session:
+                async with session.get(
+                    f"/file/{file_record.id}",
+                    headers=storage_api.storage_headers(storage.token),
+                ) as res:
+                    BaseHandler.validate_response(res)
+                    async for chunk in res.content.iter_any():
+                        STORAGE_BYTES_RECEIVED.inc(len(chunk), storage.id)
+                        yield chunk
 
     @classmethod
     async def delete_folder(cls, db: AsyncSession, folder_record: models.FolderRecord):
+        owner = await folder_record.awaitable_attrs.owner
         files_to_delete = await db.stream_scalars(
             select(models.FileRecord)
-            .join(models.FileRecord.folder)
+            .options(joinedload(models.FileRecord.storage))
             .where(
-                models.FolderRecord.owner_id == folder_record.owner_id,
-                models.FileRecord.full_path.startswith(
-                    add_trailing_slash(folder_record.full_path)
+                models.FileRecord.folder_id.in_(
+                    select(models.FolderRecord.id).where(
+                        models.FolderRecord.owner_id == folder_record.owner_id
+                    )
+                ),
+                crud.path_range(
+                    models.FileRecord.full_path,
+                    add_trailing_slash(folder_record.full_path),
                 ),
             )
         )
         async for file_record in files_to_delete:
-            storage_client = cls(
-                db,
-                await folder_record.awaitable_attrs.owner,
-                await file_record.awaitable_attrs.storage,
-            )
-            await storage_client.delete_file(file_record)
-        await db.delete(folder_record)
-        await db.flush()
-
-    async def upload_file(
-        self, full_path: str, file_size: int, stream: AsyncIterator[bytes]
-    ) -> models.FileRecord:
-        file_record = await crud.find_file(
-            self._session, self._client, full_path=full_path
+            delete_handler = DeleteFileHandler(db, owner, file_record.storage)
+            await delete_handler.delete_from_storage(file_record)
+        # Like renames and moves, one folder change covers everything below it.
+        crud.record_change(
+            db, folder_record.owner_id, "delete", "folder", folder_record.full_path
         )
+        await crud.delete_folder(db, folder_record)
+
+    @classmethod
+    async def cleanup_abandoned_uploads(
+        cls, db: AsyncSession, refreshed_before: datetime
+    ):
+        for upload_record in await crud.find_abandoned_uploads(db, refreshed_before):
+            storage_client = cls(db, upload_record.owner, upload_record.storage)
+            await storage_client.cancel_upload(upload_record.id, upload_record.file_id)
+            await db.commit()
+
+    async def reserve_upload(
+        self, full_path: str, file_size: int
+    ) -> models.UploadRecord:
+        file_record = await self._resolver.file(full_path)
         if file_record is None:
-            file_record = await self.__create_handler(UploadNewFileRecordHandler)(
-                full_path, file_size, stream
-            )
+            folder_name, _ = split_head_and_tail(full_path)
+            if await self._resolver.folder(folder_name) is None:
+                raise client.NotExists(detail="Parent folder doesn't exist")
+        elif await crud.has_pending_upload(self._session, file_record.id):
+            # Writers of the same blob would overwrite each other's content.
+            raise client.FileBusy()
+        return await crud.create_upload_record(
+            self._session,
+            self._client,
+            self._storage,
+            full_path,
+            file_size,
+            file_record,
+        )
+
+    async def upload_reserved(
+        self, upload_record: models.UploadRecord, stream: AsyncIterator[bytes]
+    ) -> models.FileRecord:
+        handler: UploadNewFileRecordHandler | UploadExistingFileRecordHandler
+        if upload_record.file_id is None:
+            handler = self.__create_handler(UploadNewFileRecordHandler)
         else:
-            file_record = await self.__create_handler(UploadExistingFileRecordHandler)(
-                file_record, file_size, stream
-            )
+            handler = self.__create_handler(UploadExistingFileRecordHandler)
+        file_record = await handler(upload_record, stream)
+        await self._session.delete(upload_record)
         self._session.add(self._storage)
         await self._session.flush()
         return file_record
 
+    async def cancel_upload(self, upload_id: str, file_id: str | None):
+        # Called after a rollback, which expires everything the session loaded,
+        # so the reservation is removed by id and the storage is reloaded.
+        await self._session.refresh(self._storage)
+        if file_id is None:
+            with suppress(core.StorageResponseError, aiohttp.ClientError):
+                await self.__create_handler(DeleteFileHandler).delete_blob(upload_id)
+        await crud.delete_upload_record(self._session, upload_id)
+        self._session.add(self._storage)
+        await self._session.flush()
+
+    async def upload_file(
+        self, full_path: str, file_size: int, stream: AsyncIterator[bytes]
+    ) -> models.FileRecord:
+        upload_record = await self.reserve_upload(full_path, file_size)
+        return await self.upload_reserved(upload_record, stream)
+
     async def delete_file(self, file_record: models.FileRecord):
         await self.__create_handler(DeleteFileHandler)(file_record)
+        crud.record_change(
+            self._session, self._client.id, "delete", "file", file_record.full_path
+        )
+        await crud.update_file_totals(
+            self._session,
+            self._client.id,
+            file_record.full_path,
+            -file_record.size,
+            -1,
+        )
         await self._session.delete(file_record)
         await self._session.flush()
 
@@ -0,0 +1,33 @@
+from typing import AsyncIterator
+
+from pydantic import BaseModel
+from sqlalchemy.engine import RowMapping
+
+from .serialization import dumps
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+EVENT_STREAM_MEDIA_TYPE = "text/event-stream"
+
+
+def accepts_ndjson(accept: str | None) -> bool:
+    return accept is not None and NDJSON_MEDIA_TYPE in accept
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    remainder = b""
+    async for chunk in chunks:
+        lines = (remainder + chunk).split(b"\n")
+        remainder = lines.pop()
+        for line in lines:
+            yield line
+    if remainder:
+        yield remainder
+
+
+async def ndjson_lines(items: AsyncIterator[RowMapping]) -> AsyncIterator[bytes]:
+    async for item in items:
+        yield dumps(item) + b"\n"
+
+
+def server_sent_event(data: BaseModel, event: str, event_id: int | str) -> str:
+    return f"id: {event_id}\nevent: {event}\ndata: {data.model_dump_json()}\n\n"
@@ -0,0 +1,32 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable
+
+from .. import config
+from ..db import engine as db
+from .reconciliation import reconcile_storages
+from .storage import StorageClient
+
+
+async def run_periodically(interval: float, job: Callable[[], Awaitable[Any]]):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await job()
+        except Exception:
+            logging.exception("Periodic task %s failed", job.__name__)
+
+
+async def cleanup_abandoned_uploads():
+    refreshed_before = datetime.utcnow() - timedelta(
+        seconds=config.settings.UPLOAD_RESERVATION_TTL
+    )
+    async with db.async_session() as session:
+        await StorageClient.cleanup_abandoned_uploads(session, refreshed_before)
+
+
+async def reconcile_storage_accounting():
+    async with db.async_session() as session:
+        await reconcile_storages(session, config.settings.STORAGE_RECONCILE_FIX)
+        await session.commit()
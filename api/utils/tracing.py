@@ -0,0 +1,321 @@
+import inspect
+import json
+import re
+import secrets
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from threading import Lock
+from types import SimpleNamespace
+from typing import Any, Awaitable, Callable, Iterator, Literal, TypeVar, cast
+
+import aiohttp
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .. import config
+
+SpanKind = Literal["internal", "server", "client"]
+
+TRACEPARENT_HEADER = "traceparent"
+TRACEPARENT_PATTERN = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+SPAN_KINDS = {"internal": 1, "server": 2, "client": 3}
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+Function = TypeVar("Function", bound=Callable[..., Any])
+
+
+class Span:
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_id: str | None = None,
+        kind: SpanKind = "internal",
+        attributes: dict[str, Any] | None = None,
+    ) -> None:
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = attributes or {}
+        self.status = STATUS_OK
+        self.start_time = time.time_ns()
+        self.end_time = 0
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def set_error(self, exc: BaseException):
+        self.status = STATUS_ERROR
+        self.attributes["exception.type"] = type(exc).__name__
+
+    def end(self):
+        self.end_time = time.time_ns()
+        exporter.export(self)
+
+    def to_otlp(self) -> dict[str, Any]:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": SPAN_KINDS[self.kind],
+            "startTimeUnixNano": str(self.start_time),
+            "endTimeUnixNano": str(self.end_time),
+            "attributes": [
+                {"key": key, "value": otlp_value(value)}
+                for key, value in self.attributes.items()
+            ],
+            "status": {"code": self.status},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+def otlp_value(value: Any) -> dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class FileSpanExporter:
+    def __init__(self, buffer_size: int = 512) -> None:
+        self._buffer_size = buffer_size
+        self._spans: list[Span] = []
+        self._lock = Lock()
+        # A single thread writes the batches in order and keeps file I/O off
+        # the event loop.
+        self._writer = ThreadPoolExecutor(1, thread_name_prefix="span-exporter")
+        self._pending: Future | None = None
+
+    def export(self, span: Span):
+        with self._lock:
+            self._spans.append(span)
+            # Server spans finish last in a request, so a whole trace is
+            # written at once.
+            if span.kind != "server" and len(self._spans) < self._buffer_size:
+                return
+            self.__submit()
+
+    def flush(self):
+        with self._lock:
+            if self._spans:
+                self.__submit()
+            pending = self._pending
+        if pending is not None:
+            pending.result()
+
+    def __submit(self):
+        spans, self._spans = self._spans, []
+        self._pending = self._writer.submit(self.write, spans)
+
+    def write(self, spans: list[Span]):
+        # One OTLP/JSON export request per line, as read by the collector's
+        # otlpjsonfile receiver.
+        request = {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [
+                            {
+                                "key": "service.name",
+                                "value": otlp_value(
+                                    config.settings.TRACING_SERVICE_NAME
+                                ),
+                            }
+                        ]
+                    },
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": __name__},
+                            "spans": [span.to_otlp() for span in spans],
+                        }
+                    ],
+                }
+            ]
+        }
+        with open(config.settings.TRACING_EXPORT_PATH, "a") as file:
+            file.write(json.dumps(request) + "\n")
+
+
+exporter = FileSpanExporter()
+current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+
+
+def parse_traceparent(value: str | None) -> tuple[str, str | None]:
+    match = TRACEPARENT_PATTERN.match(value or "")
+    if match is None:
+        return secrets.token_hex(16), None
+    return match.group(1), match.group(2)
+
+
+@contextmanager
+def start_span(
+    name: str, kind: SpanKind = "internal", **attributes: Any
+) -> Iterator[Span | None]:
+    parent = current_span.get()
+    if parent is None:
+        yield None
+        return
+    span = Span(name, parent.trace_id, parent.span_id, kind, attributes)
+    token = current_span.set(span)
+    try:
+        yield span
+    except BaseException as exc:
+        span.set_error(exc)
+        raise
+    finally:
+        current_span.reset(token)
+        span.end()
+
+
+def traced(function: Function) -> Function:
+    name = function.__name__
+    if inspect.iscoroutinefunction(function):
+
+        @wraps(function)
+        async def async_wrapper(*args, **kwargs):
+            with start_span(name):
+                return await function(*args, **kwargs)
+
+        return cast(Function, async_wrapper)
+
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        with start_span(name):
+            return function(*args, **kwargs)
+
+    return cast(Function, wrapper)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def start_statement_span(conn, cursor, statement, parameters, context, executemany):
+    parent = current_span.get()
+    if parent is None:
+        return
+    span = Span(
+        statement.split(None, 1)[0].upper() if statement else "SQL",
+        parent.trace_id,
+        parent.span_id,
+        "client",
+        {"db.system": conn.dialect.name, "db.statement": statement},
+    )
+    conn.info.setdefault("statement_spans", []).append(span)
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def end_statement_span(conn, cursor, statement, parameters, context, executemany):
+    if conn.info.get("statement_spans"):
+        conn.info["statement_spans"].pop().end()
+
+
+@event.listens_for(Engine, "handle_error")
+def fail_statement_span(context):
+    if context.connection is None:
+        return
+    spans = context.connection.info.get("statement_spans")
+    if spans:
+        span = spans.pop()
+        span.set_error(context.original_exception)
+        span.end()
+
+
+def storage_tracing_config() -> aiohttp.TraceConfig:
+    async def on_request_start(
+        session: aiohttp.ClientSession,
+        context: SimpleNamespace,
+        params: aiohttp.TraceRequestStartParams,
+    ):
+        parent = current_span.get()
+        context.span = None
+        if parent is None:
+            return
+        context.span = Span(
+            f"{params.method} {params.url.path}",
+            parent.trace_id,
+            parent.span_id,
+            "client",
+            {"http.method": params.method, "http.url": str(params.url)},
+        )
+        params.headers[TRACEPARENT_HEADER] = context.span.traceparent
+
+    async def on_request_end(
+        session: aiohttp.ClientSession,
+        context: SimpleNamespace,
+        params: aiohttp.TraceRequestEndParams,
+    ):
+        if context.span is not None:
+            context.span.attributes["http.status_code"] = params.response.status
+            context.span.end()
+
+    async def on_request_exception(
+        session: aiohttp.ClientSession,
+        context: SimpleNamespace,
+        params: aiohttp.TraceRequestExceptionParams,
+    ):
+        if context.span is not None:
+            context.span.set_error(params.exception)
+            context.span.end()
+
+    trace_config = aiohttp.TraceConfig()
+    callbacks: list[tuple[Any, Callable[..., Awaitable[None]]]] = [
+        (trace_config.on_request_start, on_request_start),
+        (trace_config.on_request_end, on_request_end),
+        (trace_config.on_request_exception, on_request_exception),
+    ]
+    for signal, callback in callbacks:
+        signal.append(callback)
+    return trace_config
+
+
+class TracingMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not config.settings.TRACING_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        trace_id, parent_id = parse_traceparent(
+            Headers(scope=scope).get(TRACEPARENT_HEADER)
+        )
+        span = Span(
+            scope["method"],
+            trace_id,
+            parent_id,
+            "server",
+            {"http.method": scope["method"], "http.target": scope["path"]},
+        )
+        token = current_span.set(span)
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                span.attributes["http.status_code"] = message["status"]
+                if message["status"] >= 500:
+                    span.status = STATUS_ERROR
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException as exc:
+            span.set_error(exc)
+            raise
+        finally:
+            current_span.reset(token)
+            route = scope.get("route")
+            if route is not None:
+                span.name = f"{scope['method']} {route.path}"
+                span.attributes["http.route"] = route.path
+            span.end()
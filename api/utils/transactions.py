@@ -0,0 +1,45 @@
+from typing import Callable, Coroutine
+
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .. import config
+from ..db.engine import is_serialization_failure
+
+RouteHandler = Callable[[Request], Coroutine[None, None, Response]]
+
+
+def get_request_session(request: Request) -> AsyncSession | None:
+    return getattr(request.state, "db_session", None)
+
+
+def body_is_replayable(request: Request) -> bool:
+    return hasattr(request, "_body") or not getattr(request, "_stream_consumed", False)
+
+
+class TransactionalRoute(APIRoute):
+    def get_route_handler(self) -> RouteHandler:
+        route_handler = super().get_route_handler()
+
+        async def transactional_route_handler(request: Request) -> Response:
+            attempt = 1
+            while True:
+                try:
+                    response = await route_handler(request)
+                    if session := get_request_session(request):
+                        await session.commit()
+                    return response
+                except DBAPIError as exc:
+                    if session := get_request_session(request):
+                        await session.rollback()
+                    if (
+                        not is_serialization_failure(exc)
+                        or attempt >= config.settings.DATABASE_SERIALIZATION_RETRIES
+                        or not body_is_replayable(request)
+                    ):
+                        raise
+                    attempt += 1
+
+        return transactional_route_handler
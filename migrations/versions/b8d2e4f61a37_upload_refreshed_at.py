@@ -0,0 +1,26 @@
+"""Upload reservation refresh time
+
+Revision ID: b8d2e4f61a37
+Revises: e7b3f19a4c26
+Create Date: 2026-10-19 19:02:44.118203
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "b8d2e4f61a37"
+down_revision = "e7b3f19a4c26"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("uploads", sa.Column("refreshed_at", sa.DateTime(), nullable=True))
+    op.execute("UPDATE uploads SET refreshed_at = created_at")
+    with op.batch_alter_table("uploads") as batch_op:
+        batch_op.alter_column("refreshed_at", nullable=False)
+
+
+def downgrade() -> None:
+    op.drop_column("uploads", "refreshed_at")
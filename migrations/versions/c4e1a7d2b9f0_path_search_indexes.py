@@ -0,0 +1,43 @@
+"""Path search indexes
+
+Revision ID: c4e1a7d2b9f0
+Revises: 5d89ed468abd
+Create Date: 2026-10-19 16:02:47.118305
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "c4e1a7d2b9f0"
+down_revision = "5d89ed468abd"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_index(
+        "ix_folders_full_path_trgm",
+        "folders",
+        ["full_path"],
+        unique=False,
+        postgresql_using="gin",
+        postgresql_ops={"full_path": "gin_trgm_ops"},
+    )
+    op.create_index(
+        "ix_files_full_path_trgm",
+        "files",
+        ["full_path"],
+        unique=False,
+        postgresql_using="gin",
+        postgresql_ops={"full_path": "gin_trgm_ops"},
+    )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.drop_index("ix_files_full_path_trgm", table_name="files")
+    op.drop_index("ix_folders_full_path_trgm", table_name="folders")
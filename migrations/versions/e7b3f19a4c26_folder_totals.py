@@ -0,0 +1,44 @@
+"""Folder totals
+
+Revision ID: e7b3f19a4c26
+Revises: c4e1a7d2b9f0
+Create Date: 2026-10-19 17:12:05.402117
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "e7b3f19a4c26"
+down_revision = "c4e1a7d2b9f0"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "folders",
+        sa.Column("total_size", sa.Integer(), server_default="0", nullable=False),
+    )
+    op.add_column(
+        "folders",
+        sa.Column("file_count", sa.Integer(), server_default="0", nullable=False),
+    )
+    prefix = (
+        "CASE WHEN folders.full_path = '/' THEN '/' ELSE folders.full_path || '/' END"
+    )
+    subtree_files = (
+        "FROM files JOIN folders AS file_folders ON files.folder_id = file_folders.id "
+        "WHERE file_folders.owner_id = folders.owner_id "
+        f"AND substr(files.full_path, 1, length({prefix})) = {prefix}"
+    )
+    op.execute(
+        "UPDATE folders SET "
+        f"total_size = (SELECT COALESCE(SUM(files.size), 0) {subtree_files}), "
+        f"file_count = (SELECT COUNT(files.id) {subtree_files})"
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("folders", "file_count")
+    op.drop_column("folders", "total_size")
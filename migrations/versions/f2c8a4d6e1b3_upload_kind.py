@@ -0,0 +1,26 @@
+"""Upload reservation kind
+
+Revision ID: f2c8a4d6e1b3
+Revises: b8d2e4f61a37
+Create Date: 2026-10-19 21:14:05.602917
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "f2c8a4d6e1b3"
+down_revision = "b8d2e4f61a37"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "uploads",
+        sa.Column("kind", sa.String(), nullable=False, server_default="upload"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("uploads", "kind")
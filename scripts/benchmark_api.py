@@ -0,0 +1,363 @@
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from base64 import b64encode
+from pathlib import Path
+from typing import Awaitable, Callable
+from uuid import uuid4
+
+import httpx
+from aiohttp import web
+from KEK.hybrid import PrivateKEK
+from sqlalchemy import insert, text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+from api.app import app
+from api.db import crud
+from api.db import engine as db
+from api.db import models
+from api.dependencies import get_db
+from api.schemas.storage_api import (
+    StorageFile,
+    StorageFilesResponse,
+    StorageSpaceResponse,
+)
+
+STORAGE_ID = "benchmark"
+STORAGE_TOKEN = "benchmark"
+OPERATIONS = ("upload", "download", "list", "size", "rename", "move", "rmdir")
+
+Operation = Callable[[httpx.AsyncClient, "User", int], Awaitable[httpx.Response]]
+
+
+class FakeStorageNode:
+    def __init__(self, default_size: int) -> None:
+        self._blobs: dict[str, bytes] = {}
+        self._default_blob = b"\0" * default_size
+        self._runner: web.AppRunner | None = None
+        self.url = ""
+
+    @property
+    def used(self) -> int:
+        return sum(len(blob) for blob in self._blobs.values())
+
+    async def start(self):
+        application = web.Application(client_max_size=1024**3)
+        application.router.add_get("/space", self.space)
+        application.router.add_get("/files", self.list_files)
+        application.router.add_post("/file/{id}", self.upload)
+        application.router.add_get("/file/{id}", self.download)
+        application.router.add_delete("/file/{id}", self.delete)
+        self._runner = web.AppRunner(application, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        host, port = self._runner.addresses[0][:2]
+        self.url = f"http://{host}:{port}"
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    def space_response(self) -> web.Response:
+        return web.json_response(
+            StorageSpaceResponse(used=self.used, capacity=1024**4).model_dump()
+        )
+
+    async def space(self, request: web.Request) -> web.Response:
+        return self.space_response()
+
+    async def list_files(self, request: web.Request) -> web.Response:
+        return web.json_response(
+            StorageFilesResponse(
+                files=[
+                    StorageFile(id=blob_id, size=len(blob))
+                    for blob_id, blob in self._blobs.items()
+                ]
+            ).model_dump()
+        )
+
+    async def upload(self, request: web.Request) -> web.Response:
+        self._blobs[request.match_info["id"]] = await request.read()
+        return self.space_response()
+
+    async def download(self, request: web.Request) -> web.StreamResponse:
+        blob = self._blobs.get(request.match_info["id"], self._default_blob)
+        return web.Response(body=blob)
+
+    async def delete(self, request: web.Request) -> web.Response:
+        self._blobs.pop(request.match_info["id"], None)
+        return self.space_response()
+
+
+class User:
+    def __init__(self, file_size: int) -> None:
+        self.payload = b"\0" * file_size
+        self.key = PrivateKEK.generate()
+        self.key_id = self.key.key_id.hex()
+        self.folders: list[str] = []
+        self.files: list[str] = []
+        self.headers: dict[str, str] = {"key-id": self.key_id}
+
+    async def authenticate(self, http: httpx.AsyncClient):
+        response = await http.get("/storage", headers=self.headers)
+        token = response.json()["token"]
+        signed_token = b64encode(self.key.sign(token.encode("utf-8"))).decode()
+        self.headers = self.headers | {"Signed-Token": signed_token}
+
+
+async def seed(
+    engine: AsyncEngine,
+    storage_url: str,
+    users: list[User],
+    fanout: int,
+    depth: int,
+    files_per_folder: int,
+    file_size: int,
+    repeat: int,
+):
+    async with engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.drop_all)
+        await conn.run_sync(models.Base.metadata.create_all)
+        await conn.execute(
+            insert(models.StorageRecord),
+            [
+                {
+                    "id": STORAGE_ID,
+                    "url": storage_url,
+                    "token": STORAGE_TOKEN,
+                    "capacity": 1024**4,
+                    "priority": 1,
+                }
+            ],
+        )
+        await conn.execute(
+            insert(models.KeyRecord),
+            [
+                {
+                    "id": user.key_id,
+                    "public_key": user.key.public_key.serialize().decode("utf-8"),
+                    "storage_size_limit": 1024**4,
+                    "is_activated": True,
+                }
+                for user in users
+            ],
+        )
+        for user in users:
+            folders: list[dict] = []
+            files: list[dict] = []
+
+            def add_folder(parent: dict | None, name: str) -> dict:
+                full_path = "/" if parent is None else f"{parent['full_path']}/{name}"
+                folder = {
+                    "id": str(uuid4()),
+                    "owner_id": user.key_id,
+                    "parent_id": parent and parent["id"],
+                    "name": name,
+                    "full_path": full_path.replace("//", "/"),
+                }
+                folders.append(folder)
+                return folder
+
+            def add_files(folder: dict, count: int):
+                for i in range(count):
+                    full_path = f"{folder['full_path']}/file{i:03d}".replace("//", "/")
+                    files.append(
+                        {
+                            "id": str(uuid4()),
+                            "folder_id": folder["id"],
+                            "storage_id": STORAGE_ID,
+                            "filename": f"file{i:03d}",
+                            "full_path": full_path,
+                            "size": file_size,
+                        }
+                    )
+
+            def add_tree(parent: dict, level: int):
+                for i in range(fanout):
+                    folder = add_folder(parent, f"dir{level}{i:02d}")
+                    user.folders.append(folder["full_path"])
+                    add_files(folder, files_per_folder)
+                    if level < depth:
+                        add_tree(folder, level + 1)
+
+            root = add_folder(None, "/")
+            add_tree(root, 1)
+            user.files = [file["full_path"] for file in files]
+            add_folder(root, "uploads")
+            scratch = add_folder(root, "scratch")
+            add_folder(scratch, "moved")
+            for operation in ("rename", "move", "rmdir"):
+                for i in range(repeat):
+                    folder = add_folder(scratch, f"{operation}{i}")
+                    add_files(folder, files_per_folder)
+            await conn.execute(insert(models.FolderRecord), folders)
+            await conn.execute(insert(models.FileRecord), files)
+    async with AsyncSession(engine) as session, session.begin():
+        for user in users:
+            await crud.recalculate_folder_totals(session, user.key_id)
+    async with engine.begin() as conn:
+        await conn.execute(text("ANALYZE"))
+
+
+def pick(items: list[str], i: int) -> str:
+    return items[i * 7919 % len(items)]
+
+
+async def upload(http: httpx.AsyncClient, user: User, i: int) -> httpx.Response:
+    return await http.post(
+        "/files/upload",
+        headers=user.headers
+        | {"path": f"/uploads/file{i}", "file-size": str(len(user.payload))},
+        content=user.payload,
+    )
+
+
+async def download(http: httpx.AsyncClient, user: User, i: int) -> httpx.Response:
+    return await http.get(
+        "/files/download", headers=user.headers | {"path": pick(user.files, i)}
+    )
+
+
+async def list_folder(http: httpx.AsyncClient, user: User, i: int) -> httpx.Response:
+    return await http.get(
+        "/folders/list", headers=user.headers | {"path": pick(user.folders, i)}
+    )
+
+
+async def folder_size(http: httpx.AsyncClient, user: User, i: int) -> httpx.Response:
+    return await http.get(
+        "/folders/size", headers=user.headers | {"path": pick(user.folders, i)}
+    )
+
+
+async def rename(http: httpx.AsyncClient, user: User, i: int) -> httpx.Response:
+    return await http.post(
+        "/folders/rename",
+        headers=user.headers,
+        json={"path": f"/scratch/rename{i}", "new_name": f"renamed{i}"},
+    )
+
+
+async def move(http: httpx.AsyncClient, user: User, i: int) -> httpx.Response:
+    return await http.post(
+        "/folders/move",
+        headers=user.headers,
+        json={"path": f"/scratch/move{i}", "destination": "/scratch/moved"},
+    )
+
+
+async def rmdir(http: httpx.AsyncClient, user: User, i: int) -> httpx.Response:
+    return await http.delete(
+        "/folders/rmdir", headers=user.headers | {"path": f"/scratch/rmdir{i}"}
+    )
+
+
+HANDLERS: dict[str, Operation] = {
+    "upload": upload,
+    "download": download,
+    "list": list_folder,
+    "size": folder_size,
+    "rename": rename,
+    "move": move,
+    "rmdir": rmdir,
+}
+
+
+async def run(
+    http: httpx.AsyncClient,
+    users: list[User],
+    operation: str,
+    repeat: int,
+    concurrency: int,
+):
+    handler = HANDLERS[operation]
+    semaphore = asyncio.Semaphore(concurrency)
+    timings: list[float] = []
+    errors = 0
+
+    async def request(user: User, i: int):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            response = await handler(http, user, i)
+            timings.append((time.perf_counter() - started) * 1000)
+            if response.is_error:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(request(user, i) for user in users for i in range(repeat)))
+    elapsed = time.perf_counter() - started
+    timings.sort()
+    print(
+        f"{operation:>8} {len(timings):>6} requests {errors:>5} errors  "
+        f"{len(timings) / elapsed:8.1f} req/s  "
+        f"p50 {statistics.median(timings):8.2f} ms  "
+        f"p99 {timings[max(int(len(timings) * 0.99) - 1, 0)]:8.2f} ms"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark API endpoints against an in-process storage node"
+    )
+    parser.add_argument("--database-url")
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--fanout", type=int, default=3)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--files-per-folder", type=int, default=10)
+    parser.add_argument("--file-size", type=int, default=64 * 1024)
+    parser.add_argument("--repeat", type=int, default=25)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument(
+        "--operations", nargs="+", choices=OPERATIONS, default=list(OPERATIONS)
+    )
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        database_url = args.database_url or (
+            f"sqlite+aiosqlite:///{Path(directory) / 'api.sqlite3'}"
+        )
+        db.engine = db.create_engine(database_url)
+        app.dependency_overrides[get_db] = db.create_get_db_dependency(
+            async_sessionmaker(db.engine, expire_on_commit=False),
+            async_sessionmaker(
+                db.create_read_engine(db.engine), expire_on_commit=False
+            ),
+        )
+        storage_node = FakeStorageNode(args.file_size)
+        await storage_node.start()
+        users = [User(args.file_size) for _ in range(args.users)]
+        started = time.perf_counter()
+        await seed(
+            db.engine,
+            storage_node.url,
+            users,
+            args.fanout,
+            args.depth,
+            args.files_per_folder,
+            args.file_size,
+            args.repeat,
+        )
+        print(
+            f"Seeded {args.users} users with "
+            f"{len(users[0].folders)} folders and {len(users[0].files)} files each "
+            f"in {time.perf_counter() - started:.1f} s"
+        )
+        transport = httpx.ASGITransport(
+            app=app, raise_app_exceptions=False  # type: ignore[arg-type]
+        )
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://api", timeout=None
+        ) as http:
+            for user in users:
+                await user.authenticate(http)
+            for operation in args.operations:
+                await run(http, users, operation, args.repeat, args.concurrency)
+        await storage_node.stop()
+        await db.engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,100 @@
+import argparse
+import timeit
+from datetime import datetime
+from typing import Callable
+
+import pydantic
+
+from api.schemas.admin import ImportEntry
+from api.schemas.base import MoveItemRequest
+from api.schemas.folders import FolderContent
+from api.schemas.storage_api import (
+    StorageRequestHeaders,
+    StorageSpaceResponse,
+    UploadRequestHeaders,
+    storage_headers,
+    upload_headers,
+)
+
+TOKEN = "benchmark"
+IMPORT_LINE = (
+    b'{"path": "/dir/file", "size": 5, "storage_id": "storage", "blob_id": "blob"}'
+)
+
+
+def measure(label: str, function: Callable[[], object], number: int):
+    seconds = min(timeit.repeat(function, number=number, repeat=5))
+    print(f"{label:<32} {seconds / number * 1e6:10.2f} us")
+
+
+def run(number: int, files: int):
+    now = datetime.utcnow()
+    content = {
+        "files": [
+            {"name": f"file{i}", "size": i, "last_modified": now} for i in range(files)
+        ],
+        "folders": [f"folder{i}" for i in range(files // 10)],
+    }
+    folder_content = FolderContent.model_validate(content)
+    cases: list[tuple[str, Callable[[], object], int]] = [
+        (
+            "storage headers (model)",
+            lambda: StorageRequestHeaders(authorization=TOKEN).model_dump(
+                by_alias=True
+            ),
+            number,
+        ),
+        ("storage headers (cached)", lambda: storage_headers(TOKEN), number),
+        (
+            "upload headers (model)",
+            lambda: UploadRequestHeaders(
+                authorization=TOKEN, file_size="1024"
+            ).model_dump(by_alias=True),
+            number,
+        ),
+        ("upload headers (cached)", lambda: upload_headers(TOKEN, 1024), number),
+        (
+            "storage space response",
+            lambda: StorageSpaceResponse.model_validate({"capacity": 10, "used": 5}),
+            number,
+        ),
+        (
+            "move request",
+            lambda: MoveItemRequest.model_validate(
+                {"path": "/a/b", "destination": "/c"}
+            ),
+            number,
+        ),
+        (
+            "import manifest line",
+            lambda: ImportEntry.model_validate_json(IMPORT_LINE),
+            number,
+        ),
+        (
+            f"folder content ({files}) validate",
+            lambda: FolderContent.model_validate(content),
+            number // 100,
+        ),
+        (
+            f"folder content ({files}) json",
+            folder_content.model_dump_json,
+            number // 100,
+        ),
+    ]
+    print(f"pydantic {pydantic.VERSION}")
+    for label, function, count in cases:
+        measure(label, function, max(count, 1))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark schema validation and serialization per request"
+    )
+    parser.add_argument("--number", type=int, default=20000)
+    parser.add_argument("--files", type=int, default=100)
+    args = parser.parse_args()
+    run(args.number, args.files)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from uuid import uuid4
+
+from sqlalchemy import insert, text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from api.db import crud, models
+from api.db.engine import create_engine
+from api.schemas.search import SearchMode
+
+KEY_ID = "benchmark"
+QUERIES: list[tuple[SearchMode, str]] = [
+    ("prefix", "/dir0500/"),
+    ("substring", "file0420"),
+    ("glob", "/dir0042/*.txt"),
+    ("glob", "*/file09??.txt"),
+]
+
+
+async def seed(engine: AsyncEngine, folder_count: int, files_per_folder: int):
+    async with engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.drop_all)
+        await conn.run_sync(models.Base.metadata.create_all)
+        await conn.execute(
+            insert(models.KeyRecord), [{"id": KEY_ID, "public_key": KEY_ID}]
+        )
+        await conn.execute(
+            insert(models.StorageRecord),
+            [{"id": "storage", "url": "", "token": "", "capacity": 0}],
+        )
+        root_id = str(uuid4())
+        await conn.execute(
+            insert(models.FolderRecord),
+            [{"id": root_id, "owner_id": KEY_ID, "name": "/", "full_path": "/"}],
+        )
+        for i in range(folder_count):
+            folder_id = str(uuid4())
+            await conn.execute(
+                insert(models.FolderRecord),
+                [
+                    {
+                        "id": folder_id,
+                        "owner_id": KEY_ID,
+                        "parent_id": root_id,
+                        "name": f"dir{i:04d}",
+                        "full_path": f"/dir{i:04d}",
+                    }
+                ],
+            )
+            await conn.execute(
+                insert(models.FileRecord),
+                [
+                    {
+                        "id": str(uuid4()),
+                        "folder_id": folder_id,
+                        "storage_id": "storage",
+                        "filename": f"file{j:04d}.txt",
+                        "full_path": f"/dir{i:04d}/file{j:04d}.txt",
+                        "size": j,
+                    }
+                    for j in range(files_per_folder)
+                ],
+            )
+    async with engine.begin() as conn:
+        await conn.execute(text("ANALYZE"))
+
+
+async def run(engine: AsyncEngine, repeat: int, limit: int):
+    async with AsyncSession(engine) as session:
+        key_record = await session.get(models.KeyRecord, KEY_ID)
+        assert key_record
+        for mode, query in QUERIES:
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                items = crud.search_items(session, key_record, query, mode, None, limit)
+                count = len([item async for item in items])
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            print(
+                f"{mode:>9} {query!r:<20} {count:>5} results  "
+                f"p50 {statistics.median(timings):8.2f} ms  "
+                f"p99 {timings[int(len(timings) * 0.99) - 1]:8.2f} ms"
+            )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark /search queries")
+    parser.add_argument("--database-url")
+    parser.add_argument("--folders", type=int, default=1000)
+    parser.add_argument("--files-per-folder", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--skip-seed", action="store_true")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        database_url = args.database_url or (
+            f"sqlite+aiosqlite:///{Path(directory) / 'search.sqlite3'}"
+        )
+        engine = create_engine(database_url)
+        if not args.skip_seed:
+            started = time.perf_counter()
+            await seed(engine, args.folders, args.files_per_folder)
+            print(
+                f"Seeded {args.folders * args.files_per_folder} paths "
+                f"in {time.perf_counter() - started:.1f} s"
+            )
+        await run(engine, args.repeat, args.limit)
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
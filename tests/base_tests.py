@@ -1,13 +1,17 @@
 import unittest
 from base64 import b64encode
-from typing import AsyncGenerator, Literal, Type
+from contextlib import contextmanager
+from typing import AsyncGenerator, Iterator, Literal, Type
 
 from fastapi import status
 from fastapi.testclient import TestClient
 from httpx import Response
+from sqlalchemy import event
 
 from api.app import app
+from api.db import engine as db
 from api.db import models
+from api.utils.caching import folder_cache, path_cache
 from tests.setup_test_env import (
     KEY,
     KEY_ID,
@@ -25,6 +29,8 @@ class TestWithDatabase(unittest.IsolatedAsyncioTestCase):
         self.settings = setup_config()
         self.session = await setup_database()
         await setup_data(self.session, self.settings)
+        folder_cache.clear()
+        path_cache.clear()
 
     async def asyncTearDown(self):
         await teardown_database(self.session)
@@ -53,6 +59,17 @@ class TestWithClient(TestWithDatabase):
         headers = headers | {"Signed-Token": signed_token}
         return self.request(method, *args, headers=headers, **kwargs)
 
+    def authorized_headers(
+        self, method: RequestMethod, url: str, headers: dict | None = None
+    ) -> dict:
+        if headers is None:
+            headers = {}
+        headers = headers | {"key-id": KEY_ID}
+        response = self.request(method, url, headers=headers)
+        token = response.json()["token"]
+        signed_token = b64encode(KEY.sign(token.encode("utf-8")))
+        return headers | {"Signed-Token": signed_token.decode()}
+
     def request(self, method: RequestMethod, *args, **kwargs) -> Response:
         match method.casefold():
             case "get":
@@ -65,6 +82,22 @@ class TestWithClient(TestWithDatabase):
                 raise ValueError("Method not recognized")
 
 
+@contextmanager
+def count_statements() -> Iterator[list[str]]:
+    statements: list[str] = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(
+            db.engine.sync_engine, "before_cursor_execute", before_cursor_execute
+        )
+
+
 class TestWithStreamIteratorMixin:
     stream_content = "Content"
 
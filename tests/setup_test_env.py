@@ -1,8 +1,10 @@
 from KEK.hybrid import PrivateKEK
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
 from api import config
 from api.app import app
+from api.db import crud
 from api.db import engine as db
 from api.db import models
 from api.dependencies import get_db
@@ -20,11 +22,12 @@ def setup_config() -> config.Settings:
 
 
 async def setup_database() -> AsyncSession:
-    db.engine = create_async_engine(test_settings.DATABASE_URL)
+    db.engine = db.create_engine(test_settings.DATABASE_URL)
     async with db.engine.begin() as conn:
         await conn.run_sync(models.Base.metadata.create_all)
     app.dependency_overrides[get_db] = db.create_get_db_dependency(
-        async_sessionmaker(db.engine, expire_on_commit=False)
+        async_sessionmaker(db.engine, expire_on_commit=False),
+        async_sessionmaker(db.create_read_engine(db.engine), expire_on_commit=False),
     )
     session = AsyncSession(db.engine)
     return session
@@ -34,6 +37,7 @@ async def teardown_database(session: AsyncSession):
     await session.close()
     async with db.engine.begin() as conn:
         await conn.run_sync(models.Base.metadata.drop_all)
+    await db.engine.dispose()
 
 
 async def setup_data(session: AsyncSession, settings: config.Settings):
@@ -93,4 +97,52 @@ async def setup_data(session: AsyncSession, settings: config.Settings):
             folder_record.child_folders.append(child_folder)
         root_folder.child_folders.append(folder_record)
     session.add_all((key_record, root_folder, storage_record))
+    await session.flush()
+    await crud.recalculate_folder_totals(session, KEY_ID)
+    await session.commit()
+
+
+async def scale_data(session: AsyncSession, folder_count: int, file_count: int):
+    key_record = await session.get(models.KeyRecord, KEY_ID)
+    assert key_record
+    key_record.storage_size_limit += 3 * (folder_count + 1) * file_count * FILE_SIZE
+    storage_record = await session.get(models.StorageRecord, "storage_id")
+    assert storage_record
+    for parent_path in ("/a1", "/a1/b1", "/a2"):
+        parent_folder = (
+            await session.scalars(
+                select(models.FolderRecord).where(
+                    models.FolderRecord.owner_id == KEY_ID,
+                    models.FolderRecord.full_path == parent_path,
+                )
+            )
+        ).one()
+        for i in range(folder_count):
+            folder_record = models.FolderRecord(
+                owner=key_record,
+                parent_folder=parent_folder,
+                name=f"scaled{i}",
+                full_path=f"{parent_path}/scaled{i}",
+            )
+            for j in range(file_count):
+                models.FileRecord(
+                    folder=folder_record,
+                    storage=storage_record,
+                    filename=f"file{j}",
+                    full_path=f"{folder_record.full_path}/file{j}",
+                    size=FILE_SIZE,
+                )
+            session.add(folder_record)
+        for j in range(file_count):
+            session.add(
+                models.FileRecord(
+                    folder=parent_folder,
+                    storage=storage_record,
+                    filename=f"scaled{j}",
+                    full_path=f"{parent_path}/scaled{j}",
+                    size=FILE_SIZE,
+                )
+            )
+    await session.flush()
+    await crud.recalculate_folder_totals(session, KEY_ID)
     await session.commit()
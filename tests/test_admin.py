@@ -0,0 +1,163 @@
+import json
+from unittest.mock import patch
+
+from fastapi import status
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.app import app
+from api.db import models
+from tests.base_tests import TestWithClient
+from tests.setup_test_env import KEY_ID
+
+ADMIN_TOKEN = "admin_token"
+
+
+class TestBulkImport(TestWithClient):
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.settings.ADMIN_TOKEN = ADMIN_TOKEN
+        self.addCleanup(setattr, self.settings, "ADMIN_TOKEN", None)
+
+    def import_manifest(self, entries: list[dict], token: str = ADMIN_TOKEN):
+        return self.client.post(
+            f"/admin/keys/{KEY_ID}/import",
+            content="\n".join(json.dumps(entry) for entry in entries),
+            headers={"Authorization": f"Bearer {token}"},
+        )
+
+    async def test_import(self):
+        self.settings.BULK_IMPORT_BATCH_SIZE = 2
+        self.addCleanup(setattr, self.settings, "BULK_IMPORT_BATCH_SIZE", 1000)
+        entries = [
+            {"path": path, "size": 5, "storage_id": "storage_id", "blob_id": blob_id}
+            for path, blob_id in (
+                ("/a1/new", "blob1"),
+                ("/x/y/z", "blob2"),
+                ("/x/y/w", "blob3"),
+                ("/a1/f1", "blob4"),
+                ("/a1/b1", "blob5"),
+            )
+        ]
+        response = self.import_manifest(entries)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        result = response.json()
+        self.assertEqual(result["files"], 3)
+        self.assertEqual(result["folders"], 2)
+        self.assertEqual(result["skipped"], 2)
+        file_record = await self.session.get(models.FileRecord, "blob3")
+        self.assertEqual(file_record.full_path, "/x/y/w")
+        parent_folder = await file_record.awaitable_attrs.folder
+        self.assertEqual(parent_folder.full_path, "/x/y")
+        self.assertEqual(
+            (await parent_folder.awaitable_attrs.parent_folder).full_path, "/x"
+        )
+        change_count = await self.session.scalar(
+            select(func.count()).select_from(models.ChangeRecord)
+        )
+        self.assertEqual(change_count, 5)
+
+    def test_import_final_commit_failure(self):
+        commit = AsyncSession.commit
+        commits = 0
+
+        async def fail_final_commit(session: AsyncSession):
+            nonlocal commits
+            commits += 1
+            if commits == 2:
+                raise OperationalError("COMMIT", {}, Exception("database is locked"))
+            await commit(session)
+
+        self.client = TestClient(app, raise_server_exceptions=False)
+        with patch.object(AsyncSession, "commit", fail_final_commit):
+            response = self.import_manifest(
+                [
+                    {
+                        "path": "/a1/new",
+                        "size": 5,
+                        "storage_id": "storage_id",
+                        "blob_id": "blob",
+                    }
+                ]
+            )
+        self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    def test_import_unknown_storage(self):
+        response = self.import_manifest(
+            [{"path": "/new", "size": 5, "storage_id": "unknown", "blob_id": "blob"}]
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_import_invalid_line(self):
+        response = self.import_manifest([{"path": "/new", "size": 5}])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()["detail"], "Invalid manifest line 1")
+
+    async def test_import_duplicate_blob_id(self):
+        self.settings.BULK_IMPORT_BATCH_SIZE = 2
+        self.addCleanup(setattr, self.settings, "BULK_IMPORT_BATCH_SIZE", 1000)
+        existing_id = await self.session.scalar(
+            select(models.FileRecord.id).where(models.FileRecord.full_path == "/a1/f1")
+        )
+        for duplicates, line_number in (
+            (("blob1", "blob3"), 3),
+            (("blob3", "blob3"), 4),
+            ((existing_id, "blob4"), 3),
+        ):
+            entries = [
+                {
+                    "path": path,
+                    "size": 5,
+                    "storage_id": "storage_id",
+                    "blob_id": blob_id,
+                }
+                for path, blob_id in (
+                    ("/new/one", "blob1"),
+                    ("/new/two", "blob2"),
+                    (f"/new/three{line_number}", duplicates[0]),
+                    (f"/new/four{line_number}", duplicates[1]),
+                )
+            ]
+            response = self.import_manifest(entries)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(
+                response.json()["detail"],
+                f"Duplicate blob id on manifest line {line_number}",
+            )
+        # The first batch was committed before the bad line was read, and the
+        # import can be run again without it.
+        paths = await self.session.scalars(
+            select(models.FileRecord.full_path).where(
+                models.FileRecord.full_path.startswith("/new/")
+            )
+        )
+        self.assertEqual(set(paths), {"/new/one", "/new/two"})
+        entries[2]["blob_id"] = "blob5"
+        response = self.import_manifest(entries)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["skipped"], 2)
+        self.assertEqual(response.json()["files"], 2)
+
+    def test_import_requires_admin_token(self):
+        response = self.import_manifest([], token="wrong")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.settings.ADMIN_TOKEN = None
+        response = self.import_manifest([])
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_rebalance_progress(self):
+        response = self.client.get(
+            "/admin/storages/rebalance",
+            headers={"Authorization": f"Bearer {ADMIN_TOKEN}"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(response.json()["status"], ("idle", "finished"))
+
+    def test_drain_unknown_storage(self):
+        response = self.client.post(
+            "/admin/storages/unknown/drain",
+            headers={"Authorization": f"Bearer {ADMIN_TOKEN}"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,226 @@
+import json
+import unittest
+from datetime import datetime
+
+from fastapi import status
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from api.db import crud
+from api.db import engine as db
+from api.db import models
+from api.schemas.changes import Change
+from api.utils.caching import (
+    FolderCache,
+    FolderCacheStore,
+    PathCache,
+    folder_cache,
+    path_cache,
+)
+from api.utils.notifications import ChangeHub, JournalPoller
+from tests.base_tests import TestWithClient, count_statements
+from tests.setup_test_env import KEY_ID
+
+
+def change(action: str, type: str, path: str, new_path: str | None = None) -> Change:
+    return Change(
+        id=1,
+        action=action,
+        type=type,
+        path=path,
+        new_path=new_path,
+        created_at=datetime.utcnow(),
+    )
+
+
+class TestFolderCacheStore(unittest.TestCase):
+    def test_discard_subtree(self):
+        store = FolderCacheStore("listing", 100)
+        for path in ("/", "/a1", "/a1/b1", "/a1/b1/c1", "/a10", "/a1b", "/b1"):
+            store.put("owner", path, b"[]")
+        store.put("other", "/a1/b1", b"[]")
+        store.discard_subtree("owner", "/a1")
+        for path in ("/a1", "/a1/b1", "/a1/b1/c1"):
+            self.assertIsNone(store.get("owner", path))
+        for path in ("/", "/a10", "/a1b", "/b1"):
+            self.assertIsNotNone(store.get("owner", path))
+        self.assertIsNotNone(store.get("other", "/a1/b1"))
+        store.discard_subtree("owner", "/")
+        self.assertEqual(len(store), 1)
+
+    def test_discard_subtree_after_eviction(self):
+        store = FolderCacheStore("listing", 3)
+        for i in range(20):
+            store.put("owner", f"/a{i}/b", b"[]")
+            store.put("owner", f"/a{i}", b"[]")
+        self.assertEqual(len(store), 3)
+        store.discard_subtree("owner", "/a19")
+        self.assertEqual(len(store), 1)
+        self.assertIsNotNone(store.get("owner", "/a18"))
+
+
+class TestFolderCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = FolderCache(100, 60)
+
+    def test_invalidate_file_change(self):
+        for path in ("/", "/a1", "/a1/b1"):
+            self.cache.listings.put("owner", path, b"[]")
+        self.cache.invalidate("owner", change("create", "file", "/a1/b1/f1"))
+        self.assertIsNotNone(self.cache.listings.get("owner", "/"))
+        self.assertIsNotNone(self.cache.listings.get("owner", "/a1"))
+        self.assertIsNone(self.cache.listings.get("owner", "/a1/b1"))
+
+    def test_invalidate_folder_move(self):
+        for path in ("/", "/a1", "/a1/b1", "/a10", "/a2"):
+            self.cache.listings.put("owner", path, b"[]")
+        self.cache.invalidate("owner", change("move", "folder", "/a1", "/a2/a1"))
+        for path in ("/", "/a1", "/a1/b1", "/a2"):
+            self.assertIsNone(self.cache.listings.get("owner", path))
+        self.assertIsNotNone(self.cache.listings.get("owner", "/a10"))
+
+    def test_invalidate_folder_create(self):
+        for path in ("/", "/a1", "/a2"):
+            self.cache.listings.put("owner", path, b"[]")
+        self.cache.invalidate("owner", change("create", "folder", "/a1/b1"))
+        self.assertIsNone(self.cache.listings.get("owner", "/a1"))
+        self.assertIsNotNone(self.cache.listings.get("owner", "/"))
+        self.assertIsNotNone(self.cache.listings.get("owner", "/a2"))
+
+    def test_invalidate_other_owner(self):
+        self.cache.listings.put("other", "/", b"[]")
+        self.cache.invalidate("owner", change("create", "folder", "/a1"))
+        self.assertIsNotNone(self.cache.listings.get("other", "/"))
+
+    def test_store_after_invalidation(self):
+        generation = self.cache.generation("owner")
+        self.cache.invalidate("owner", change("create", "folder", "/a1"))
+        self.cache.store(self.cache.listings, "owner", "/", generation, b"[]")
+        self.assertIsNone(self.cache.listings.get("owner", "/"))
+        generation = self.cache.generation("owner")
+        self.cache.store(self.cache.listings, "owner", "/", generation, b"[]")
+        self.assertEqual(self.cache.listings.get("owner", "/"), b"[]")
+
+
+class TestPathCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = PathCache(100)
+
+    def test_kind_mismatch(self):
+        self.cache.put("owner", "/a1", "folder", "id")
+        self.assertEqual(self.cache.get("owner", "/a1", "folder"), "id")
+        self.assertIsNone(self.cache.get("owner", "/a1", "file"))
+
+    def test_invalidate_folder_rename(self):
+        self.cache.put("owner", "/a1", "folder", "a1")
+        self.cache.put("owner", "/a1/f1", "file", "f1")
+        self.cache.put("owner", "/a10", "folder", "a10")
+        self.cache.invalidate("owner", change("rename", "folder", "/a1", "/b1"))
+        self.assertIsNone(self.cache.get("owner", "/a1", "folder"))
+        self.assertIsNone(self.cache.get("owner", "/a1/f1", "file"))
+        self.assertEqual(self.cache.get("owner", "/a10", "folder"), "a10")
+
+    def test_disabled(self):
+        cache = PathCache(0)
+        cache.put("owner", "/a1", "folder", "id")
+        self.assertIsNone(cache.get("owner", "/a1", "folder"))
+
+
+class TestFolderCacheEndpoints(TestWithClient):
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.settings.CHANGE_EVENTS_BACKEND = "database"
+        self.addCleanup(setattr, self.settings, "CHANGE_EVENTS_BACKEND", "memory")
+
+    def list_folder(self, path: str):
+        return self.authorized_request("get", "/folders/list", headers={"path": path})
+
+    def test_listing_cached(self):
+        response = self.list_folder("/a1")
+        headers = self.authorized_headers("get", "/folders/list", {"path": "/a1"})
+        with count_statements() as statements:
+            cached_response = self.client.get("/folders/list", headers=headers)
+        self.assertEqual(cached_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(cached_response.json(), response.json())
+        self.assertLess(len(statements), 3)
+        body = self.client.get("/metrics").text
+        self.assertIn('folder_cache_requests_total{cache="listing",result="hit"}', body)
+
+    def test_listing_invalidated_by_mkdir(self):
+        self.assertNotIn("new", self.list_folder("/a1").json()["folders"])
+        self.authorized_request("post", "/folders/mkdir", json={"path": "/a1/new"})
+        self.assertIn("new", self.list_folder("/a1").json()["folders"])
+
+    def test_listing_invalidated_by_rename(self):
+        self.list_folder("/a1/b1")
+        self.authorized_request(
+            "post", "/folders/rename", json={"path": "/a1", "new_name": "renamed"}
+        )
+        response = self.list_folder("/a1/b1")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertIn("renamed", self.list_folder("/").json()["folders"])
+
+    async def test_listing_invalidated_by_other_worker(self):
+        poller = JournalPoller(ChangeHub(1), async_sessionmaker(db.engine))
+        await poller.poll()
+        self.assertNotIn("new", self.list_folder("/a1").json()["folders"])
+        a1 = await crud.find_folder(self.session, owner_id=KEY_ID, full_path="/a1")
+        assert a1
+        # Core inserts stand in for another worker: the ORM listeners of this
+        # one never see them.
+        await self.session.execute(
+            insert(models.FolderRecord).values(
+                id=models.generate_id(),
+                owner_id=KEY_ID,
+                parent_id=a1.id,
+                name="new",
+                full_path="/a1/new",
+            )
+        )
+        await self.session.execute(
+            insert(models.ChangeRecord).values(
+                owner_id=KEY_ID, action="create", item_type="folder", path="/a1/new"
+            )
+        )
+        await self.session.commit()
+        self.assertNotIn("new", self.list_folder("/a1").json()["folders"])
+        await poller.poll()
+        self.assertIn("new", self.list_folder("/a1").json()["folders"])
+
+    def test_memory_backend_not_cached(self):
+        self.settings.CHANGE_EVENTS_BACKEND = "memory"
+        self.list_folder("/a1")
+        self.assertEqual(len(folder_cache.listings), 0)
+
+    def test_paginated_listing_not_cached(self):
+        self.authorized_request("get", "/folders/list?limit=1", headers={"path": "/a1"})
+        self.assertEqual(len(folder_cache.listings), 0)
+
+    def test_path_resolved_by_id(self):
+        self.authorized_request("get", "/folders/tree", headers={"path": "/a1"})
+        headers = self.authorized_headers("get", "/folders/tree", {"path": "/a1"})
+        with count_statements() as statements:
+            response = self.client.get("/folders/tree", headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(any("folders.full_path IN" in st for st in statements))
+
+    def test_stale_path_ignored(self):
+        self.authorized_request("get", "/folders/tree", headers={"path": "/a1"})
+        a1_id = path_cache.get(KEY_ID, "/a1", "folder")
+        assert a1_id
+        path_cache.put(KEY_ID, "/a2", "folder", a1_id)
+        response = self.authorized_request(
+            "get", "/folders/tree", headers={"path": "/a2"}
+        )
+        paths = [json.loads(line)["path"] for line in response.text.splitlines()]
+        self.assertTrue(paths)
+        self.assertTrue(all(path.startswith("/a2/") for path in paths))
+        self.assertNotEqual(path_cache.get(KEY_ID, "/a2", "folder"), a1_id)
+
+    def test_path_invalidated_by_rename(self):
+        self.list_folder("/a1/b1")
+        self.assertIsNotNone(path_cache.get(KEY_ID, "/a1/b1", "folder"))
+        self.authorized_request(
+            "post", "/folders/rename", json={"path": "/a1", "new_name": "renamed"}
+        )
+        self.assertIsNone(path_cache.get(KEY_ID, "/a1/b1", "folder"))
@@ -0,0 +1,54 @@
+from unittest.mock import AsyncMock, patch
+
+from fastapi import status
+
+from api.schemas.storage_api import StorageSpaceResponse
+from tests.base_tests import TestWithClient, add_test_authentication
+
+
+@add_test_authentication(("get", "/changes"))
+class TestChanges(TestWithClient):
+    def test_no_changes(self):
+        response = self.authorized_request("get", "/changes")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertListEqual(response.json()["changes"], [])
+        self.assertEqual(response.json()["cursor"], 0)
+
+    def test_folder_changes(self):
+        self.authorized_request("post", "/folders/mkdir", json={"path": "/folder"})
+        self.authorized_request(
+            "post", "/folders/rename", json={"path": "/folder", "new_name": "renamed"}
+        )
+        self.authorized_request(
+            "post", "/folders/move", json={"path": "/renamed", "destination": "/a1"}
+        )
+        response = self.authorized_request("get", "/changes")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertListEqual(
+            [
+                (change["action"], change["path"], change["new_path"])
+                for change in response.json()["changes"]
+            ],
+            [
+                ("create", "/folder", None),
+                ("rename", "/folder", "/renamed"),
+                ("move", "/renamed", "/a1/renamed"),
+            ],
+        )
+
+    @patch("aiohttp.ClientSession.delete")
+    def test_changes_since_cursor(self, request_mock: AsyncMock):
+        request_mock.return_value.__aenter__.return_value.status = status.HTTP_200_OK
+        request_mock.return_value.__aenter__.return_value.json = AsyncMock(
+            return_value=StorageSpaceResponse(used=0, capacity=500).model_dump()
+        )
+        self.authorized_request("post", "/folders/mkdir", json={"path": "/folder"})
+        cursor = self.authorized_request("get", "/changes").json()["cursor"]
+        self.authorized_request("delete", "/files/delete", headers={"path": "/a1/f1"})
+        response = self.authorized_request("get", f"/changes?since={cursor}")
+        changes = response.json()["changes"]
+        self.assertEqual(len(changes), 1)
+        self.assertEqual(changes[0]["action"], "delete")
+        self.assertEqual(changes[0]["type"], "file")
+        self.assertEqual(changes[0]["path"], "/a1/f1")
+        self.assertGreater(response.json()["cursor"], cursor)
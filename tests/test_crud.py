@@ -1,4 +1,7 @@
+import unittest
+
 from sqlalchemy import func, select
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import joinedload, selectinload
 
 from api.db import crud, models
@@ -6,6 +9,22 @@ from tests.base_tests import TestWithDatabase
 from tests.setup_test_env import FILE_SIZE, KEY, KEY_ID
 
 
+class TestPathRange(unittest.TestCase):
+    query = select(models.FileRecord.id).where(
+        crud.path_range(models.FileRecord.full_path, "/a1/")
+    )
+
+    def test_postgresql_pattern_operators(self):
+        compiled = str(self.query.compile(dialect=postgresql.dialect()))
+        self.assertIn("files.full_path ~>=~", compiled)
+        self.assertIn("files.full_path ~<~", compiled)
+
+    def test_sqlite_binary_comparison(self):
+        compiled = str(self.query.compile(dialect=sqlite.dialect()))
+        self.assertIn("files.full_path >= ? AND files.full_path < ?", compiled)
+        self.assertNotIn("LIKE", compiled)
+
+
 class TestCrud(TestWithDatabase):
     async def test_get_key(self):
         found_key = await self.session.get(models.KeyRecord, KEY_ID)
@@ -94,6 +113,7 @@ class TestCrud(TestWithDatabase):
         child_folder = await crud.create_child_folder(
             self.session, parent_folder, "child_folder"
         )
+        await self.session.flush()
         self.assertEqual(child_folder.owner_id, KEY_ID)
         self.assertEqual(child_folder.full_path, "/a1/child_folder")
 
@@ -103,6 +123,19 @@ class TestCrud(TestWithDatabase):
         )
         self.assertEqual((await nested_folder.awaitable_attrs.parent_folder).name, "c")
         self.assertEqual(nested_folder.owner_id, KEY_ID)
+        self.assertEqual(nested_folder.full_path, "/a2/b2/c/d")
+
+    async def test_create_folders_recursively_creates_root(self):
+        key_record = await crud.add_key(self.session, "key_id", "public_key")
+        await self.session.flush()
+        nested_folder = await crud.create_folders_recursively(
+            self.session, key_record, "/a/b"
+        )
+        parent_folder = await nested_folder.awaitable_attrs.parent_folder
+        root_folder = await parent_folder.awaitable_attrs.parent_folder
+        self.assertEqual(parent_folder.full_path, "/a")
+        self.assertEqual(root_folder.full_path, "/")
+        self.assertIsNone(root_folder.parent_id)
 
     async def test_rename_folder(self):
         parent_folder = (
@@ -158,10 +191,20 @@ class TestCrud(TestWithDatabase):
                 )
             )
         ).one()
-        folder_content = await folder_record.json()
-        self.assertListEqual(folder_content.folders, ["b1", "b2"])
+        items = [
+            (item["type"], item["name"])
+            async for item in crud.list_folder_items(self.session, folder_record)
+        ]
         self.assertListEqual(
-            [file.name for file in folder_content.files], ["f1", "f2", "f3", "f4"]
+            items,
+            [
+                ("folder", "b1"),
+                ("folder", "b2"),
+                ("file", "f1"),
+                ("file", "f2"),
+                ("file", "f3"),
+                ("file", "f4"),
+            ],
         )
 
     async def test_folder_size(self):
@@ -182,7 +225,15 @@ class TestCrud(TestWithDatabase):
             len(folder_record.files) * FILE_SIZE
             + len(folder_record.child_folders) * FILE_SIZE * 3
         )
-        self.assertEqual(await folder_record.size, expected_size)
+        tree_size = sum(
+            [
+                item["size"]
+                async for item in crud.list_folder_tree(self.session, folder_record)
+                if item["type"] == "file"
+            ]
+        )
+        self.assertEqual(tree_size, expected_size)
+        self.assertEqual(folder_record.total_size, expected_size)
 
     async def test_create_file_record(self):
         folder_record = (
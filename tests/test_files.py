@@ -5,6 +5,7 @@ from sqlalchemy import select
 from sqlalchemy.orm import joinedload
 
 from api.db import models
+from api.exceptions import client
 from api.schemas.storage_api import StorageSpaceResponse
 from tests.base_tests import (
     TestWithClient,
@@ -44,7 +45,7 @@ class TestFiles(TestWithClient, TestWithStreamIteratorMixin):
         )
         request_mock.return_value.__aenter__.return_value.status = status.HTTP_200_OK
         request_mock.return_value.__aenter__.return_value.json = AsyncMock(
-            return_value=storage_response.dict()
+            return_value=storage_response.model_dump()
         )
         file_size = 100
         response = self.authorized_request(
@@ -64,3 +65,103 @@ class TestFiles(TestWithClient, TestWithStreamIteratorMixin):
         self.assertIsNotNone(created_file_record)
         self.assertEqual(created_file_record.size, file_size)
         self.assertEqual(created_file_record.storage.used_space, storage_response.used)
+
+    @patch("aiohttp.ClientSession.delete")
+    @patch("aiohttp.ClientSession.post")
+    async def test_upload_file_storage_error(
+        self, request_mock: AsyncMock, delete_request_mock: AsyncMock
+    ):
+        request_mock.return_value.__aenter__.return_value.status = (
+            status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+        delete_request_mock.return_value.__aenter__.return_value.status = (
+            status.HTTP_404_NOT_FOUND
+        )
+        response = self.authorized_request(
+            "post",
+            "/files/upload",
+            content=iter("data"),
+            headers={"path": "/a1/b1/c1/file", "file-size": "100"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+        upload_records = (await self.session.scalars(select(models.UploadRecord))).all()
+        self.assertListEqual(list(upload_records), [])
+        file_record = (
+            await self.session.scalars(
+                select(models.FileRecord).where(
+                    models.FileRecord.full_path == "/a1/b1/c1/file"
+                )
+            )
+        ).first()
+        self.assertIsNone(file_record)
+
+    @patch("api.db.crud.create_file_record")
+    @patch("aiohttp.ClientSession.delete")
+    @patch("aiohttp.ClientSession.post")
+    async def test_upload_file_fails_after_transfer(
+        self,
+        request_mock: AsyncMock,
+        delete_request_mock: AsyncMock,
+        create_mock: AsyncMock,
+    ):
+        storage_response = StorageSpaceResponse(used=500, capacity=1000)
+        for mock in (request_mock, delete_request_mock):
+            mock.return_value.__aenter__.return_value.status = status.HTTP_200_OK
+            mock.return_value.__aenter__.return_value.json = AsyncMock(
+                return_value=storage_response.model_dump()
+            )
+        create_mock.side_effect = client.NotExists(detail="Parent folder doesn't exist")
+        response = self.authorized_request(
+            "post",
+            "/files/upload",
+            content=iter("data"),
+            headers={"path": "/a1/b1/c1/file", "file-size": "100"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        upload_records = (await self.session.scalars(select(models.UploadRecord))).all()
+        self.assertListEqual(list(upload_records), [])
+        delete_request_mock.assert_called_once()
+
+    async def test_upload_file_busy(self):
+        file_record = (
+            await self.session.scalars(
+                select(models.FileRecord).where(models.FileRecord.full_path == "/a1/f1")
+            )
+        ).one()
+        self.session.add(
+            models.UploadRecord(
+                owner=await self.key_record,
+                storage=await file_record.awaitable_attrs.storage,
+                full_path=file_record.full_path,
+                size=file_record.size,
+                file_id=file_record.id,
+            )
+        )
+        await self.session.commit()
+        response = self.authorized_request(
+            "post",
+            "/files/upload",
+            content=iter("data"),
+            headers={"path": "/a1/f1", "file-size": "4"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    async def test_upload_file_space_reserved(self):
+        self.session.add(
+            models.UploadRecord(
+                owner=await self.key_record,
+                storage=(
+                    await self.session.scalars(select(models.StorageRecord))
+                ).one(),
+                full_path="/a1/pending",
+                size=self.settings.USER_STORAGE_SIZE_LIMIT,
+            )
+        )
+        await self.session.commit()
+        response = self.authorized_request(
+            "post",
+            "/files/upload",
+            content=iter("data"),
+            headers={"path": "/a1/b1/c1/file", "file-size": "1"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
@@ -0,0 +1,107 @@
+import json
+from unittest.mock import AsyncMock, patch
+
+from fastapi import status
+from sqlalchemy import select
+
+from api.db import models
+from api.schemas.storage_api import StorageSpaceResponse
+from api.utils.path_utils import add_trailing_slash
+from tests.base_tests import TestWithClient
+from tests.setup_test_env import FILE_SIZE, KEY_ID
+
+
+class TestFolderTotals(TestWithClient):
+    async def assert_totals_consistent(self):
+        folders = (
+            await self.session.execute(
+                select(
+                    models.FolderRecord.full_path,
+                    models.FolderRecord.total_size,
+                    models.FolderRecord.file_count,
+                ).where(models.FolderRecord.owner_id == KEY_ID)
+            )
+        ).all()
+        files = (
+            await self.session.execute(
+                select(models.FileRecord.full_path, models.FileRecord.size)
+            )
+        ).all()
+        for path, total_size, file_count in folders:
+            subtree = [
+                size
+                for file_path, size in files
+                if file_path.startswith(add_trailing_slash(path))
+            ]
+            self.assertEqual((total_size, file_count), (sum(subtree), len(subtree)))
+
+    def set_storage_response(self, request_mock: AsyncMock):
+        storage_response = request_mock.return_value.__aenter__.return_value
+        storage_response.status = status.HTTP_200_OK
+        storage_response.json = AsyncMock(
+            return_value=StorageSpaceResponse(used=100, capacity=500).model_dump()
+        )
+
+    def upload(self, path: str, content: bytes):
+        response = self.authorized_request(
+            "post",
+            "/files/upload",
+            content=content,
+            headers={"path": path, "file-size": str(len(content))},
+        )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+    async def test_folder_size(self):
+        await self.assert_totals_consistent()
+        response = self.authorized_request(
+            "get", "/folders/size", headers={"path": "/a1"}
+        )
+        self.assertEqual(response.json(), 10 * FILE_SIZE)
+
+    @patch("aiohttp.ClientSession.post")
+    async def test_upload(self, request_mock: AsyncMock):
+        self.set_storage_response(request_mock)
+        self.upload("/a1/b1/c1/new", b"new file")
+        await self.assert_totals_consistent()
+        self.upload("/a1/b1/c1/new", b"overwritten file")
+        await self.assert_totals_consistent()
+
+    @patch("aiohttp.ClientSession.delete")
+    async def test_delete_file(self, request_mock: AsyncMock):
+        self.set_storage_response(request_mock)
+        response = self.authorized_request(
+            "delete", "/files/delete", headers={"path": "/a1/f1"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        await self.assert_totals_consistent()
+
+    async def test_move_folder(self):
+        response = self.authorized_request(
+            "post", "/folders/move", json={"path": "/a1/b1", "destination": "/a2/b2"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        await self.assert_totals_consistent()
+
+    @patch("aiohttp.ClientSession.delete")
+    async def test_delete_folder(self, request_mock: AsyncMock):
+        self.set_storage_response(request_mock)
+        response = self.authorized_request(
+            "delete", "/folders/rmdir", headers={"path": "/a1/b1"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        await self.assert_totals_consistent()
+
+    async def test_import(self):
+        self.settings.ADMIN_TOKEN = "admin_token"
+        self.addCleanup(setattr, self.settings, "ADMIN_TOKEN", None)
+        entries = [
+            {"path": path, "size": 5, "storage_id": "storage_id", "blob_id": blob_id}
+            for path, blob_id in (("/a1/new", "blob1"), ("/x/y/z", "blob2"))
+        ]
+        response = self.client.post(
+            f"/admin/keys/{KEY_ID}/import",
+            content="\n".join(json.dumps(entry) for entry in entries),
+            headers={"Authorization": "Bearer admin_token"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        await self.assert_totals_consistent()
@@ -1,10 +1,14 @@
+import json
+from unittest.mock import AsyncMock, patch
+
 from fastapi import status
 from sqlalchemy import select
 from sqlalchemy.orm import joinedload, selectinload
 
 from api.db import models
+from api.schemas.storage_api import StorageSpaceResponse
 from tests.base_tests import TestWithClient, add_test_authentication
-from tests.setup_test_env import KEY_ID
+from tests.setup_test_env import FILE_SIZE, KEY_ID
 
 
 @add_test_authentication(
@@ -107,6 +111,89 @@ class TestFolders(TestWithClient):
         self.assertListEqual(child_names, ["b1", "b2"])
         self.assertEqual(len(files), 4)
 
+    def test_list_folder_paginated(self):
+        response = self.authorized_request(
+            "get", "/folders/list?limit=3", headers={"path": "/a1"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertListEqual(response.json()["folders"], ["b1", "b2"])
+        self.assertListEqual(
+            [file["name"] for file in response.json()["files"]], ["f1"]
+        )
+        response = self.authorized_request(
+            "get",
+            f"/folders/list?limit=3&cursor={response.json()['next_cursor']}",
+            headers={"path": "/a1"},
+        )
+        self.assertListEqual(
+            [file["name"] for file in response.json()["files"]], ["f2", "f3", "f4"]
+        )
+        next_cursor = response.json()["next_cursor"]
+        response = self.authorized_request(
+            "get",
+            f"/folders/list?limit=3&cursor={next_cursor}",
+            headers={"path": "/a1"},
+        )
+        self.assertListEqual(response.json()["files"], [])
+        self.assertIsNone(response.json()["next_cursor"])
+
+    def test_list_folder_filtered(self):
+        response = self.authorized_request(
+            "get",
+            "/folders/list?type=file&prefix=f&order=desc",
+            headers={"path": "/a1"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertListEqual(response.json()["folders"], [])
+        self.assertListEqual(
+            [file["name"] for file in response.json()["files"]],
+            ["f4", "f3", "f2", "f1"],
+        )
+
+    def test_list_folder_ndjson(self):
+        response = self.authorized_request(
+            "get",
+            "/folders/list",
+            headers={"path": "/a1", "accept": "application/x-ndjson"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        items = [json.loads(line) for line in response.text.splitlines()]
+        self.assertListEqual(
+            [(item["name"], item["type"]) for item in items],
+            [
+                ("b1", "folder"),
+                ("b2", "folder"),
+                ("f1", "file"),
+                ("f2", "file"),
+                ("f3", "file"),
+                ("f4", "file"),
+            ],
+        )
+
+    def test_folder_tree(self):
+        response = self.authorized_request(
+            "get", "/folders/tree", headers={"path": "/a1"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        items = [json.loads(line) for line in response.text.splitlines()]
+        paths = [item["path"] for item in items]
+        self.assertListEqual(paths, sorted(paths))
+        self.assertIn("/a1/b1/c1", paths)
+        self.assertIn("/a1/b2/f3", paths)
+        self.assertNotIn("/a1", paths)
+        self.assertEqual(len(items), 4 + 2 * (1 + 3 + 1))
+
+    def test_folder_tree_depth(self):
+        response = self.authorized_request(
+            "get", "/folders/tree?depth=1", headers={"path": "/"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        items = [json.loads(line) for line in response.text.splitlines()]
+        self.assertListEqual(
+            [(item["path"], item["type"]) for item in items],
+            [("/a1", "folder"), ("/a2", "folder"), ("/a3", "folder")],
+        )
+
     def test_list_folder_not_exists(self):
         response = self.authorized_request(
             "get", "/folders/list", headers={"path": "/nonexistent_path"}
@@ -171,3 +258,94 @@ class TestFolders(TestWithClient):
             "delete", "/folders/rmdir", headers={"path": "/nonexistent_path"}
         )
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TestSiblingFolders(TestWithClient):
+    siblings = ("/a1x", "/a1-b", "/A1")
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        root_folder = (
+            await self.session.scalars(
+                select(models.FolderRecord).where(
+                    models.FolderRecord.owner_id == KEY_ID,
+                    models.FolderRecord.full_path == "/",
+                )
+            )
+        ).one()
+        storage_record = (
+            await self.session.scalars(select(models.StorageRecord))
+        ).one()
+        for path in self.siblings:
+            folder_record = models.FolderRecord(
+                owner=await self.key_record,
+                parent_folder=root_folder,
+                name=path[1:],
+                full_path=path,
+            )
+            folder_record.files.append(
+                models.FileRecord(
+                    folder=folder_record,
+                    storage=storage_record,
+                    filename="f1",
+                    full_path=f"{path}/f1",
+                    size=FILE_SIZE,
+                )
+            )
+            self.session.add(folder_record)
+        await self.session.commit()
+
+    async def assert_siblings_intact(self):
+        self.session.expire_all()
+        folder_paths = await self.session.scalars(
+            select(models.FolderRecord.full_path).where(
+                models.FolderRecord.full_path.in_(self.siblings)
+            )
+        )
+        file_paths = await self.session.scalars(
+            select(models.FileRecord.full_path).where(
+                models.FileRecord.full_path.in_(
+                    [f"{path}/f1" for path in self.siblings]
+                )
+            )
+        )
+        self.assertEqual(set(folder_paths), set(self.siblings))
+        self.assertEqual(len(list(file_paths)), len(self.siblings))
+
+    @patch("aiohttp.ClientSession.delete")
+    async def test_delete_folder(self, request_mock: AsyncMock):
+        storage_response = request_mock.return_value.__aenter__.return_value
+        storage_response.status = status.HTTP_200_OK
+        storage_response.json = AsyncMock(
+            return_value=StorageSpaceResponse(used=0, capacity=500).model_dump()
+        )
+        response = self.authorized_request(
+            "delete", "/folders/rmdir", headers={"path": "/a1"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        deleted_urls = [call.args[0] for call in request_mock.call_args_list]
+        self.assertEqual(len(deleted_urls), 10)
+        await self.assert_siblings_intact()
+
+    async def test_rename_folder(self):
+        response = self.authorized_request(
+            "post", "/folders/rename", json={"path": "/a1", "new_name": "renamed"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        await self.assert_siblings_intact()
+
+    async def test_move_folder(self):
+        response = self.authorized_request(
+            "post", "/folders/move", json={"path": "/a1", "destination": "/a2"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        await self.assert_siblings_intact()
+
+    def test_folder_tree(self):
+        response = self.authorized_request(
+            "get", "/folders/tree", headers={"path": "/a1"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        paths = [json.loads(line)["path"] for line in response.text.splitlines()]
+        self.assertTrue(paths)
+        self.assertTrue(all(path.startswith("/a1/") for path in paths), paths)
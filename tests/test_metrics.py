@@ -0,0 +1,44 @@
+import unittest
+
+from fastapi import status
+
+from api.utils.metrics import Counter, Histogram, Registry
+from tests.base_tests import TestWithClient
+
+
+class TestMetricTypes(unittest.TestCase):
+    def test_histogram(self):
+        histogram = Histogram("latency", "Latency", ("route",), buckets=(0.1, 1))
+        histogram.observe(0.05, "/a")
+        histogram.observe(0.5, "/a")
+        histogram.observe(5, "/a")
+        samples = list(histogram.samples())
+        self.assertIn('latency_bucket{route="/a",le="0.1"} 1', samples)
+        self.assertIn('latency_bucket{route="/a",le="1"} 2', samples)
+        self.assertIn('latency_bucket{route="/a",le="+Inf"} 3', samples)
+        self.assertIn('latency_count{route="/a"} 3', samples)
+
+    def test_label_escaping(self):
+        registry = Registry()
+        counter = Counter("requests_total", "Requests", ("path",))
+        registry.register(counter)
+        counter.inc(2, 'a"b')
+        self.assertIn('requests_total{path="a\\"b"} 2', registry.render())
+
+
+class TestMetricsEndpoint(TestWithClient):
+    def test_request_metrics(self):
+        self.authorized_request("get", "/folders/list", headers={"path": "/"})
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.headers["content-type"].startswith("text/plain"))
+        body = response.text
+        self.assertIn(
+            'http_request_duration_seconds_count{method="GET",route="/folders/list",'
+            'status="200"}',
+            body,
+        )
+        self.assertIn('http_request_db_queries_count{method="GET"', body)
+        self.assertIn("auth_verify_token_duration_seconds_count", body)
+        self.assertIn("session_storage_size ", body)
+        self.assertIn("db_pool_checked_out ", body)
@@ -0,0 +1,19 @@
+from fastapi import status
+
+from api.db import engine as db
+from tests.base_tests import TestWithClient
+
+
+class TestMonitoring(TestWithClient):
+    async def test_prewarm_pool(self):
+        await db.prewarm_pool(db.engine, 3)
+        pool_status = db.get_pool_status(db.engine)
+        self.assertEqual(pool_status.checked_in, 3)
+        self.assertEqual(pool_status.checked_out, 0)
+        self.assertGreaterEqual(pool_status.checkouts, 3)
+
+    def test_pool_status(self):
+        response = self.client.get("/monitoring/pool")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["size"], self.settings.DATABASE_POOL_SIZE)
+        self.assertEqual(response.json()["checked_out"], 0)
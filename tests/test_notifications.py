@@ -0,0 +1,94 @@
+import asyncio
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from api.db import crud
+from api.db import engine as db
+from api.db import models
+from api.routers.changes import change_events
+from api.utils.notifications import ChangeHub, JournalPoller, hub
+from tests.base_tests import TestWithDatabase
+from tests.setup_test_env import KEY_ID
+
+
+class TestNotifications(TestWithDatabase):
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.queue = hub.subscribe(KEY_ID)
+
+    async def asyncTearDown(self):
+        hub.unsubscribe(KEY_ID, self.queue)
+        await super().asyncTearDown()
+
+    async def test_publish_on_commit(self):
+        crud.record_change(self.session, KEY_ID, "create", "folder", "/folder")
+        await self.session.flush()
+        self.assertTrue(self.queue.empty())
+        await self.session.commit()
+        change = self.queue.get_nowait()
+        self.assertEqual(change.action, "create")
+        self.assertEqual(change.path, "/folder")
+
+    async def test_no_publish_on_rollback(self):
+        crud.record_change(self.session, KEY_ID, "create", "folder", "/folder")
+        await self.session.flush()
+        await self.session.rollback()
+        await self.session.commit()
+        self.assertTrue(self.queue.empty())
+
+    async def test_database_backend(self):
+        self.settings.CHANGE_EVENTS_BACKEND = "database"
+        self.addCleanup(setattr, self.settings, "CHANGE_EVENTS_BACKEND", "memory")
+        poller = JournalPoller(hub, async_sessionmaker(db.engine))
+        await poller.poll()
+        crud.record_change(self.session, KEY_ID, "delete", "file", "/a1/f1")
+        await self.session.commit()
+        self.assertTrue(self.queue.empty())
+        await poller.poll()
+        change = self.queue.get_nowait()
+        self.assertEqual(change.action, "delete")
+        self.assertEqual(change.path, "/a1/f1")
+
+    async def test_database_backend_out_of_order_commit(self):
+        self.settings.CHANGE_EVENTS_BACKEND = "database"
+        self.addCleanup(setattr, self.settings, "CHANGE_EVENTS_BACKEND", "memory")
+        poller = JournalPoller(hub, async_sessionmaker(db.engine))
+        await poller.poll()
+        last_id = (
+            await self.session.scalar(select(func.max(models.ChangeRecord.id)))
+        ) or 0
+        for offset, path in ((2, "/later"), (1, "/earlier")):
+            change_record = crud.record_change(
+                self.session, KEY_ID, "create", "folder", path
+            )
+            change_record.id = last_id + offset
+            await self.session.commit()
+            await poller.poll()
+        paths = [self.queue.get_nowait().path for _ in range(2)]
+        self.assertEqual(paths, ["/later", "/earlier"])
+        await poller.poll()
+        self.assertTrue(self.queue.empty())
+
+    async def test_slow_subscriber_disconnected(self):
+        slow_hub = ChangeHub(1)
+        queue = slow_hub.subscribe(KEY_ID)
+        for path in ("/first", "/second"):
+            crud.record_change(self.session, KEY_ID, "create", "folder", path)
+            await self.session.flush()
+        for change in self.session.info["pending_changes"]:
+            slow_hub.publish(*change)
+        self.assertIsNone(queue.get_nowait())
+        self.assertEqual(slow_hub.subscriber_count(KEY_ID), 0)
+
+    async def test_change_events(self):
+        crud.record_change(self.session, KEY_ID, "create", "folder", "/f")
+        await self.session.commit()
+        change = self.queue.get_nowait()
+        self.queue.put_nowait(change)
+        self.queue.put_nowait(None)
+        events = [event async for event in change_events(KEY_ID, self.queue, [change])]
+        self.assertEqual(len(events), 1)
+        self.assertTrue(events[0].startswith(f"id: {change.id}\nevent: create\n"))
+        self.assertEqual(hub.subscriber_count(KEY_ID), 0)
+        self.queue = asyncio.Queue()
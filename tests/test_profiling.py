@@ -0,0 +1,51 @@
+import json
+import os
+import pstats
+import tempfile
+
+from fastapi import status
+
+from tests.base_tests import TestWithClient
+from tests.setup_test_env import KEY_ID
+
+
+class TestProfiling(TestWithClient):
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.directory = tempfile.mkdtemp()
+        self.settings.PROFILING_DIRECTORY = self.directory
+
+    async def asyncTearDown(self):
+        self.settings.PROFILING_THRESHOLD = None
+        self.settings.PROFILING_SAMPLE_RATE = 0
+        await super().asyncTearDown()
+
+    def test_slow_request_profile(self):
+        headers = self.authorized_headers("get", "/folders/list", {"path": "/"})
+        self.settings.PROFILING_THRESHOLD = 0
+        response = self.client.get("/folders/list", headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        (report_name,) = [
+            name for name in os.listdir(self.directory) if name.endswith(".json")
+        ]
+        with open(os.path.join(self.directory, report_name)) as file:
+            report = json.load(file)
+        self.assertEqual(report["route"], "/folders/list")
+        self.assertEqual(report["key_id"], KEY_ID)
+        self.assertEqual(report["status_code"], status.HTTP_200_OK)
+        self.assertTrue(report["statements"])
+        stats = pstats.Stats(
+            os.path.join(self.directory, report_name.replace(".json", ".prof"))
+        )
+        self.assertTrue(stats.total_calls)
+
+    def test_fast_request_not_kept(self):
+        self.settings.PROFILING_THRESHOLD = 60
+        self.client.get("/folders/list", headers={"path": "/"})
+        self.assertListEqual(os.listdir(self.directory), [])
+
+    def test_sampling(self):
+        self.settings.PROFILING_SAMPLE_RATE = 2
+        for _ in range(4):
+            self.client.get("/folders/list", headers={"path": "/"})
+        self.assertEqual(len(os.listdir(self.directory)), 4)
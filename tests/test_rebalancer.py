@@ -0,0 +1,160 @@
+from datetime import datetime
+from unittest.mock import AsyncMock, patch
+
+from fastapi import status
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from api.db import crud
+from api.db import engine as db
+from api.db import models
+from api.schemas.storage_api import StorageSpaceResponse
+from api.utils.rebalancer import StorageRebalancer
+from tests.base_tests import TestWithDatabase, TestWithStreamIteratorMixin
+
+
+@patch("aiohttp.ClientSession.delete")
+@patch("aiohttp.ClientSession.post")
+@patch("aiohttp.ClientSession.get")
+class TestStorageRebalancer(TestWithDatabase, TestWithStreamIteratorMixin):
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.session.add(
+            models.StorageRecord(
+                id="new_storage", url="http://new", token="token", capacity=500
+            )
+        )
+        await self.session.execute(
+            update(models.StorageRecord)
+            .where(models.StorageRecord.id == "storage_id")
+            .values(used_space=300)
+        )
+        await self.session.commit()
+        self.rebalancer = StorageRebalancer(
+            async_sessionmaker(db.engine, expire_on_commit=False)
+        )
+
+    async def test_rebalance(self, get_mock, post_mock, delete_mock):
+        self.__set_storage_responses(get_mock, post_mock, delete_mock)
+        self.rebalancer.start()
+        await self.rebalancer.wait()
+        progress = self.rebalancer.progress
+        self.assertEqual(progress.status, "finished")
+        self.assertEqual(progress.files_moved, 15)
+        self.assertEqual(progress.bytes_moved, 150)
+        self.assertEqual(await self.__count_files("new_storage"), 15)
+        self.assertEqual(delete_mock.call_count, 15)
+
+    async def test_drain(self, get_mock, post_mock, delete_mock):
+        self.__set_storage_responses(get_mock, post_mock, delete_mock)
+        self.rebalancer.start("storage_id")
+        await self.rebalancer.wait()
+        self.assertEqual(self.rebalancer.progress.files_moved, 30)
+        self.assertEqual(await self.__count_files("storage_id"), 0)
+        storage_record = await self.session.get(models.StorageRecord, "storage_id")
+        await self.session.refresh(storage_record)
+        self.assertEqual(storage_record.priority, 0)
+
+    async def test_failed_copy_keeps_file(self, get_mock, post_mock, delete_mock):
+        self.__set_storage_responses(get_mock, post_mock, delete_mock)
+        post_mock.return_value.__aenter__.return_value.status = (
+            status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+        self.rebalancer.start("storage_id")
+        await self.rebalancer.wait()
+        self.assertEqual(self.rebalancer.progress.files_failed, 30)
+        self.assertEqual(await self.__count_files("storage_id"), 30)
+        delete_mock.assert_not_called()
+
+    async def test_overwrite_to_target_during_move(
+        self, get_mock, post_mock, delete_mock
+    ):
+        self.__set_storage_responses(get_mock, post_mock, delete_mock)
+        get_response = get_mock.return_value.__aenter__.return_value
+
+        async def overwrite_to_target(*args):
+            async with AsyncSession(db.engine) as session:
+                await session.execute(
+                    update(models.FileRecord)
+                    .where(models.FileRecord.storage_id == "storage_id")
+                    .values(storage_id="new_storage", last_modified=datetime.utcnow())
+                )
+                await session.commit()
+            return get_response
+
+        get_mock.return_value.__aenter__.side_effect = overwrite_to_target
+        self.rebalancer.start("storage_id")
+        await self.rebalancer.wait()
+        self.assertEqual(self.rebalancer.progress.files_moved, 0)
+        self.assertEqual(await self.__count_files("new_storage"), 30)
+        delete_mock.assert_not_called()
+
+    async def test_move_not_allocated_to_owner(self, get_mock, post_mock, delete_mock):
+        self.__set_storage_responses(get_mock, post_mock, delete_mock)
+        get_response = get_mock.return_value.__aenter__.return_value
+        key_record = await self.key_record
+        allocated = await crud.calculate_allocated_storage(self.session, key_record)
+        allocated_during_move = []
+
+        async def measure_allocated(*args):
+            async with AsyncSession(db.engine) as session:
+                reservations = await session.scalar(
+                    select(func.count()).select_from(models.UploadRecord)
+                )
+                self.assertGreater(reservations, 0)
+                allocated_during_move.append(
+                    await crud.calculate_allocated_storage(session, key_record)
+                )
+            return get_response
+
+        get_mock.return_value.__aenter__.side_effect = measure_allocated
+        self.rebalancer.start("storage_id")
+        await self.rebalancer.wait()
+        self.assertEqual(self.rebalancer.progress.files_moved, 30)
+        self.assertEqual(allocated_during_move, [allocated] * 30)
+
+    async def test_pending_upload_skipped(self, get_mock, post_mock, delete_mock):
+        self.__set_storage_responses(get_mock, post_mock, delete_mock)
+        file_record = (
+            await self.session.scalars(
+                select(models.FileRecord).where(models.FileRecord.full_path == "/a1/f1")
+            )
+        ).one()
+        self.session.add(
+            models.UploadRecord(
+                owner=await self.key_record,
+                storage=await file_record.awaitable_attrs.storage,
+                full_path=file_record.full_path,
+                size=file_record.size,
+                file_id=file_record.id,
+            )
+        )
+        await self.session.commit()
+        self.rebalancer.start("storage_id")
+        await self.rebalancer.wait()
+        self.assertEqual(self.rebalancer.progress.files_moved, 29)
+        self.assertEqual(self.rebalancer.progress.files_skipped, 1)
+        await self.session.refresh(file_record)
+        self.assertEqual(file_record.storage_id, "storage_id")
+        upload_records = (await self.session.scalars(select(models.UploadRecord))).all()
+        self.assertEqual(len(upload_records), 1)
+
+    async def __count_files(self, storage_id: str) -> int | None:
+        return await self.session.scalar(
+            select(func.count())
+            .select_from(models.FileRecord)
+            .where(models.FileRecord.storage_id == storage_id)
+        )
+
+    def __set_storage_responses(
+        self, get_mock: AsyncMock, post_mock: AsyncMock, delete_mock: AsyncMock
+    ):
+        get_response = get_mock.return_value.__aenter__.return_value
+        get_response.status = status.HTTP_200_OK
+        get_response.content.iter_chunked = self.stream_generator
+        for request_mock in (post_mock, delete_mock):
+            response = request_mock.return_value.__aenter__.return_value
+            response.status = status.HTTP_200_OK
+            response.json = AsyncMock(
+                return_value=StorageSpaceResponse(used=0, capacity=500).model_dump()
+            )
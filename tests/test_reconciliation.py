@@ -0,0 +1,117 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from fastapi import status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.db import engine as db
+from api.db import models
+from api.schemas.storage_api import (
+    StorageFile,
+    StorageFilesResponse,
+    StorageSpaceResponse,
+)
+from api.utils.reconciliation import reconcile_storages
+from tests.base_tests import TestWithDatabase
+from tests.setup_test_env import FILE_SIZE, KEY_ID
+
+
+class TestStorageReconciliation(TestWithDatabase):
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        file_ids = list(await self.session.scalars(select(models.FileRecord.id)))
+        self.missing_id = file_ids.pop()
+        self.listing = [
+            StorageFilesResponse(
+                files=[StorageFile(id=file_id, size=FILE_SIZE) for file_id in file_ids],
+                next_cursor="next",
+            ),
+            StorageFilesResponse(files=[StorageFile(id="orphan", size=5)]),
+        ]
+
+    @patch("aiohttp.ClientSession.delete")
+    @patch("aiohttp.ClientSession.get")
+    async def test_report(self, get_mock: MagicMock, delete_mock: MagicMock):
+        self.__set_storage_responses(get_mock, delete_mock)
+        (report,) = await reconcile_storages(self.session)
+        self.assertEqual(report.storage_id, "storage_id")
+        self.assertEqual(report.files_size, 30 * FILE_SIZE)
+        self.assertEqual(report.drift, 5 - FILE_SIZE)
+        self.assertListEqual(report.orphaned, ["orphan"])
+        self.assertListEqual(report.missing, [self.missing_id])
+        self.assertFalse(report.fixed)
+        delete_mock.assert_not_called()
+
+    @patch("aiohttp.ClientSession.delete")
+    @patch("aiohttp.ClientSession.get")
+    async def test_fix(self, get_mock: MagicMock, delete_mock: MagicMock):
+        self.__set_storage_responses(get_mock, delete_mock)
+        (report,) = await reconcile_storages(self.session, fix=True)
+        self.assertTrue(report.fixed)
+        delete_mock.assert_called_once()
+        self.assertEqual(delete_mock.call_args.args[0], "/file/orphan")
+        storage_record = await self.session.get(models.StorageRecord, "storage_id")
+        self.assertEqual(storage_record.used_space, 29 * FILE_SIZE)
+
+    @patch("aiohttp.ClientSession.delete")
+    @patch("aiohttp.ClientSession.get")
+    async def test_reserved_during_listing(
+        self, get_mock: MagicMock, delete_mock: MagicMock
+    ):
+        self.__set_storage_responses(get_mock, delete_mock)
+        get = get_mock.side_effect
+
+        def get_and_reserve(url: str, **kwargs):
+            request_mock = get(url, **kwargs)
+            if kwargs.get("params"):
+                response = request_mock.__aenter__.return_value
+                body = response.json.return_value
+
+                async def reserve_orphan():
+                    # A blob move to this storage reserves the orphan after the
+                    # reconciler has taken its snapshot.
+                    async with AsyncSession(db.engine) as session:
+                        session.add(
+                            models.UploadRecord(
+                                owner=await session.get(models.KeyRecord, KEY_ID),
+                                storage=await session.get(
+                                    models.StorageRecord, "storage_id"
+                                ),
+                                full_path="/a1/f1",
+                                size=5,
+                                file_id="orphan",
+                            )
+                        )
+                        await session.commit()
+                    return body
+
+                response.json = AsyncMock(side_effect=reserve_orphan)
+            return request_mock
+
+        get_mock.side_effect = get_and_reserve
+        (report,) = await reconcile_storages(self.session, fix=True)
+        self.assertListEqual(report.orphaned, [])
+        delete_mock.assert_not_called()
+
+    def __set_storage_responses(self, get_mock: MagicMock, delete_mock: MagicMock):
+        pages = iter(self.listing)
+
+        def get(url: str, **kwargs):
+            request_mock = MagicMock()
+            response = request_mock.__aenter__.return_value
+            response.status = status.HTTP_200_OK
+            if url == "/space":
+                body = StorageSpaceResponse(used=29 * FILE_SIZE + 5, capacity=500)
+            else:
+                body = next(pages)
+            response.json = AsyncMock(return_value=body.model_dump())
+            return request_mock
+
+        get_mock.side_effect = get
+        delete_response = delete_mock.return_value.__aenter__.return_value
+        delete_response.status = status.HTTP_200_OK
+        delete_response.json = AsyncMock(
+            return_value=StorageSpaceResponse(
+                used=29 * FILE_SIZE, capacity=500
+            ).model_dump()
+        )
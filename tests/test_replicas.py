@@ -0,0 +1,74 @@
+from fastapi import status
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from api.app import app
+from api.db import engine as db
+from api.db import models
+from api.dependencies import get_db
+from api.utils.caching import folder_cache
+from tests.base_tests import TestWithClient
+from tests.setup_test_env import setup_data
+
+REPLICA_URL = "sqlite+aiosqlite:///./tests/replica.sqlite3?check_same_thread=False"
+
+
+class TestReplicaRouting(TestWithClient):
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.replica_engine = db.create_engine(REPLICA_URL)
+        async with self.replica_engine.begin() as conn:
+            await conn.run_sync(models.Base.metadata.create_all)
+        self.replica_session = AsyncSession(self.replica_engine)
+        await setup_data(self.replica_session, self.settings)
+        app.dependency_overrides[get_db] = db.create_get_db_dependency(
+            async_sessionmaker(db.engine, expire_on_commit=False),
+            async_sessionmaker(
+                db.create_read_engine(db.engine), expire_on_commit=False
+            ),
+            async_sessionmaker(
+                db.create_read_engine(self.replica_engine), expire_on_commit=False
+            ),
+        )
+
+    async def asyncTearDown(self):
+        await self.replica_session.close()
+        async with self.replica_engine.begin() as conn:
+            await conn.run_sync(models.Base.metadata.drop_all)
+        await self.replica_engine.dispose()
+        await super().asyncTearDown()
+
+    async def test_read_from_replica(self):
+        self.session.add(
+            models.FolderRecord(
+                owner=await self.key_record, name="primary", full_path="/primary"
+            )
+        )
+        await self.session.commit()
+        response = self.authorized_request(
+            "get", "/folders/list", headers={"path": "/primary"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.authorized_request(
+            "get", "/folders/list", headers={"path": "/a1"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_replica_listing_not_cached(self):
+        self.settings.CHANGE_EVENTS_BACKEND = "database"
+        self.addCleanup(setattr, self.settings, "CHANGE_EVENTS_BACKEND", "memory")
+        response = self.authorized_request(
+            "get", "/folders/list", headers={"path": "/a1"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(folder_cache.listings), 0)
+
+    def test_read_your_writes(self):
+        response = self.authorized_request(
+            "post", "/folders/mkdir", json={"path": "/folder"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        response = self.authorized_request(
+            "get", "/folders/list", headers={"path": "/folder"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertListEqual(response.json()["folders"], [])
@@ -0,0 +1,101 @@
+import json
+import unittest
+from datetime import datetime
+from unittest.mock import AsyncMock, patch
+
+from fastapi import status
+
+from api.schemas.storage_api import StorageSpaceResponse
+from api.utils import compression, serialization
+from api.utils.compression import negotiate_encoding
+from tests.base_tests import TestWithClient, TestWithStreamIteratorMixin
+
+
+class TestSerialization(unittest.TestCase):
+    content = {
+        "name": "fïle",
+        "size": 10,
+        "last_modified": datetime(2023, 5, 1, 12, 30, 15, 120),
+        "items": [StorageSpaceResponse(used=1, capacity=2)],
+    }
+
+    def test_dumps(self):
+        self.assertEqual(
+            json.loads(serialization.dumps(self.content)),
+            {
+                "name": "fïle",
+                "size": 10,
+                "last_modified": "2023-05-01T12:30:15.000120",
+                "items": [{"used": 1, "capacity": 2}],
+            },
+        )
+
+    def test_dumps_without_orjson(self):
+        expected = serialization.dumps(self.content)
+        with patch.object(serialization, "orjson", None):
+            self.assertEqual(serialization.dumps(self.content), expected)
+
+
+class TestNegotiateEncoding(unittest.TestCase):
+    def test_gzip(self):
+        self.assertEqual(negotiate_encoding("gzip, deflate"), "gzip")
+
+    def test_rejected(self):
+        self.assertIsNone(negotiate_encoding("gzip;q=0, deflate"))
+        self.assertIsNone(negotiate_encoding(""))
+
+    def test_wildcard(self):
+        self.assertEqual(
+            negotiate_encoding("*"), "gzip" if compression.brotli is None else "br"
+        )
+
+    def test_weights(self):
+        self.assertEqual(negotiate_encoding("br;q=0.5, gzip"), "gzip")
+
+
+class TestCompression(TestWithClient, TestWithStreamIteratorMixin):
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.settings.COMPRESSION_MINIMUM_SIZE = 100
+        self.addCleanup(setattr, self.settings, "COMPRESSION_MINIMUM_SIZE", 1024)
+
+    def test_listing_compressed(self):
+        headers = self.authorized_headers("get", "/folders/list", {"path": "/a1"})
+        response = self.client.get(
+            "/folders/list", headers=headers | {"accept-encoding": "gzip"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response.headers["vary"])
+        self.assertEqual(response.json()["folders"], ["b1", "b2"])
+        self.assertEqual(
+            set(response.json()["files"][0]), {"name", "size", "last_modified"}
+        )
+
+    def test_identity(self):
+        headers = self.authorized_headers("get", "/folders/list", {"path": "/a1"})
+        response = self.client.get(
+            "/folders/list", headers=headers | {"accept-encoding": "identity"}
+        )
+        self.assertNotIn("content-encoding", response.headers)
+
+    def test_small_response_not_compressed(self):
+        headers = self.authorized_headers("get", "/folders/size", {"path": "/a1"})
+        response = self.client.get(
+            "/folders/size", headers=headers | {"accept-encoding": "gzip"}
+        )
+        self.assertNotIn("content-encoding", response.headers)
+
+    @patch("aiohttp.ClientSession.get")
+    def test_download_not_compressed(self, request_mock: AsyncMock):
+        self.stream_content = "x" * 1000
+        storage_response = request_mock.return_value.__aenter__.return_value
+        storage_response.status = status.HTTP_200_OK
+        storage_response.content.iter_any = self.stream_generator
+        headers = self.authorized_headers("get", "/files/download", {"path": "/a1/f1"})
+        with self.client.stream(
+            "GET", "/files/download", headers=headers | {"accept-encoding": "gzip"}
+        ) as response:
+            body = b"".join(response.iter_raw())
+        self.assertNotIn("content-encoding", response.headers)
+        self.assertEqual(body, self.stream_content.encode())
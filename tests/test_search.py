@@ -0,0 +1,69 @@
+from fastapi import status
+
+from tests.base_tests import TestWithClient, add_test_authentication
+
+
+@add_test_authentication(("get", "/search?q=f1"))
+class TestSearch(TestWithClient):
+    def search(self, **params) -> list[str]:
+        response = self.authorized_request("get", "/search", params=params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item["path"] for item in response.json()["items"]]
+
+    def test_substring(self):
+        self.assertListEqual(
+            self.search(q="c1", type="folder"),
+            [
+                "/a1/b1/c1",
+                "/a1/b2/c1",
+                "/a2/b1/c1",
+                "/a2/b2/c1",
+                "/a3/b1/c1",
+                "/a3/b2/c1",
+            ],
+        )
+
+    def test_prefix(self):
+        self.assertListEqual(
+            self.search(q="/a1/b1", mode="prefix"),
+            ["/a1/b1", "/a1/b1/c1", "/a1/b1/f1", "/a1/b1/f2", "/a1/b1/f3"],
+        )
+
+    def test_glob(self):
+        self.assertListEqual(
+            self.search(q="*/f4", mode="glob"), ["/a1/f4", "/a2/f4", "/a3/f4"]
+        )
+        self.assertListEqual(
+            self.search(q="/a?/b2/f?", mode="glob", type="file"),
+            [f"/a{i}/b2/f{j}" for i in range(1, 4) for j in range(1, 4)],
+        )
+
+    def test_glob_escapes_like_wildcards(self):
+        self.assertListEqual(self.search(q="/a_", mode="glob"), [])
+        self.assertListEqual(self.search(q="%", mode="glob"), [])
+
+    def test_paginated(self):
+        response = self.authorized_request(
+            "get", "/search", params={"q": "/a1/", "mode": "prefix", "limit": 4}
+        )
+        results = response.json()
+        self.assertListEqual(
+            [item["path"] for item in results["items"]],
+            ["/a1/b1", "/a1/b1/c1", "/a1/b1/f1", "/a1/b1/f2"],
+        )
+        self.assertEqual(results["next_cursor"], "/a1/b1/f2")
+        self.assertListEqual(
+            self.search(q="/a1/", mode="prefix", cursor=results["next_cursor"]),
+            [
+                "/a1/b1/f3",
+                "/a1/b2",
+                "/a1/b2/c1",
+                "/a1/b2/f1",
+                "/a1/b2/f2",
+                "/a1/b2/f3",
+                "/a1/f1",
+                "/a1/f2",
+                "/a1/f3",
+                "/a1/f4",
+            ],
+        )
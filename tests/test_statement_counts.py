@@ -0,0 +1,120 @@
+from unittest.mock import AsyncMock, patch
+
+from fastapi import status
+
+from api.schemas.storage_api import StorageSpaceResponse
+from tests.base_tests import (
+    RequestMethod,
+    TestWithClient,
+    TestWithStreamIteratorMixin,
+    count_statements,
+)
+from tests.setup_test_env import scale_data
+
+
+class TestStatementCounts(TestWithClient, TestWithStreamIteratorMixin):
+    def test_list_folder(self):
+        self.assert_statement_count(3, "get", "/folders/list", {"path": "/a1"})
+
+    def test_folder_tree(self):
+        self.assert_statement_count(3, "get", "/folders/tree", {"path": "/a1"})
+
+    def test_folder_size(self):
+        self.assert_statement_count(2, "get", "/folders/size", {"path": "/a1"})
+
+    def test_storage_info(self):
+        self.assert_statement_count(2, "get", "/storage", {})
+
+    def test_rename_folder(self):
+        self.assert_statement_count(
+            8, "post", "/folders/rename", {}, json={"path": "/a1", "new_name": "x"}
+        )
+
+    def test_move_folder(self):
+        self.assert_statement_count(
+            9,
+            "post",
+            "/folders/move",
+            {},
+            json={"path": "/a1", "destination": "/a2"},
+        )
+
+    @patch("aiohttp.ClientSession.delete")
+    def test_delete_folder(self, request_mock: AsyncMock):
+        self.__set_storage_response(request_mock)
+        self.assert_statement_count(8, "delete", "/folders/rmdir", {"path": "/a1"})
+
+    @patch("aiohttp.ClientSession.delete")
+    def test_delete_file(self, request_mock: AsyncMock):
+        self.__set_storage_response(request_mock)
+        self.assert_statement_count(7, "delete", "/files/delete", {"path": "/a1/f1"})
+
+    def test_create_folder(self):
+        self.assert_statement_count(
+            6, "post", "/folders/mkdir", {}, json={"path": "/a1/folder"}
+        )
+
+    def test_create_folders_recursively(self):
+        self.assert_statement_count(
+            10,
+            "post",
+            "/folders/mkdir",
+            {},
+            json={"path": "/a1/b1/c/d/e/f", "recursive": True},
+        )
+
+    @patch("aiohttp.ClientSession.get")
+    def test_download_file(self, request_mock: AsyncMock):
+        storage_response = request_mock.return_value.__aenter__.return_value
+        storage_response.status = status.HTTP_200_OK
+        storage_response.content.iter_any = self.stream_generator
+        self.assert_statement_count(3, "get", "/files/download", {"path": "/a1/f1"})
+
+    @patch("aiohttp.ClientSession.post")
+    def test_upload_new_file(self, request_mock: AsyncMock):
+        self.__set_storage_response(request_mock)
+        self.assert_statement_count(
+            12,
+            "post",
+            "/files/upload",
+            {"path": "/a1/file", "file-size": "100"},
+            content=b"data",
+        )
+
+    @patch("aiohttp.ClientSession.post")
+    def test_upload_existing_file(self, request_mock: AsyncMock):
+        self.__set_storage_response(request_mock)
+        self.assert_statement_count(
+            13,
+            "post",
+            "/files/upload",
+            {"path": "/a1/f1", "file-size": "100"},
+            content=b"data",
+        )
+
+    def assert_statement_count(
+        self,
+        expected_count: int,
+        method: RequestMethod,
+        url: str,
+        headers: dict,
+        **kwargs,
+    ):
+        headers = self.authorized_headers(method, url, headers)
+        with count_statements() as statements:
+            response = self.request(method, url, headers=headers, **kwargs)
+        self.assertLess(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertLessEqual(len(statements), expected_count, "\n".join(statements))
+
+    def __set_storage_response(self, request_mock: AsyncMock):
+        storage_response = request_mock.return_value.__aenter__.return_value
+        storage_response.status = status.HTTP_200_OK
+        storage_response.json = AsyncMock(
+            return_value=StorageSpaceResponse(used=100, capacity=500).model_dump()
+        )
+
+
+class TestStatementCountsScaled(TestStatementCounts):
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        await scale_data(self.session, folder_count=20, file_count=20)
@@ -1,21 +1,46 @@
+import unittest
 from asyncio import sleep
-from unittest.mock import AsyncMock, patch
+from datetime import datetime, timedelta
+from unittest.mock import ANY, AsyncMock, patch
 
 from fastapi import status
 from pydantic import BaseModel
 from sqlalchemy import select
 
-from api.db import models
+from api.db import crud, models
+from api.exceptions.client import NotExists
 from api.exceptions.core import StorageResponseError
 from api.schemas.storage_api import (
     StorageRequestHeaders,
     StorageSpaceResponse,
     UploadRequestHeaders,
+    storage_headers,
+    upload_headers,
 )
-from api.utils.storage import StorageClient
+from api.utils.storage import StorageClient, refresh_reservation
 from tests.base_tests import TestWithClient, TestWithStreamIteratorMixin
 
 
+class TestStorageHeaders(unittest.TestCase):
+    def test_storage_headers_cached(self):
+        headers = storage_headers("token")
+        self.assertIs(storage_headers("token"), headers)
+        self.assertEqual(headers, {"authorization": "Bearer token"})
+        with self.assertRaises(TypeError):
+            headers["authorization"] = "changed"  # type: ignore[index]
+        self.assertEqual(
+            storage_headers("rotated"), {"authorization": "Bearer rotated"}
+        )
+
+    def test_upload_headers(self):
+        self.assertEqual(
+            upload_headers("token", 100),
+            UploadRequestHeaders(authorization="token", file_size=100).model_dump(
+                by_alias=True
+            ),
+        )
+
+
 class TestStorageClient(TestWithClient, TestWithStreamIteratorMixin):
     @patch("aiohttp.ClientSession.get")
     async def test_download_file_response_error(self, request_mock: AsyncMock):
@@ -60,10 +85,10 @@ class TestStorageClient(TestWithClient, TestWithStreamIteratorMixin):
         self.assertGreater(file_record.last_modified, prev_modified)
         request_mock.assert_called_once_with(
             f"/file/{file_record.id}",
-            data=stream_generator,
+            data=ANY,
             headers=UploadRequestHeaders(
                 authorization=storage_record.token, file_size=new_file_size
-            ).dict(by_alias=True),
+            ).model_dump(by_alias=True),
         )
 
     @patch("aiohttp.ClientSession.post")
@@ -90,12 +115,39 @@ class TestStorageClient(TestWithClient, TestWithStreamIteratorMixin):
         )
         request_mock.assert_called_once_with(
             f"/file/{file_record.id}",
-            data=stream_generator,
+            data=ANY,
             headers=UploadRequestHeaders(
                 authorization=storage_record.token, file_size=file_size
-            ).dict(by_alias=True),
+            ).model_dump(by_alias=True),
         )
 
+    @patch("api.db.crud.lock_key", wraps=crud.lock_key)
+    @patch("aiohttp.ClientSession.post")
+    async def test_upload_locks_key_after_transfer(
+        self, request_mock: AsyncMock, lock_mock: AsyncMock
+    ):
+        storage_response = StorageSpaceResponse(
+            used=400, capacity=self.settings.SESSION_STORAGE_MAX_SIZE
+        )
+        self.__set_request_mock_value(request_mock, storage_response)
+        response = request_mock.return_value.__aenter__.return_value
+
+        async def transfer(*args):
+            lock_mock.assert_not_called()
+            return response
+
+        request_mock.return_value.__aenter__.side_effect = transfer
+        storage_record = (
+            await self.session.scalars(select(models.StorageRecord))
+        ).one()
+        key_record = await self.key_record
+        storage_client = StorageClient(self.session, key_record, storage_record)
+        for path in ("/a1/f1", "/a1/b1/c1/f"):
+            upload_record = await storage_client.reserve_upload(path, 100)
+            lock_mock.reset_mock()
+            await storage_client.upload_reserved(upload_record, self.stream_generator())
+            lock_mock.assert_awaited_once_with(self.session, key_record)
+
     @patch("aiohttp.ClientSession.delete")
     async def test_delete_file(self, request_mock: AsyncMock):
         storage_response = StorageSpaceResponse(
@@ -124,7 +176,7 @@ class TestStorageClient(TestWithClient, TestWithStreamIteratorMixin):
             f"/file/{file_record.id}",
             headers=StorageRequestHeaders(
                 authorization=storage_record.token,
-            ).dict(by_alias=True),
+            ).model_dump(by_alias=True),
         )
 
     @patch("aiohttp.ClientSession.delete")
@@ -166,8 +218,69 @@ class TestStorageClient(TestWithClient, TestWithStreamIteratorMixin):
             ).first()
             self.assertIsNone(found_file_record)
 
+    @patch("aiohttp.ClientSession.delete")
+    async def test_cleanup_abandoned_uploads(self, request_mock: AsyncMock):
+        storage_response = StorageSpaceResponse(used=0, capacity=10000000)
+        self.__set_request_mock_value(request_mock, storage_response)
+        storage_record = (
+            await self.session.scalars(select(models.StorageRecord))
+        ).one()
+        storage_client = StorageClient(
+            self.session, await self.key_record, storage_record
+        )
+        upload_record = await storage_client.reserve_upload("/a1/new_file", 10)
+        upload_id = upload_record.id
+        storage_token = storage_record.token
+        await self.session.commit()
+        await StorageClient.cleanup_abandoned_uploads(
+            self.session, datetime.utcnow() + timedelta(seconds=1)
+        )
+        self.assertIsNone(await self.session.get(models.UploadRecord, upload_id))
+        request_mock.assert_called_once_with(
+            f"/file/{upload_id}",
+            headers=StorageRequestHeaders(
+                authorization=storage_token,
+            ).model_dump(by_alias=True),
+        )
+
+    async def test_refresh_reservation(self):
+        self.settings.UPLOAD_RESERVATION_TTL = 0
+        self.addCleanup(setattr, self.settings, "UPLOAD_RESERVATION_TTL", 3600)
+        storage_record = (
+            await self.session.scalars(select(models.StorageRecord))
+        ).one()
+        storage_client = StorageClient(
+            self.session, await self.key_record, storage_record
+        )
+        upload_record = await storage_client.reserve_upload("/a1/new_file", 10)
+        upload_id = upload_record.id
+        await self.session.commit()
+        refreshed_before = datetime.utcnow()
+        await sleep(0.01)
+        chunks = [
+            chunk
+            async for chunk in refresh_reservation(
+                self.stream_generator(), self.session.bind, upload_id
+            )
+        ]
+        self.assertEqual("".join(chunks), self.stream_content)
+        await self.session.refresh(upload_record)
+        self.assertGreater(upload_record.refreshed_at, refreshed_before)
+        await StorageClient.cleanup_abandoned_uploads(self.session, refreshed_before)
+        self.assertIsNotNone(await self.session.get(models.UploadRecord, upload_id))
+
+    async def test_refresh_expired_reservation(self):
+        self.settings.UPLOAD_RESERVATION_TTL = 0
+        self.addCleanup(setattr, self.settings, "UPLOAD_RESERVATION_TTL", 3600)
+        await sleep(0.01)
+        with self.assertRaises(NotExists):
+            async for _ in refresh_reservation(
+                self.stream_generator(), self.session.bind, "missing"
+            ):
+                pass
+
     def __set_request_mock_value(self, mock: AsyncMock, response: BaseModel):
         mock.return_value.__aenter__.return_value.status = status.HTTP_200_OK
         mock.return_value.__aenter__.return_value.json = AsyncMock(
-            return_value=response.dict()
+            return_value=response.model_dump()
         )
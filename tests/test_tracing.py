@@ -0,0 +1,103 @@
+import json
+import os
+import tempfile
+import threading
+from unittest.mock import patch
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from fastapi import status
+
+from api.db import models
+from api.utils.storage import open_storage_session
+from api.utils.tracing import Span, current_span, exporter
+from tests.base_tests import TestWithClient
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+class TestTracing(TestWithClient):
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.export_path = os.path.join(tempfile.mkdtemp(), "traces.jsonl")
+        self.settings.TRACING_ENABLED = True
+        self.settings.TRACING_EXPORT_PATH = self.export_path
+
+    async def asyncTearDown(self):
+        self.settings.TRACING_ENABLED = False
+        await super().asyncTearDown()
+
+    def test_request_spans(self):
+        headers = self.authorized_headers("get", "/folders/list", {"path": "/"})
+        os.remove(self.export_path)
+        response = self.client.get(
+            "/folders/list",
+            headers=headers | {"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        spans = self.__read_spans()
+        self.assertTrue(all(span["traceId"] == TRACE_ID for span in spans))
+        (server_span,) = [span for span in spans if span["kind"] == 2]
+        self.assertEqual(server_span["name"], "GET /folders/list")
+        self.assertEqual(server_span["parentSpanId"], PARENT_ID)
+        names = {span["name"] for span in spans}
+        self.assertTrue({"verify_token", "get_key_record", "SELECT"} <= names)
+        children = [span for span in spans if span is not server_span]
+        span_ids = {span["spanId"] for span in spans}
+        self.assertTrue(all(span["parentSpanId"] in span_ids for span in children))
+
+    def test_disabled(self):
+        self.settings.TRACING_ENABLED = False
+        self.authorized_request("get", "/folders/list", headers={"path": "/"})
+        exporter.flush()
+        self.assertFalse(os.path.exists(self.export_path))
+
+    def test_export_off_event_loop(self):
+        threads = []
+        with patch.object(
+            exporter,
+            "write",
+            side_effect=lambda spans: threads.append(threading.current_thread().name),
+        ):
+            self.authorized_request("get", "/folders/list", headers={"path": "/"})
+            exporter.flush()
+        self.assertTrue(threads)
+        self.assertTrue(all(name.startswith("span-exporter") for name in threads))
+
+    async def test_storage_request_propagation(self):
+        received_headers = []
+
+        async def handle(request: web.Request) -> web.Response:
+            received_headers.append(request.headers.get("traceparent"))
+            return web.json_response({})
+
+        app = web.Application()
+        app.router.add_get("/space", handle)
+        async with TestServer(app) as server:
+            storage = models.StorageRecord(
+                id="traced", url=str(server.make_url("")), token="token", capacity=0
+            )
+            async with open_storage_session(storage) as http:
+                async with http.get("/space"):
+                    pass
+                span = Span("request", TRACE_ID)
+                token = current_span.set(span)
+                try:
+                    async with http.get("/space"):
+                        pass
+                finally:
+                    current_span.reset(token)
+        self.assertIsNone(received_headers[0])
+        self.assertRegex(received_headers[1], f"^00-{TRACE_ID}-[0-9a-f]{{16}}-01$")
+
+    def __read_spans(self) -> list[dict]:
+        exporter.flush()
+        with open(self.export_path) as file:
+            return [
+                span
+                for line in file
+                for resource_spans in json.loads(line)["resourceSpans"]
+                for scope_spans in resource_spans["scopeSpans"]
+                for span in scope_spans["spans"]
+            ]
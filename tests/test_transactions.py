@@ -0,0 +1,71 @@
+import sqlite3
+from unittest.mock import patch
+
+from fastapi import Request, status
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+
+from api.app import app
+from api.db import crud
+from api.db import engine as db
+from api.db import models
+from api.dependencies import get_db
+from tests.base_tests import TestWithClient
+from tests.setup_test_env import KEY_ID
+
+
+def create_request(method: str) -> Request:
+    return Request({"type": "http", "method": method, "headers": []})
+
+
+class TestTransactions(TestWithClient):
+    async def test_read_only_session(self):
+        get_db_override = app.dependency_overrides[get_db]
+        async for session in get_db_override(create_request("GET")):
+            self.assertTrue(db.is_read_only(session))
+        async for session in get_db_override(create_request("POST")):
+            self.assertFalse(db.is_read_only(session))
+
+    async def test_retry_on_serialization_failure(self):
+        create_child_folder = crud.create_child_folder
+        attempts = []
+
+        async def failing_create_child_folder(*args, **kwargs):
+            attempts.append(args)
+            if len(attempts) == 1:
+                raise OperationalError(
+                    "INSERT", {}, sqlite3.OperationalError("database is locked")
+                )
+            return await create_child_folder(*args, **kwargs)
+
+        with patch.object(crud, "create_child_folder", failing_create_child_folder):
+            response = self.authorized_request(
+                "post", "/folders/mkdir", json={"path": "/folder"}
+            )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(len(attempts), 2)
+        created_folder = (
+            await self.session.scalars(
+                select(models.FolderRecord).where(
+                    models.FolderRecord.owner_id == KEY_ID,
+                    models.FolderRecord.full_path == "/folder",
+                )
+            )
+        ).one()
+        self.assertEqual(created_folder.name, "folder")
+
+    def test_no_retry_on_other_errors(self):
+        attempts = []
+
+        async def failing_create_child_folder(*args, **kwargs):
+            attempts.append(args)
+            raise OperationalError("INSERT", {}, sqlite3.OperationalError("error"))
+
+        self.client = TestClient(app, raise_server_exceptions=False)
+        with patch.object(crud, "create_child_folder", failing_create_child_folder):
+            response = self.authorized_request(
+                "post", "/folders/mkdir", json={"path": "/folder"}
+            )
+        self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+        self.assertEqual(len(attempts), 1)